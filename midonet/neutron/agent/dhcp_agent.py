@@ -0,0 +1,71 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sys
+
+import eventlet
+
+from oslo.config import cfg
+
+from neutron.agent.common import config
+from neutron.agent import dhcp_agent
+from neutron.common import config as common_config
+from neutron.common import topics
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import service
+from neutron import service as neutron_service
+
+from midonet.neutron.common import config as midonet_config  # noqa
+
+LOG = logging.getLogger(__name__)
+
+
+class MidonetDhcpAgent(dhcp_agent.DhcpAgentWithStateReport):
+    """DHCP agent for MidoNet deployments.
+
+    When MidoNet serves DHCP natively, the agent only reports its state: it
+    neither fetches the networks from the plugin nor resyncs them
+    periodically.
+    """
+
+    def sync_state(self):
+        if cfg.CONF.MIDONET.native_dhcp:
+            LOG.debug(_("MidoNet serves DHCP, skipping network sync"))
+            return
+        super(MidonetDhcpAgent, self).sync_state()
+
+    def periodic_resync(self):
+        if cfg.CONF.MIDONET.native_dhcp:
+            return
+        super(MidonetDhcpAgent, self).periodic_resync()
+
+
+def main():
+    eventlet.monkey_patch()
+    dhcp_agent.register_options()
+    common_config.init(sys.argv[1:])
+    config.setup_logging(cfg.CONF)
+    server = neutron_service.Service.create(
+        binary='neutron-dhcp-agent',
+        topic=topics.DHCP_AGENT,
+        report_interval=cfg.CONF.AGENT.report_interval,
+        manager='midonet.neutron.agent.dhcp_agent.MidonetDhcpAgent')
+    service.launch(server).wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -21,7 +21,8 @@
 
 from neutron.agent.linux import dhcp
 from neutron.openstack.common import log as logging
-from neutron.plugins.midonet.common import config  # noqa
+
+from midonet.neutron.common import config  # noqa
 
 LOG = logging.getLogger(__name__)
 
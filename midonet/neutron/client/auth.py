@@ -0,0 +1,206 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""MidoNet API token management shared by the Neutron server processes.
+
+midonetclient logs in from each process, and again from within a user
+request whenever its token is about to expire.  install() makes it take its
+tokens from a TokenManager instead.  The manager keeps the token in a cache
+file readable only by the Neutron user, so that all the API workers share a
+single login, and refreshes it in the background before it expires.  Only
+one green thread per process, and one process per host, logs in at a time;
+the others wait for it and use its token.
+"""
+
+import base64
+import Cookie
+import email.utils
+import hashlib
+import os
+import tempfile
+import time
+
+import eventlet
+from eventlet import semaphore
+
+from midonetclient import auth_lib
+
+from neutron.common import exceptions as n_exc
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import lockutils
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
+
+LOG = logging.getLogger(__name__)
+
+_SESSION_COOKIE = 'sessionId'
+
+# Lifetime assumed for a token whose expiry the API does not tell
+_DEFAULT_LIFETIME = 3600
+
+
+class MidonetAuthFailed(n_exc.NeutronException):
+    message = _("Failed to log in to the MidoNet API: %(reason)s")
+
+
+class TokenManager(object):
+
+    def __init__(self, conf, http):
+        self._uri = conf.midonet_uri[0].rstrip('/') + '/login'
+        self._username = conf.username
+        self._password = conf.password
+        self._project_id = conf.project_id
+        self._path = conf.auth_token_cache
+        self._margin = conf.auth_refresh_margin
+        self._http = http
+        # Tokens of other credentials found in the cache file are ignored
+        self._identity = hashlib.sha1('%s:%s:%s' % (
+            self._uri, self._username, self._project_id)).hexdigest()
+        self._token = None
+        self._expires = 0
+        self._rejected = None
+        self._refreshing = semaphore.Semaphore()
+        self._timer = None
+        self._pid = None
+
+    def _valid(self, expires, horizon=0):
+        """Tell if a token is still good for horizon seconds."""
+        return time.time() + horizon < expires - self._margin
+
+    def get_token(self):
+        """Return a valid token, logging in only if none is available."""
+        self._start()
+        if not self._valid(self._expires):
+            self.refresh()
+        return self._token
+
+    def invalidate(self):
+        """Forget the current token, e.g. after the API rejected it."""
+        self._rejected = self._token
+        self._expires = 0
+
+    def refresh(self, horizon=0):
+        """Get a token good for horizon seconds, from the cache file or by
+        logging in.
+
+        Concurrent callers are coalesced: one of them gets the token while
+        the others wait for it.
+        """
+        stale = self._token
+        with self._refreshing:
+            if self._token != stale and self._valid(self._expires, horizon):
+                return
+            with lockutils.lock('midonet-auth', lock_file_prefix='neutron-',
+                                external=True):
+                if self._read_cache(horizon):
+                    return
+                self._login()
+                self._write_cache()
+
+    def _login(self):
+        headers = {'Content-Type': 'application/json',
+                   'Authorization': 'Basic ' + base64.b64encode(
+                       '%s:%s' % (self._username, self._password))}
+        if self._project_id:
+            headers['X-Auth-Project'] = self._project_id
+        response, content = self._http.request(self._uri, 'POST',
+                                               headers=headers)
+        if response.status != 200:
+            raise MidonetAuthFailed(reason='HTTP %s' % response.status)
+
+        cookie = Cookie.SimpleCookie(response.get('set-cookie', ''))
+        if _SESSION_COOKIE not in cookie:
+            raise MidonetAuthFailed(reason='no session cookie')
+        self._token = cookie[_SESSION_COOKIE].value
+        expires = (cookie[_SESSION_COOKIE]['expires'] or
+                   response.get('expires'))
+        if expires:
+            self._expires = email.utils.mktime_tz(
+                email.utils.parsedate_tz(expires))
+        else:
+            self._expires = time.time() + _DEFAULT_LIFETIME
+        LOG.debug(_("Logged in to the MidoNet API, token valid for %ds"),
+                  self._expires - time.time())
+
+    def _read_cache(self, horizon):
+        try:
+            with open(self._path) as f:
+                data = jsonutils.loads(f.read())
+        except (IOError, ValueError):
+            return False
+        if (data.get('identity') != self._identity or
+                data.get('token') == self._rejected or
+                not self._valid(data.get('expires', 0), horizon)):
+            return False
+        self._token = data['token']
+        self._expires = data['expires']
+        return True
+
+    def _write_cache(self):
+        directory = os.path.dirname(self._path)
+        try:
+            # mkstemp creates the file readable by its owner only
+            fd, tmp_path = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, 'w') as f:
+                f.write(jsonutils.dumps({'identity': self._identity,
+                                         'token': self._token,
+                                         'expires': self._expires}))
+            os.rename(tmp_path, self._path)
+        except (IOError, OSError) as e:
+            LOG.warn(_("Failed to write the MidoNet token cache %(path)s: "
+                       "%(err)s"), {'path': self._path, 'err': e})
+
+    def _start(self):
+        """Start refreshing the token in the background in this process.
+
+        This is done on first use so that API workers forked after the
+        plugin was loaded run their own timer.
+        """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._timer = loopingcall.FixedIntervalLoopingCall(
+            self.refresh_if_needed)
+        self._timer.start(interval=max(1, self._margin // 4))
+
+    def refresh_if_needed(self):
+        """Refresh the token ahead of the time requests would have to."""
+        horizon = self._margin // 2
+        if self._valid(self._expires, horizon):
+            return
+        try:
+            self.refresh(horizon)
+        except Exception as e:
+            LOG.warn(_("Failed to refresh the MidoNet API token: %s"), e)
+
+
+def install(conf, shim):
+    """Make midonetclient use tokens of a TokenManager.
+
+    The manager logs in through the pooled transport shim, which calls it
+    back when the API rejects a token.
+    """
+    manager = TokenManager(conf, shim.Http())
+    shim.on_unauthorized = manager.invalidate
+
+    def get_token(auth, *args, **kwargs):
+        return manager.get_token()
+    auth_lib.Auth.get_token = get_token
+
+    # Log in now rather than in the first user request
+    eventlet.spawn_n(manager.refresh_if_needed)
+    return manager
@@ -0,0 +1,131 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Circuit breaker and deadlines for the MidoNet API calls.
+
+Every call runs under the deadline of its operation.  Calls failing because
+MidoNet is unreachable, answers with a server error or misses its deadline
+count as failures; client errors such as a 404 do not.  After
+breaker_failure_threshold consecutive failures the breaker opens and calls
+fail at once for breaker_reset_timeout seconds.  It then lets a single call
+through: the breaker closes again if it succeeds and stays open otherwise.
+"""
+
+import socket
+import time
+
+import eventlet
+import httplib2
+from webob import exc as w_exc
+
+from midonetclient import exc
+
+from neutron.common import exceptions as n_exc
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+_FAILURES = (exc.MidoApiConnectionError, w_exc.HTTPServerError,
+             socket.error, httplib2.HttpLib2Error)
+
+
+class MidonetUnavailable(n_exc.ServiceUnavailable):
+    message = _("MidoNet API is unavailable: %(reason)s")
+
+
+class CircuitBreaker(object):
+
+    def __init__(self, conf):
+        self._threshold = conf.breaker_failure_threshold
+        self._reset_timeout = conf.breaker_reset_timeout
+        self._deadline = conf.api_call_deadline
+        self._deadlines = dict((op, float(seconds)) for op, seconds in
+                               (conf.api_call_deadlines or {}).items())
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probing = False
+
+    def available(self):
+        """Tell if a call would be let through right now."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return time.time() - self._opened_at >= self._reset_timeout
+        return not self._probing
+
+    def check(self):
+        """Raise MidonetUnavailable if calls currently fail fast."""
+        if not self.available():
+            raise MidonetUnavailable(reason=_("circuit breaker is %s") %
+                                     self.state)
+
+    def _enter(self):
+        self.check()
+        if self.state == OPEN:
+            LOG.info(_("Probing the MidoNet API"))
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            self._probing = True
+
+    def _success(self):
+        if self.state != CLOSED:
+            LOG.info(_("MidoNet API is back, closing the circuit breaker"))
+        self.state = CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def _failure(self, error):
+        self._failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or (self.state == CLOSED and
+                                       self._failures >= self._threshold):
+            LOG.warn(_("Opening the MidoNet API circuit breaker after "
+                       "%(count)d failures, last one: %(err)s"),
+                     {'count': self._failures, 'err': error})
+            self.state = OPEN
+            self._opened_at = time.time()
+
+    def call(self, operation, fn, *args):
+        """Call fn(*args) within the deadline of the operation."""
+        self._enter()
+        deadline = self._deadlines.get(operation, self._deadline)
+        timeout = eventlet.Timeout(deadline)
+        try:
+            result = fn(*args)
+        except eventlet.Timeout as t:
+            if t is not timeout:
+                raise
+            self._failure(t)
+            raise MidonetUnavailable(
+                reason=_("%(op)s exceeded its %(deadline)ss deadline") %
+                {'op': operation, 'deadline': deadline})
+        except _FAILURES as e:
+            self._failure(e)
+            raise
+        except Exception:
+            # The API answered, e.g. with a client error
+            self._success()
+            raise
+        finally:
+            timeout.cancel()
+        self._success()
+        return result
@@ -0,0 +1,127 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import itertools
+import time
+import urlparse
+
+from neutron.common import exceptions as n_exc
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+ROUND_ROBIN = 'round_robin'
+LEAST_OUTSTANDING = 'least_outstanding'
+
+# Weight of the latest sample in the moving average of the latency
+_LATENCY_ALPHA = 0.2
+
+
+class Endpoint(object):
+    """A MidoNet API server and the statistics of the requests it served."""
+
+    def __init__(self, uri):
+        parts = urlparse.urlsplit(uri)
+        self.uri = uri
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.latency = None
+        self.ejected_until = 0
+
+    def is_available(self, now):
+        return self.ejected_until <= now
+
+    def record(self, elapsed, ok=True):
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency += _LATENCY_ALPHA * (elapsed - self.latency)
+
+    def get_stats(self):
+        return {'uri': self.uri,
+                'outstanding': self.outstanding,
+                'requests': self.requests,
+                'errors': self.errors,
+                'latency': self.latency,
+                'ejected': not self.is_available(time.time())}
+
+
+class EndpointSelector(object):
+    """Spreads requests over the configured MidoNet API servers.
+
+    Servers that time out or answer with a 5xx status are ejected for
+    eject_time seconds.  If every server is ejected the one coming back
+    first is used anyway, so a single endpoint setup behaves as before.
+    """
+
+    def __init__(self, uris, strategy, eject_time):
+        if strategy not in (ROUND_ROBIN, LEAST_OUTSTANDING):
+            raise n_exc.InvalidConfigurationOption(
+                opt_name='endpoint_strategy', opt_value=strategy)
+        self.endpoints = [Endpoint(uri) for uri in uris]
+        self._strategy = strategy
+        self._eject_time = eject_time
+        self._counter = itertools.count()
+        self._netlocs = set((ep.scheme, ep.netloc) for ep in self.endpoints)
+
+    def select(self, exclude=()):
+        now = time.time()
+        candidates = [ep for ep in self.endpoints
+                      if ep not in exclude and ep.is_available(now)]
+        if not candidates:
+            candidates = [ep for ep in self.endpoints if ep not in exclude]
+            if not candidates:
+                return None
+            return min(candidates, key=lambda ep: ep.ejected_until)
+
+        if self._strategy == LEAST_OUTSTANDING:
+            return min(candidates,
+                       key=lambda ep: (ep.outstanding, ep.latency or 0))
+        return candidates[next(self._counter) % len(candidates)]
+
+    def rewrite(self, uri, endpoint):
+        """Point a URI of any of the configured servers to endpoint."""
+        parts = urlparse.urlsplit(uri)
+        if (parts.scheme, parts.netloc) not in self._netlocs:
+            return uri
+        return urlparse.urlunsplit(parts._replace(scheme=endpoint.scheme,
+                                                  netloc=endpoint.netloc))
+
+    def eject(self, endpoint):
+        if len(self.endpoints) > 1:
+            LOG.warn(_("Ejecting MidoNet API endpoint %(uri)s for "
+                       "%(time)d seconds"),
+                     {'uri': endpoint.uri, 'time': self._eject_time})
+        endpoint.ejected_until = time.time() + self._eject_time
+
+    def latency(self):
+        """Return the mean latency of the servers in use, if known."""
+        now = time.time()
+        latencies = [ep.latency for ep in self.endpoints
+                     if ep.latency is not None and ep.is_available(now)]
+        if not latencies:
+            return None
+        return sum(latencies) / len(latencies)
+
+    def get_stats(self):
+        return [ep.get_stats() for ep in self.endpoints]
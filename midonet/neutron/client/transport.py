@@ -0,0 +1,200 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Pooled HTTP transport for the MidoNet API client.
+
+midonetclient builds a new httplib2.Http object, and therefore a new TCP
+(and TLS) connection, for every request it sends.  install() replaces the
+httplib2 module seen by midonetclient with a shim whose Http objects borrow
+a persistent connection from a pool shared by all green threads, and send
+the request to one of the configured MidoNet API servers.
+"""
+
+import socket
+import time
+
+import eventlet
+from eventlet import pools
+import httplib2
+
+from midonetclient import api_lib
+
+from neutron.openstack.common import log as logging
+
+from midonet.neutron.client import endpoints
+from midonet.neutron.common import metrics
+from midonet.neutron.common import tracing
+
+LOG = logging.getLogger(__name__)
+
+
+class _Connection(object):
+
+    def __init__(self, http):
+        self.http = http
+        self.last_used = time.time()
+
+    def close(self):
+        for conn in self.http.connections.values():
+            conn.close()
+        self.http.connections.clear()
+
+
+class HttpPool(pools.Pool):
+    """A bounded pool of keep-alive httplib2 connections.
+
+    Connections are handed out most recently used first so that the ones
+    left idle for longer than idle_timeout can be closed before reuse rather
+    than failing on a connection the server has already dropped.
+    """
+
+    def __init__(self, size, idle_timeout, timeout=None):
+        self._idle_timeout = idle_timeout
+        self._timeout = timeout
+        super(HttpPool, self).__init__(max_size=size, order_as_stack=True)
+
+    def create(self):
+        return _Connection(httplib2.Http(timeout=self._timeout))
+
+    def get(self):
+        conn = super(HttpPool, self).get()
+        if time.time() - conn.last_used > self._idle_timeout:
+            conn.close()
+        return conn
+
+    def put(self, conn):
+        conn.last_used = time.time()
+        super(HttpPool, self).put(conn)
+
+
+# Requests that can safely be sent again to another server
+_IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE')
+
+
+class PooledHttp(object):
+    """Drop-in replacement for httplib2.Http backed by an HttpPool.
+
+    Idempotent requests failing on one server because of a connection error,
+    a socket timeout or a 5xx status are retried on the next one.  A server
+    still silent when the deadline of the call expires is ejected too, but
+    the deadline ends the call.  on_unauthorized, if set, is called when the
+    API rejects the token of a request.
+    """
+
+    def __init__(self, pool, selector, on_unauthorized=None):
+        self._pool = pool
+        self._selector = selector
+        self._on_unauthorized = on_unauthorized
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        tried = []
+        while True:
+            endpoint = self._selector.select(exclude=tried)
+            tried.append(endpoint)
+            retry = (method in _IDEMPOTENT_METHODS and
+                     len(tried) < len(self._selector.endpoints))
+            try:
+                response, content = self._send(
+                    endpoint, self._selector.rewrite(uri, endpoint), method,
+                    body, headers, **kwargs)
+            except (socket.error, httplib2.HttpLib2Error):
+                self._selector.eject(endpoint)
+                if not retry:
+                    raise
+                continue
+            except eventlet.Timeout:
+                self._selector.eject(endpoint)
+                raise
+
+            if response.status >= 500:
+                self._selector.eject(endpoint)
+                if retry:
+                    continue
+            elif response.status == 401 and self._on_unauthorized:
+                self._on_unauthorized()
+            return response, content
+
+    def _send(self, endpoint, uri, method, body, headers, **kwargs):
+        with tracing.tracer.span('HTTP %s' % method, tracing.CLIENT,
+                                 {'http.method': method,
+                                  'http.url': uri}) as span:
+            if span is not None:
+                headers = dict(headers or {}, **span.headers())
+            response, content = self._send_traced(
+                endpoint, uri, method, body, headers, **kwargs)
+            if span is not None:
+                span.tags['http.status_code'] = response.status
+            return response, content
+
+    def _send_traced(self, endpoint, uri, method, body, headers, **kwargs):
+        endpoint.outstanding += 1
+        start = time.time()
+        status = 'error'
+        try:
+            with self._pool.item() as conn:
+                try:
+                    response, content = conn.http.request(
+                        uri, method, body=body, headers=headers, **kwargs)
+                except BaseException:
+                    # Do not leave a half read response, e.g. after a
+                    # deadline expired, on a pooled connection
+                    conn.close()
+                    raise
+            status = response.status
+            return response, content
+        finally:
+            endpoint.outstanding -= 1
+            endpoint.record(time.time() - start,
+                            status != 'error' and status < 500)
+            metrics.API_REQUESTS.inc(method=method, status=status)
+
+
+class _Httplib2Shim(object):
+
+    def __init__(self, pool, selector):
+        self.pool = pool
+        self.selector = selector
+        self.on_unauthorized = None
+
+    def Http(self, *args, **kwargs):
+        return PooledHttp(self.pool, self.selector, self.on_unauthorized)
+
+    def get_endpoint_stats(self):
+        return self.selector.get_stats()
+
+    def get_latency(self):
+        return self.selector.latency()
+
+    def __getattr__(self, name):
+        return getattr(httplib2, name)
+
+
+def install(conf):
+    """Make midonetclient send its requests through a connection pool."""
+    pool = HttpPool(conf.http_pool_size, conf.http_idle_timeout,
+                    conf.http_request_timeout or None)
+    if 0 < conf.api_call_deadline <= conf.http_request_timeout:
+        LOG.warn(_("http_request_timeout is not below api_call_deadline: "
+                   "unresponsive MidoNet API servers are not retried"))
+    selector = endpoints.EndpointSelector(conf.midonet_uri,
+                                          conf.endpoint_strategy,
+                                          conf.endpoint_eject_time)
+    shim = _Httplib2Shim(pool, selector)
+    api_lib.httplib2 = shim
+    LOG.debug(_("MidoNet API client uses a pool of %d HTTP connections"),
+              conf.http_pool_size)
+    return shim
@@ -0,0 +1,190 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Per-tenant admission control of the plugin write operations.
+
+Each tenant may run a limited number of writes at once, and start them at a
+limited rate from a token bucket.  A tenant over its limits is rejected at
+once, or waits for its turn in its own queue for up to a timeout, so that a
+tenant flooding the API only slows itself down.  The limits of all tenants
+shrink multiplicatively while the MidoNet API latency is above its target
+and grow back additively once it is below.  Limits are per API worker.
+"""
+
+import collections
+import contextlib
+import os
+import threading
+import time
+
+import eventlet
+from eventlet import event
+
+from neutron.common import exceptions as n_exc
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
+
+LOG = logging.getLogger(__name__)
+
+_MIN_FACTOR = 0.1
+_FACTOR_STEP = 0.1
+
+
+class TenantThrottled(n_exc.ServiceUnavailable):
+    message = _("Too many write requests from tenant %(tenant_id)s, "
+                "retry later")
+
+
+class _Tenant(object):
+
+    def __init__(self, tokens):
+        self.active = 0
+        self.tokens = tokens
+        self.last = time.time()
+        self.waiters = collections.deque()
+
+
+class AdmissionController(object):
+
+    def __init__(self, conf, latency):
+        self._concurrency = conf.admission_concurrency
+        self._rate = conf.admission_rate
+        self._burst = max(1, conf.admission_burst)
+        self._queue_timeout = conf.admission_queue_timeout
+        self._target = conf.admission_target_latency
+        self._interval = conf.admission_adapt_interval
+        self._latency = latency
+        self.enabled = bool(self._concurrency or self._rate)
+        self.factor = 1.0
+        self._tenants = {}
+        self._local = threading.local()
+        self._timer = None
+        self._pid = None
+
+    def _start(self):
+        """Start adapting the limits in this process, on first use, so
+        that API workers forked after the plugin was loaded do it too.
+        """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._timer = loopingcall.FixedIntervalLoopingCall(self.adapt)
+        self._timer.start(interval=self._interval)
+
+    def adapt(self):
+        latency = self._latency()
+        if latency is None:
+            return
+        if latency > self._target:
+            factor = max(_MIN_FACTOR, self.factor / 2)
+            if factor < self.factor:
+                LOG.info(_("MidoNet API latency %(latency).3fs over target, "
+                           "lowering tenant write limits to %(factor)d%%"),
+                         {'latency': latency, 'factor': factor * 100})
+        else:
+            factor = min(1.0, self.factor + _FACTOR_STEP)
+        self.factor = factor
+
+        # Forget idle tenants
+        for tenant_id, tenant in self._tenants.items():
+            self._refill(tenant)
+            if (not tenant.active and not tenant.waiters and
+                    tenant.tokens >= self._burst):
+                del self._tenants[tenant_id]
+
+    def _refill(self, tenant):
+        now = time.time()
+        if self._rate:
+            tenant.tokens = min(self._burst, tenant.tokens +
+                                (now - tenant.last) * self._rate *
+                                self.factor)
+        tenant.last = now
+
+    def _concurrency_limit(self):
+        return max(1, int(self._concurrency * self.factor))
+
+    def _try_acquire(self, tenant):
+        """Return 0 if admitted, else the seconds to wait for a token, or
+        None to wait for a running request to end.
+        """
+        if self._concurrency and tenant.active >= self._concurrency_limit():
+            return None
+        if self._rate:
+            self._refill(tenant)
+            if tenant.tokens < 1:
+                return (1 - tenant.tokens) / (self._rate * self.factor)
+            tenant.tokens -= 1
+        tenant.active += 1
+        return 0
+
+    def _acquire(self, tenant_id, tenant):
+        deadline = time.time() + self._queue_timeout
+        while True:
+            # Queued requests of the tenant go first
+            wait = None if tenant.waiters else self._try_acquire(tenant)
+            if wait == 0:
+                return
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TenantThrottled(tenant_id=tenant_id)
+
+            if wait is None:
+                waiter = event.Event()
+                tenant.waiters.append(waiter)
+                try:
+                    with eventlet.Timeout(remaining, False):
+                        waiter.wait()
+                finally:
+                    if waiter in tenant.waiters:
+                        tenant.waiters.remove(waiter)
+                if waiter.ready():
+                    # Our turn: the waker does not hand over its slot
+                    wait = self._try_acquire(tenant)
+                    if wait == 0:
+                        return
+                    self._wake(tenant)
+            if wait:
+                eventlet.sleep(min(wait, remaining))
+
+    def _wake(self, tenant):
+        if tenant.waiters:
+            tenant.waiters.popleft().send()
+
+    @contextlib.contextmanager
+    def admit(self, tenant_id):
+        """Run a write of tenant_id within the tenant's limits.
+
+        Writes of a tenant made while one of its writes is running, e.g.
+        create_port called from create_router, are not admitted again.
+        """
+        if (not self.enabled or tenant_id is None or
+                getattr(self._local, 'admitted', False)):
+            yield
+            return
+
+        self._start()
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            tenant = self._tenants[tenant_id] = _Tenant(self._burst)
+        self._acquire(tenant_id, tenant)
+        self._local.admitted = True
+        try:
+            yield
+        finally:
+            self._local.admitted = False
+            tenant.active -= 1
+            self._wake(tenant)
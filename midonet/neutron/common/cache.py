@@ -0,0 +1,313 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import copy
+import functools
+import time
+import zlib
+
+from neutron.common import exceptions as n_exc
+from neutron.openstack.common import log as logging
+
+from midonet.neutron.db import cache_db
+
+LOG = logging.getLogger(__name__)
+
+# Resources the ResourceCache holds, with the attribute their cached lists
+# are invalidated by
+RESOURCES = ('network', 'subnet', 'port')
+LIST_KEYS = {'network': 'id', 'subnet': 'network_id', 'port': 'network_id'}
+
+# Buckets the IDs of a resource, and the list keys after them, are hashed
+# into for their generations
+BUCKETS = 64
+
+DEFAULT_SECURITY_GROUP = 'default_security_group'
+
+
+def create_tables(session):
+    """Create the generation rows of the plugin caches."""
+    rows = [(DEFAULT_SECURITY_GROUP, cache_db.ALL)]
+    for resource in RESOURCES:
+        rows.extend((resource, bucket) for bucket in
+                    range(2 * BUCKETS) + [cache_db.ALL, cache_db.LISTS])
+    cache_db.create_table(session, rows)
+
+
+class DefaultSecurityGroupCache(object):
+    """IDs of the default security group of each tenant.
+
+    Deleting a default group bumps a generation in the DB, which each
+    process checks at most every interval seconds, dropping all its entries
+    when it changed.
+    """
+
+    def __init__(self, interval=1):
+        self._interval = interval
+        self._groups = {}
+        self._generation = None
+        self._checked = 0
+
+    def get(self, context, tenant_id):
+        now = time.time()
+        if now - self._checked >= self._interval:
+            generation = cache_db.get_generations(
+                context.session, DEFAULT_SECURITY_GROUP,
+                [cache_db.ALL])[cache_db.ALL]
+            if generation != self._generation:
+                self._groups.clear()
+                self._generation = generation
+            self._checked = now
+        return self._groups.get(tenant_id)
+
+    def set(self, tenant_id, sg_id):
+        self._groups[tenant_id] = sg_id
+
+    def invalidate(self, context, tenant_id):
+        """Drop a tenant's entry here and in the other processes."""
+        self._groups.pop(tenant_id, None)
+        cache_db.bump(context.session, DEFAULT_SECURITY_GROUP,
+                      [cache_db.ALL])
+
+
+def _filters_key(filters):
+    """Return a hashable key for a filter dict, or None if it has none."""
+    try:
+        return frozenset((name, frozenset(values))
+                         for name, values in (filters or {}).items())
+    except TypeError:
+        return None
+
+
+class ResourceCache(object):
+    """LRU cache of the resource dicts read from the Neutron DB.
+
+    Resources are cached whole, by ID and by the filters of the list query
+    that returned them, and the fields asked for are picked from a copy on
+    each read, so that cached dicts are never handed out.  Reads made in a
+    transaction bypass the cache: they must see the transaction's own
+    changes, which may still roll back.
+
+    Every write of a resource through the plugin bumps, in the DB, the
+    generation of the bucket its ID hashes into and that of the bucket its
+    list key, the network of a port or subnet, hashes into.  A cached entry
+    is served only after checking, with a single primary key query, that
+    the generations it was read under are unchanged.  A list filtered by
+    list keys checks their buckets only, other lists check all the list
+    buckets, so that no single row is bumped by every write.  The
+    generations are read before the resource, so that a read racing with a
+    write stores an entry that is already stale.
+
+    The bump is made once the write method returns, in its own transaction,
+    since the plugin commits its DB changes before calling MidoNet.  Until
+    then, for the duration of its MidoNet calls, other processes may still
+    serve what the write replaced.  Entries also expire after ttl seconds,
+    which bounds how long a lost bump goes unnoticed.
+    """
+
+    def __init__(self, size, ttl):
+        self._size = size
+        self._ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lists = collections.defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _bucket(id):
+        return zlib.crc32(id) % BUCKETS
+
+    @staticmethod
+    def _list_bucket(key):
+        return BUCKETS + zlib.crc32(key) % BUCKETS
+
+    @staticmethod
+    def _generations(context, resource, buckets):
+        generations = cache_db.get_generations(context.session, resource,
+                                               buckets)
+        return tuple(generations[bucket] for bucket in buckets)
+
+    def _lookup(self, key, generations):
+        entry = self._entries.pop(key, None)
+        if (entry is None or entry[0] < time.time() or
+                entry[1] != generations):
+            self.misses += 1
+            return None
+        # Most recently used entries go last
+        self._entries[key] = entry
+        self.hits += 1
+        return entry[2]
+
+    def _store(self, key, value, generations):
+        self._entries.pop(key, None)
+        self._entries[key] = (time.time() + self._ttl, generations, value)
+        if len(key) > 2:
+            self._lists[key[0]].add(key)
+        while len(self._entries) > self._size:
+            old_key = self._entries.popitem(last=False)[0]
+            self._lists[old_key[0]].discard(old_key)
+
+    @staticmethod
+    def _in_transaction(context):
+        return context.session.transaction is not None
+
+    def get(self, context, resource, id, fetch, fields=None):
+        """Return a resource, from the cache or from fetch(id).
+
+        A non admin context is only served the resources of its tenant
+        from the cache; anything else is left to fetch, which applies the
+        DB visibility rules.
+        """
+        if self._in_transaction(context):
+            return fetch(id, fields)
+
+        key = (resource, id)
+        generations = self._generations(
+            context, resource, (self._bucket(id), cache_db.ALL))
+        obj = self._lookup(key, generations)
+        if obj is None or not (context.is_admin or
+                               obj.get('tenant_id') == context.tenant_id):
+            obj = fetch(id, None)
+            self._store(key, obj, generations)
+        return _pick_fields(obj, fields)
+
+    def get_list(self, context, resource, filters, fetch, fields=None):
+        """Return the resources matching filters, from the cache or from
+        fetch(filters).
+
+        Lists are cached per tenant for non admin contexts.
+        """
+        filters_key = _filters_key(filters)
+        if filters_key is None or self._in_transaction(context):
+            return fetch(filters, fields)
+
+        scope = None if context.is_admin else context.tenant_id
+        key = (resource, scope, filters_key)
+        list_keys = (filters or {}).get(LIST_KEYS[resource])
+        if list_keys:
+            buckets = set(self._list_bucket(list_key)
+                          for list_key in list_keys)
+        else:
+            buckets = range(BUCKETS, 2 * BUCKETS)
+        generations = self._generations(
+            context, resource, sorted(buckets) + [cache_db.LISTS])
+        objs = self._lookup(key, generations)
+        if objs is None:
+            objs = fetch(filters, None)
+            self._store(key, objs, generations)
+        return [_pick_fields(obj, fields) for obj in objs]
+
+    def _drop(self, resource, ids):
+        for key in self._lists.pop(resource, ()):
+            self._entries.pop(key, None)
+        if ids is None:
+            for key in [key for key in self._entries if key[0] == resource]:
+                del self._entries[key]
+        else:
+            for id in ids:
+                self._entries.pop((resource, id), None)
+
+    def invalidate(self, context, resource, ids=None, list_keys=None):
+        """Drop resources here and in the other processes.
+
+        All the resources of the type are dropped if ids is None, and all
+        its lists if list_keys, the list keys of the resources, is None.
+        """
+        if ids is None:
+            buckets = [cache_db.ALL]
+        else:
+            buckets = [self._bucket(id) for id in ids]
+        if ids is None or list_keys is None:
+            buckets.append(cache_db.LISTS)
+        else:
+            buckets.extend(self._list_bucket(list_key)
+                           for list_key in list_keys)
+        cache_db.bump(context.session, resource, buckets)
+        self._drop(resource, ids)
+
+    def get_stats(self):
+        return {'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses}
+
+
+def _pick_fields(obj, fields):
+    if fields:
+        obj = dict((key, obj[key]) for key in fields if key in obj)
+    return copy.deepcopy(obj)
+
+
+def _list_keys(plugin, context, resource, objs=None, id=None):
+    """Return the list keys of the given resources, or of the one with the
+    given ID, or None if unknown.
+    """
+    attr = LIST_KEYS[resource]
+    if objs is not None:
+        return [obj[attr] for obj in objs]
+    if attr == 'id':
+        return [id]
+    try:
+        # Read before the write since a deleted resource is gone after it
+        return [getattr(plugin, '_get_%s' % resource)(context, id)[attr]]
+    except n_exc.NotFound:
+        return None
+
+
+def invalidates(resource, cascade=(), precise=True):
+    """Drop the cached entries written by the decorated plugin method.
+
+    The IDs are taken from the resources returned by create methods and
+    from the argument following the context otherwise.  All the resources
+    of the type are dropped when precise is False, or if a create fails
+    since what it may have committed before rolling back is unknown.  The
+    types listed in cascade are dropped whole as well, except the networks
+    of subnets and ports, which are dropped by ID.
+    """
+    def decorator(fn):
+        creates = fn.__name__.startswith('create_')
+
+        @functools.wraps(fn)
+        def wrapped(self, context, *args, **kwargs):
+            if self.resource_cache is None:
+                return fn(self, context, *args, **kwargs)
+
+            ids = list_keys = None
+            if precise and not creates:
+                ids = [args[0]]
+                list_keys = _list_keys(self, context, resource, id=args[0])
+            try:
+                result = fn(self, context, *args, **kwargs)
+                if precise and creates:
+                    objs = result if isinstance(result, list) else [result]
+                    ids = [obj['id'] for obj in objs]
+                    list_keys = _list_keys(self, context, resource, objs)
+                return result
+            finally:
+                with context.session.begin(subtransactions=True):
+                    self.resource_cache.invalidate(context, resource, ids,
+                                                   list_keys)
+                    for other in cascade:
+                        if (other == 'network' and ids is not None and
+                                list_keys is not None and
+                                LIST_KEYS[resource] == 'network_id'):
+                            self.resource_cache.invalidate(
+                                context, other, list_keys, list_keys)
+                        else:
+                            self.resource_cache.invalidate(context, other)
+        return wrapped
+    return decorator
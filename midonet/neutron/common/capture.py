@@ -0,0 +1,151 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Capture of the plugin calls, to be replayed by tools/replay.py.
+
+Each call the Neutron API makes to a public plugin method is appended to the
+capture file as one compact JSON line:
+
+    t  start time of the call
+    d  duration of the call in seconds
+    m  method name
+    c  tenant_id, user_id and is_admin of the request context
+    a  positional arguments after the context
+    k  keyword arguments
+    r  IDs of the resources created by the call, if any
+    e  class name of the exception raised by the call, if any
+
+Calls the plugin makes to its own methods are not recorded.  The context is
+reduced to the fields above and secrets are blanked out.
+"""
+
+import functools
+import os
+import threading
+import time
+
+from neutron.api.v2 import attributes
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# Stands for attributes.ATTR_NOT_SPECIFIED in the capture file
+NOT_SPECIFIED = '__not_specified__'
+
+_SECRET_KEYS = ('password', 'auth_token', 'token', 'secret')
+
+_CAPTURED_PREFIXES = ('create_', 'update_', 'delete_', 'get_', 'add_',
+                      'remove_')
+
+
+def encode(value):
+    """Return a JSON compatible copy of a plugin call argument."""
+    if value is attributes.ATTR_NOT_SPECIFIED:
+        return NOT_SPECIFIED
+    if isinstance(value, dict):
+        return dict((k, '***' if k in _SECRET_KEYS else encode(v))
+                    for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return [encode(v) for v in value]
+    if value is None or isinstance(value, (basestring, bool, int, long,
+                                           float)):
+        return value
+    return str(value)
+
+
+def decode(value):
+    """Revert encode() for a plugin call argument read from a capture."""
+    if value == NOT_SPECIFIED:
+        return attributes.ATTR_NOT_SPECIFIED
+    if isinstance(value, dict):
+        return dict((k, decode(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [decode(v) for v in value]
+    return value
+
+
+def created_ids(result):
+    if isinstance(result, dict) and 'id' in result:
+        return [result['id']]
+    if isinstance(result, list):
+        return [item['id'] for item in result
+                if isinstance(item, dict) and 'id' in item]
+    return []
+
+
+class CallRecorder(object):
+
+    def __init__(self, path):
+        self._path = path
+        self._fd = None
+        self._local = threading.local()
+
+    def wrap(self, method):
+        @functools.wraps(method)
+        def wrapped(context, *args, **kwargs):
+            depth = getattr(self._local, 'depth', 0)
+            if depth or not hasattr(context, 'tenant_id'):
+                return method(context, *args, **kwargs)
+
+            self._local.depth = 1
+            start = time.time()
+            record = {'t': start,
+                      'm': method.__name__,
+                      'c': {'tenant_id': context.tenant_id,
+                            'user_id': context.user_id,
+                            'is_admin': context.is_admin},
+                      'a': encode(args),
+                      'k': encode(kwargs)}
+            try:
+                result = method(context, *args, **kwargs)
+                if record['m'].startswith('create_'):
+                    record['r'] = created_ids(result)
+                return result
+            except Exception as e:
+                record['e'] = e.__class__.__name__
+                raise
+            finally:
+                self._local.depth = 0
+                record['d'] = time.time() - start
+                self._write(record)
+        return wrapped
+
+    def _write(self, record):
+        line = jsonutils.dumps(record, separators=(',', ':')) + '\n'
+        try:
+            if self._fd is None:
+                self._fd = os.open(self._path,
+                                   os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                                   0o600)
+            os.write(self._fd, line)
+        except OSError as e:
+            LOG.warn(_("Failed to write MidoNet plugin call capture to "
+                       "%(path)s: %(err)s"), {'path': self._path, 'err': e})
+
+
+def install(plugin, path):
+    """Record the calls to the public methods of a plugin instance."""
+    recorder = CallRecorder(path)
+    for name in dir(plugin):
+        if not name.startswith(_CAPTURED_PREFIXES):
+            continue
+        method = getattr(plugin, name)
+        if callable(method):
+            setattr(plugin, name, recorder.wrap(method))
+    LOG.info(_("Capturing MidoNet plugin calls to %s"), path)
+    return recorder
@@ -21,8 +21,9 @@
 from oslo.config import cfg
 
 midonet_opts = [
-    cfg.StrOpt('midonet_uri', default='http://localhost:8080/midonet-api',
-               help=_('MidoNet API server URI.')),
+    cfg.ListOpt('midonet_uri', default=['http://localhost:8080/midonet-api'],
+                help=_('Comma separated list of MidoNet API server URIs. '
+                       'Requests are spread over all of them.')),
     cfg.StrOpt('username', default='admin',
                help=_('MidoNet admin username.')),
     cfg.StrOpt('password', default='passw0rd',
@@ -32,6 +33,174 @@ midonet_opts = [
                default='77777777-7777-7777-7777-777777777777',
                help=_('ID of the project that MidoNet admin user'
                       'belongs to.')),
+    cfg.BoolOpt('use_journal', default=False,
+                help=_('Record MidoNet changes in a journal table within the '
+                       'Neutron DB transaction and push them to the MidoNet '
+                       'API asynchronously.')),
+    cfg.IntOpt('journal_workers', default=4,
+               help=_('Number of green threads replaying journal entries '
+                      'to the MidoNet API.')),
+    cfg.IntOpt('journal_sync_interval', default=2,
+               help=_('Interval in seconds between journal sync passes.')),
+    cfg.IntOpt('journal_batch_size', default=100,
+               help=_('Maximum number of journal entries fetched per sync '
+                      'pass.')),
+    cfg.IntOpt('journal_max_retries', default=5,
+               help=_('Number of times a journal entry is retried before it '
+                      'is marked as failed. A failed entry holds back the '
+                      'later entries of its object until it is retried or '
+                      'skipped by an operator.')),
+    cfg.IntOpt('journal_processing_timeout', default=300,
+               help=_('Seconds after which a journal entry left in '
+                      'processing state is considered abandoned and is '
+                      'retried.')),
+    cfg.StrOpt('lock_backend', default='file',
+               help=_("Backend of the per-network locks: 'file' for "
+                      "external file locks on a single host, or 'db' for "
+                      "database advisory locks shared by several API "
+                      "hosts.")),
+    cfg.IntOpt('lock_stripes', default=256,
+               help=_('Number of locks that network and port keys are '
+                      'hashed into.')),
+    cfg.FloatOpt('lock_poll_interval', default=0.05,
+                 help=_('Seconds between attempts to take a busy database '
+                        'lock.')),
+    cfg.BoolOpt('lock_profiling', default=False,
+                help=_('Record how long each plugin method waits for and '
+                       'holds the MidoNet resource locks, and who holds '
+                       'them. Reports are logged on SIGUSR2.')),
+    cfg.IntOpt('api_call_deadline', default=30,
+               help=_('Seconds a MidoNet API call may take before it is '
+                      'abandoned and counted as a failure.')),
+    cfg.DictOpt('api_call_deadlines', default={},
+                help=_('Deadlines overriding api_call_deadline for some '
+                       'client operations, e.g. '
+                       'create_security_group_rule_bulk:60.')),
+    cfg.IntOpt('breaker_failure_threshold', default=5,
+               help=_('Consecutive failed MidoNet API calls after which '
+                      'calls fail at once.')),
+    cfg.IntOpt('breaker_reset_timeout', default=30,
+               help=_('Seconds after which a single MidoNet API call is '
+                      'tried again once calls fail at once.')),
+    cfg.StrOpt('degraded_mode', default='fail',
+               help=_("What writes do while the MidoNet API is unavailable: "
+                      "'fail' at once, or 'queue' their MidoNet calls in "
+                      "the journal to be replayed when it is back.")),
+    cfg.IntOpt('admission_concurrency', default=0,
+               help=_('Write operations a tenant may run at once in an API '
+                      'worker. 0 means no limit.')),
+    cfg.FloatOpt('admission_rate', default=0,
+                 help=_('Write operations per second a tenant may start in '
+                        'an API worker. 0 means no limit.')),
+    cfg.IntOpt('admission_burst', default=10,
+               help=_('Write operations a tenant may start at once over '
+                      'admission_rate.')),
+    cfg.FloatOpt('admission_queue_timeout', default=0,
+                 help=_('Seconds a write operation of a tenant over its '
+                        'limits waits for its turn before being rejected. '
+                        '0 rejects it at once.')),
+    cfg.FloatOpt('admission_target_latency', default=0.5,
+                 help=_('MidoNet API latency in seconds above which the '
+                        'tenant limits are lowered.')),
+    cfg.IntOpt('admission_adapt_interval', default=5,
+               help=_('Seconds between adjustments of the tenant limits to '
+                      'the MidoNet API latency.')),
+    cfg.StrOpt('auth_token_cache', default='$state_path/midonet_token',
+               help=_('File the MidoNet API token is shared through by the '
+                      'Neutron server processes of a host. It is created '
+                      'readable by its owner only.')),
+    cfg.IntOpt('auth_refresh_margin', default=300,
+               help=_('Seconds before its expiry a MidoNet API token is '
+                      'replaced. Tokens are refreshed in the background '
+                      'ahead of this margin.')),
+    cfg.IntOpt('http_pool_size', default=8,
+               help=_('Maximum number of persistent HTTP connections to the '
+                      'MidoNet API kept by each Neutron server process.')),
+    cfg.IntOpt('http_idle_timeout', default=60,
+               help=_('Seconds after which an idle connection to the '
+                      'MidoNet API is closed instead of being reused.')),
+    cfg.IntOpt('http_request_timeout', default=10,
+               help=_('Seconds without an answer after which a MidoNet API '
+                      'server is ejected and an idempotent request is sent '
+                      'to the next server. Keep it below '
+                      'api_call_deadline. 0 disables it.')),
+    cfg.IntOpt('fanout_workers', default=8,
+               help=_('Independent MidoNet calls of a batch, such as the '
+                      'creations of a bulk request or reconciliation '
+                      'repairs, made at once. 1 makes them one by one.')),
+    cfg.StrOpt('endpoint_strategy', default='round_robin',
+               help=_("How requests are spread over the MidoNet API "
+                      "servers: 'round_robin' or 'least_outstanding'.")),
+    cfg.IntOpt('endpoint_eject_time', default=30,
+               help=_('Seconds during which a MidoNet API server that '
+                      'timed out or returned a server error is not used.')),
+    cfg.IntOpt('reconcile_interval', default=0,
+               help=_('Seconds between two passes comparing the Neutron DB '
+                      'with MidoNet and repairing divergences. 0 disables '
+                      'reconciliation.')),
+    cfg.FloatOpt('reconcile_rate', default=5.0,
+                 help=_('Maximum number of MidoNet API calls per second '
+                        'made by the reconciliation.')),
+    cfg.IntOpt('reconcile_full_every', default=10,
+               help=_('Reconciliation passes between two full listings of '
+                      'the MidoNet resources. The other passes only fetch '
+                      'the resources whose Neutron side changed.')),
+    cfg.BoolOpt('reconcile_delete_orphans', default=False,
+                help=_('Delete MidoNet resources that do not exist in '
+                       'Neutron instead of only logging them.')),
+    cfg.StrOpt('log_payload_mode', default='full',
+               help=_("How request and response payloads of the plugin "
+                      "methods are logged: 'full' or 'summary', which "
+                      "reduces resources to their IDs.")),
+    cfg.IntOpt('log_max_payload_length', default=0,
+               help=_('Maximum length of a logged payload. 0 means no '
+                      'limit.')),
+    cfg.FloatOpt('log_sample_rate', default=1.0,
+                 help=_('Fraction of the plugin method calls whose entry '
+                        'and exit are logged.')),
+    cfg.IntOpt('latency_samples', default=1000,
+               help=_('Number of latest samples kept per plugin operation '
+                      'and phase to compute latency percentiles. 0 disables '
+                      'latency recording.')),
+    cfg.StrOpt('metrics_dir',
+               help=_('Directory, usually the one read by the node exporter '
+                      'textfile collector, where each Neutron server process '
+                      'writes its metrics in Prometheus text format. Metrics '
+                      'are not exported if unset.')),
+    cfg.IntOpt('metrics_interval', default=15,
+               help=_('Interval in seconds between two metrics exports.')),
+    cfg.StrOpt('trace_file',
+               help=_('File the traces of the plugin operations and of their '
+                      'MidoNet API requests are appended to, in Zipkin v2 '
+                      'JSON format with one span per line. Operations are '
+                      'not traced if unset.')),
+    cfg.FloatOpt('trace_sample_rate', default=1.0,
+                 help=_('Fraction of the traced plugin operations that are '
+                        'written to trace_file. Trace headers are sent to '
+                        'the MidoNet API for all of them.')),
+    cfg.IntOpt('resource_cache_size', default=0,
+               help=_('Number of networks, subnets, ports and port lists '
+                      'read from the Neutron DB kept in the cache of each '
+                      'Neutron server process. 0 disables the cache.')),
+    cfg.IntOpt('resource_cache_ttl', default=30,
+               help=_('Seconds after which a cached resource is read from '
+                      'the Neutron DB again.')),
+    cfg.FloatOpt('port_update_window', default=0,
+                 help=_('Seconds during which successive updates of a port '
+                        'are merged into a single MidoNet update carrying '
+                        'its final state. The update is recorded in the '
+                        'journal and replayed by the journal worker once '
+                        'the window is over. 0 pushes each update in its '
+                        'own transaction.')),
+    cfg.BoolOpt('native_dhcp', default=False,
+                help=_('MidoNet serves DHCP itself. Networks are not '
+                       'scheduled to DHCP agents, DHCP agents are not '
+                       'notified of changes, and the MidoNet DHCP agent '
+                       'only reports its state.')),
+    cfg.StrOpt('capture_file',
+               help=_('File every call made to the plugin is appended to, '
+                      'for tools/replay.py to replay it. Calls are not '
+                      'captured if unset.')),
 ]
 
 
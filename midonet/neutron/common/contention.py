@@ -0,0 +1,121 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Contention profiling of the MidoNet resource locks.
+
+For every lock acquisition the profiler records how long the caller waited
+and how long it then held the locks, per plugin method, and keeps track of
+who holds or waits for each lock right now.  Only the acquisitions made by
+this process are seen; each API worker has to be asked for its own report.
+"""
+
+import collections
+import os
+import time
+
+import eventlet
+
+from neutron.openstack.common import log as logging
+
+from midonet.neutron.common import timing
+
+LOG = logging.getLogger(__name__)
+
+WAIT = 'wait'
+HOLD = 'hold'
+
+
+class Acquisition(object):
+
+    def __init__(self, owner, locks):
+        self.owner = owner or 'unknown'
+        self.locks = locks
+        self.thread = id(eventlet.getcurrent())
+        self.requested = time.time()
+        self.acquired = None
+
+    def describe(self, now):
+        desc = {'owner': self.owner,
+                'locks': self.locks,
+                'pid': os.getpid(),
+                'thread': '%x' % self.thread}
+        if self.acquired is None:
+            desc['waiting_for'] = now - self.requested
+        else:
+            desc['held_for'] = now - self.acquired
+        return desc
+
+
+class ContentionProfiler(object):
+
+    def __init__(self, samples=1000):
+        self._samples = samples
+        self._histograms = {}
+        self._active = set()
+
+    def _record(self, owner, kind, value):
+        key = (owner, kind)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = timing.Histogram(
+                self._samples)
+        histogram.add(value)
+
+    def waiting(self, owner, locks):
+        acquisition = Acquisition(owner, locks)
+        self._active.add(acquisition)
+        return acquisition
+
+    def acquired(self, acquisition):
+        acquisition.acquired = time.time()
+        self._record(acquisition.owner, WAIT,
+                     acquisition.acquired - acquisition.requested)
+
+    def released(self, acquisition):
+        self._active.discard(acquisition)
+        if acquisition.acquired is not None:
+            self._record(acquisition.owner, HOLD,
+                         time.time() - acquisition.acquired)
+
+    def get_stats(self):
+        """Return the wait and hold time percentiles of each owner."""
+        stats = collections.defaultdict(dict)
+        for (owner, kind), histogram in self._histograms.items():
+            stats[owner][kind] = histogram.get_stats()
+        return dict(stats)
+
+    def get_holders(self):
+        """Return who holds or waits for the locks at this moment."""
+        now = time.time()
+        return sorted((acquisition.describe(now)
+                       for acquisition in self._active),
+                      key=lambda desc: desc['locks'])
+
+    def dump(self):
+        for owner, kinds in sorted(self.get_stats().items()):
+            for kind, stats in sorted(kinds.items()):
+                LOG.info(_("Lock %(kind)s of %(owner)s: count=%(count)d "
+                           "p50=%(p50)s p95=%(p95)s p99=%(p99)s"),
+                         dict(stats, kind=kind, owner=owner))
+        for holder in self.get_holders():
+            if 'held_for' in holder:
+                LOG.info(_("%(locks)s held by %(owner)s (pid %(pid)d, "
+                           "thread %(thread)s) for %(held_for).3fs"), holder)
+            else:
+                LOG.info(_("%(locks)s waited for by %(owner)s (pid %(pid)d, "
+                           "thread %(thread)s) for %(waiting_for).3fs"),
+                         holder)
@@ -0,0 +1,85 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Concurrent execution of independent MidoNet calls.
+
+The calls of a batch run in green threads of a pool bounded by
+fanout_workers, so that the batch takes about as long as its slowest call.
+The functions called must not use the database session of the caller, which
+cannot be shared between green threads.
+"""
+
+import eventlet
+
+from neutron.common import exceptions as n_exc
+
+from midonet.neutron.common import timing
+from midonet.neutron.common import tracing
+
+
+class FanoutError(n_exc.NeutronException):
+    message = _("%(failed)d of %(total)d MidoNet calls failed: %(errors)s")
+
+    def __init__(self, results, errors):
+        # Results in the order of the items, None for the failed calls, and
+        # the (index, exception) pairs of the failed calls in index order
+        self.results = results
+        self.errors = errors
+        super(FanoutError, self).__init__(
+            failed=len(errors), total=len(results),
+            errors='; '.join(str(e) for i, e in errors))
+
+
+class Executor(object):
+
+    def __init__(self, size):
+        self.size = size
+
+    def map(self, fn, items):
+        """Call fn on each item and return the results in item order.
+
+        All the calls are made even if some fail; FanoutError is then
+        raised once they have all ended.
+        """
+        items = list(items)
+        results = [None] * len(items)
+        errors = []
+        parent = tracing.tracer.current()
+
+        def call(index):
+            with tracing.tracer.adopt(parent):
+                try:
+                    results[index] = fn(items[index])
+                except Exception as e:
+                    errors.append((index, e))
+
+        if self.size <= 1 or len(items) <= 1:
+            for index in range(len(items)):
+                call(index)
+        else:
+            # The phases of the green threads are not recorded, so the
+            # batch counts as MidoNet time as a whole
+            with timing.recorder.phase(timing.MIDONET):
+                pool = eventlet.GreenPool(min(self.size, len(items)))
+                for index in range(len(items)):
+                    pool.spawn_n(call, index)
+                pool.waitall()
+
+        if errors:
+            errors.sort(key=lambda error: error[0])
+            raise FanoutError(results, errors)
+        return results
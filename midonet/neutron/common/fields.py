@@ -0,0 +1,71 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Fields of the Neutron resources that MidoNet acts upon.
+
+An update that leaves all of them unchanged does not need to be pushed to
+MidoNet.
+"""
+
+from neutron.extensions import external_net
+from neutron.extensions import l3
+from neutron.extensions import securitygroup as ext_sg
+
+MIDONET_FIELDS = {
+    'network': ('admin_state_up', 'shared', external_net.EXTERNAL),
+    'subnet': ('cidr', 'gateway_ip', 'enable_dhcp', 'dns_nameservers',
+               'host_routes', 'allocation_pools'),
+    'port': ('admin_state_up', 'mac_address', 'fixed_ips',
+             ext_sg.SECURITYGROUPS),
+    'router': ('admin_state_up', l3.EXTERNAL_GW_INFO, 'routes'),
+    'floatingip': ('floating_ip_address', 'port_id', 'fixed_ip_address',
+                   'router_id'),
+    'vip': ('admin_state_up', 'address', 'protocol_port', 'pool_id',
+            'session_persistence', 'connection_limit'),
+    'pool': ('admin_state_up', 'lb_method', 'protocol', 'subnet_id',
+             'health_monitors'),
+    'member': ('admin_state_up', 'address', 'protocol_port', 'weight',
+               'pool_id'),
+    'security_group': ('tenant_id',),
+    'security_group_rule': ('security_group_id', 'direction', 'ethertype',
+                            'protocol', 'port_range_min', 'port_range_max',
+                            'remote_ip_prefix', 'remote_group_id'),
+}
+
+# List fields whose order is meaningful; all the others are compared as sets
+_ORDERED_FIELDS = ('dns_nameservers',)
+
+
+def _normalize(value, ordered=False):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        values = [_normalize(v) for v in value]
+        return tuple(values if ordered else sorted(values))
+    return value
+
+
+def project(resource, obj):
+    """Return the part of a resource dict that MidoNet acts upon."""
+    return dict((field, _normalize(obj.get(field),
+                                   ordered=field in _ORDERED_FIELDS))
+                for field in MIDONET_FIELDS[resource])
+
+
+def is_noop(resource, before, after):
+    """Tell whether an update changed nothing MidoNet acts upon."""
+    return project(resource, before) == project(resource, after)
@@ -0,0 +1,232 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+import errno
+import fcntl
+import os
+import threading
+import time
+import zlib
+
+import eventlet
+from oslo.config import cfg
+import sqlalchemy as sa
+
+from neutron.common import exceptions as n_exc
+from neutron.db import api as db
+from neutron.openstack.common import lockutils
+from neutron.openstack.common import log as logging
+
+from midonet.neutron.common import contention
+from midonet.neutron.common import metrics
+from midonet.neutron.common import timing
+
+LOG = logging.getLogger(__name__)
+
+LOCK_PREFIX = 'midonet-'
+
+
+class FileLockBackend(object):
+    """External file locks, valid between processes of a single host."""
+
+    def __init__(self, conf):
+        pass
+
+    def lock(self, names):
+        return contextlib.nested(*[
+            lockutils.lock(name, lock_file_prefix='neutron-', external=True)
+            for name in names])
+
+    @contextlib.contextmanager
+    def try_lock(self, name):
+        lock_path = cfg.CONF.lock_path
+        if not lock_path:
+            raise cfg.RequiredOptError('lock_path')
+        with open(os.path.join(lock_path, 'neutron-%s' % name), 'a') as f:
+            try:
+                fcntl.lockf(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError as ex:
+                if ex.errno not in (errno.EACCES, errno.EAGAIN):
+                    raise
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.lockf(f, fcntl.LOCK_UN)
+
+
+class DbLockBackend(object):
+    """Database advisory locks, valid between hosts sharing the Neutron DB.
+
+    The locks taken together are held on a single dedicated connection for
+    as long as they are taken, so that a caller holds one pooled connection
+    however many locks it takes.  Only one green thread per process waits
+    on a given lock, and it polls the database without blocking so that the
+    holder, which may live in the same process, is not starved by a
+    blocking database driver.
+    """
+
+    def __init__(self, conf):
+        self._poll_interval = conf.lock_poll_interval
+        self._semaphores = {}
+        self._checked = False
+
+    def _semaphore(self, name):
+        return self._semaphores.setdefault(name, threading.Semaphore())
+
+    def _check(self, conn):
+        """Refuse MySQL servers that hold a single named lock per session."""
+        if self._checked:
+            return
+        version = conn.dialect.server_version_info
+        if (conn.dialect.name == 'mysql' and version is not None and
+                version < (5, 7)):
+            LOG.error(_("The 'db' lock backend needs MySQL 5.7 or later to "
+                        "hold several locks on one connection"))
+            raise n_exc.InvalidConfigurationOption(opt_name='lock_backend',
+                                                   opt_value='db')
+        self._checked = True
+
+    @contextlib.contextmanager
+    def lock(self, names):
+        with contextlib.nested(*[self._semaphore(name) for name in names]):
+            conn = db.get_session().get_bind().connect()
+            acquired = []
+            try:
+                self._check(conn)
+                for name in names:
+                    while not self._try_acquire(conn, name):
+                        eventlet.sleep(self._poll_interval)
+                    acquired.append(name)
+                yield
+            finally:
+                try:
+                    for name in reversed(acquired):
+                        self._release(conn, name)
+                finally:
+                    conn.close()
+
+    @contextlib.contextmanager
+    def try_lock(self, name):
+        conn = db.get_session().get_bind().connect()
+        try:
+            if not self._try_acquire(conn, name):
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                self._release(conn, name)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _key(name):
+        return zlib.crc32(name) & 0x7fffffff
+
+    def _try_acquire(self, conn, name):
+        if conn.dialect.name == 'postgresql':
+            query = sa.text("SELECT pg_try_advisory_lock(:key)")
+            return conn.execute(query, key=self._key(name)).scalar()
+        query = sa.text("SELECT GET_LOCK(:name, 0)")
+        return conn.execute(query, name=name).scalar() == 1
+
+    def _release(self, conn, name):
+        if conn.dialect.name == 'postgresql':
+            query = sa.text("SELECT pg_advisory_unlock(:key)")
+            conn.execute(query, key=self._key(name))
+        else:
+            conn.execute(sa.text("SELECT RELEASE_LOCK(:name)"), name=name)
+
+
+_BACKENDS = {
+    'file': FileLockBackend,
+    'db': DbLockBackend,
+}
+
+
+class LockManager(object):
+    """Fine grained locks for MidoNet resources.
+
+    Resources are locked by key, and the keys are hashed into a fixed number
+    of stripes so that the number of lock files or DB locks stays bounded.
+    Taking several keys at once, e.g. a network and one of its ports, takes
+    their stripes in a global order so that two callers can never deadlock,
+    and in a single backend call.
+    """
+
+    def __init__(self, conf):
+        backend = _BACKENDS.get(conf.lock_backend)
+        if backend is None:
+            raise n_exc.InvalidConfigurationOption(
+                opt_name='lock_backend', opt_value=conf.lock_backend)
+        self._backend = backend(conf)
+        self._stripes = conf.lock_stripes
+        self.profiler = None
+        if conf.lock_profiling:
+            self.profiler = contention.ContentionProfiler(
+                conf.latency_samples)
+
+    def _stripe(self, key):
+        return zlib.crc32(key) % self._stripes
+
+    @contextlib.contextmanager
+    def lock(self, keys, owner=None):
+        """Lock the given keys on behalf of owner, a plugin method name."""
+        stripes = sorted(set(self._stripe(key) for key in keys))
+        names = ['%s%d' % (LOCK_PREFIX, stripe) for stripe in stripes]
+        acquisition = None
+        if self.profiler is not None:
+            acquisition = self.profiler.waiting(owner, names)
+        start = time.time()
+        metrics.LOCK_WAITERS.inc()
+        waiting = True
+        try:
+            with self._backend.lock(names):
+                metrics.LOCK_WAITERS.dec()
+                waiting = False
+                timing.recorder.add(timing.LOCK, time.time() - start)
+                if acquisition is not None:
+                    self.profiler.acquired(acquisition)
+                yield
+        finally:
+            if waiting:
+                metrics.LOCK_WAITERS.dec()
+            if acquisition is not None:
+                self.profiler.released(acquisition)
+
+    def try_lock(self, name):
+        """Take the lock name if it is free, without waiting.
+
+        The context manager yields whether the lock was taken.  The lock
+        names live apart from the stripes of the resource keys.
+        """
+        return self._backend.try_lock('%s%s' % (LOCK_PREFIX, name))
+
+    def networks(self, network_ids, owner=None):
+        """Lock several networks at once."""
+        return self.lock(['network-%s' % network_id
+                          for network_id in network_ids], owner)
+
+    def network(self, network_id, port_id=None, owner=None):
+        """Lock a network, and optionally one of its ports."""
+        keys = ['network-%s' % network_id]
+        if port_id is not None:
+            keys.append('port-%s' % port_id)
+        return self.lock(keys, owner)
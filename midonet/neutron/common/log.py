@@ -0,0 +1,101 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Entry and exit logging of the plugin methods.
+
+Logging is decided before anything is formatted: a call is only logged if
+the level is enabled and the call is picked by sampling, and its payloads
+are only rendered when the record is actually emitted.
+"""
+
+import functools
+import logging as std_logging
+import random
+
+from oslo.config import cfg
+
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+FULL = 'full'
+SUMMARY = 'summary'
+
+# Number of items of a list shown in summary mode
+_SUMMARY_ITEMS = 5
+
+
+def _summarize(value):
+    if isinstance(value, dict):
+        if 'id' in value:
+            return value['id']
+        if len(value) == 1:
+            # A request body such as {'port': {...}}
+            key, inner = value.items()[0]
+            return {key: _summarize(inner)}
+        return '{%d keys}' % len(value)
+    if isinstance(value, (list, tuple)):
+        items = [_summarize(v) for v in value[:_SUMMARY_ITEMS]]
+        if len(value) > _SUMMARY_ITEMS:
+            items.append('... %d more' % (len(value) - _SUMMARY_ITEMS))
+        return items
+    return value
+
+
+class Payload(object):
+    """Renders a request or response lazily, when the record is emitted."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        conf = cfg.CONF.MIDONET
+        if conf.log_payload_mode == SUMMARY:
+            text = repr(_summarize(self.value))
+        else:
+            text = repr(self.value)
+        limit = conf.log_max_payload_length
+        if limit and len(text) > limit:
+            text = '%s... (%d chars)' % (text[:limit], len(text))
+        return text
+
+
+def log_call(debug=False):
+    """Log the arguments and the result of a plugin method.
+
+    The first argument after self, the request context, is not logged.
+    """
+    level = std_logging.DEBUG if debug else std_logging.INFO
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapped(self, context, *args, **kwargs):
+            if (not LOG.logger.isEnabledFor(level) or
+                    random.random() >= cfg.CONF.MIDONET.log_sample_rate):
+                return fn(self, context, *args, **kwargs)
+
+            name = '%s.%s' % (self.__class__.__name__, fn.__name__)
+            LOG.log(level, _("%(name)s called: args=%(args)s "
+                             "kwargs=%(kwargs)s"),
+                    {'name': name, 'args': Payload(args),
+                     'kwargs': Payload(kwargs)})
+            result = fn(self, context, *args, **kwargs)
+            LOG.log(level, _("%(name)s exiting: %(result)s"),
+                    {'name': name, 'result': Payload(result)})
+            return result
+        return wrapped
+    return decorator
@@ -0,0 +1,214 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Counters and gauges of the plugin, exported in Prometheus text format.
+
+Updates are plain dictionary operations: green threads never switch in the
+middle of one, so the hot path takes no lock.  Each process writes its own
+file, with a pid label, to the directory read by the node exporter textfile
+collector, so values of different API workers are never added twice.  A
+forked process starts from zero rather than from the values of its parent.
+"""
+
+import collections
+import errno
+import glob
+import os
+import tempfile
+
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
+
+LOG = logging.getLogger(__name__)
+
+_FILE_PREFIX = 'neutron_midonet_'
+_FILE_SUFFIX = '.prom'
+
+
+class _Metric(object):
+
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = collections.defaultdict(float)
+
+    def _key(self, labels):
+        return tuple(labels.get(label, '') for label in self.labels)
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def reset(self):
+        self._values.clear()
+
+    def render(self, extra_labels):
+        lines = ['# HELP %s %s' % (self.name, self.help),
+                 '# TYPE %s %s' % (self.name, self.type)]
+        for key, value in sorted(self._values.items()):
+            pairs = zip(self.labels, key) + extra_labels
+            text = ','.join('%s="%s"' % pair for pair in pairs)
+            lines.append('%s{%s} %s' % (self.name, text, repr(value)))
+        return lines
+
+
+class Counter(_Metric):
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self._values[self._key(labels)] += amount
+
+
+class Gauge(_Metric):
+
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        self._values[self._key(labels)] += amount
+
+    def dec(self, amount=1, **labels):
+        self._values[self._key(labels)] -= amount
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Registry(object):
+
+    def __init__(self):
+        self._metrics = []
+        self._pid = os.getpid()
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help, labels=()):
+        metric = Gauge(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def reset_if_forked(self):
+        """Drop the values inherited from the parent of a forked process."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self):
+        extra_labels = [('pid', str(os.getpid()))]
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(extra_labels))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+API_REQUESTS = REGISTRY.counter(
+    'midonet_api_requests_total',
+    'HTTP requests sent to the MidoNet API.', ('method', 'status'))
+API_ERRORS = REGISTRY.counter(
+    'midonet_plugin_api_errors_total',
+    'MidoNet API errors raised by plugin operations.', ('operation',))
+ROLLBACKS = REGISTRY.counter(
+    'midonet_plugin_rollbacks_total',
+    'Neutron changes rolled back after a MidoNet failure.', ('operation',))
+IN_FLIGHT = REGISTRY.gauge(
+    'midonet_plugin_requests_in_flight',
+    'Plugin operations being processed.', ('operation',))
+LOCK_WAITERS = REGISTRY.gauge(
+    'midonet_plugin_lock_waiters',
+    'Green threads waiting for a MidoNet resource lock.')
+THROTTLED = REGISTRY.counter(
+    'midonet_plugin_throttled_total',
+    'Write operations rejected by the tenant admission control.',
+    ('operation',))
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class TextfileExporter(object):
+    """Periodically writes the registry to a per-process .prom file.
+
+    The files of dead processes, such as restarted API workers, are removed
+    on every pass.
+    """
+
+    def __init__(self, directory, interval, registry=REGISTRY):
+        self._directory = directory
+        self._interval = interval
+        self._registry = registry
+        self._timer = None
+        self._pid = None
+
+    def start(self):
+        """Start exporting from this process unless it already does.
+
+        This is called again on first use in each process so that API
+        workers forked after the plugin was loaded export their own values.
+        """
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._registry.reset_if_forked()
+        self._timer = loopingcall.FixedIntervalLoopingCall(self.export)
+        self._timer.start(interval=self._interval)
+
+    def _remove_stale_files(self):
+        pattern = os.path.join(self._directory,
+                               _FILE_PREFIX + '*' + _FILE_SUFFIX)
+        for path in glob.glob(pattern):
+            pid = os.path.basename(path)[len(_FILE_PREFIX):-len(_FILE_SUFFIX)]
+            if not pid.isdigit() or _is_alive(int(pid)):
+                continue
+            try:
+                os.unlink(path)
+            except OSError as e:
+                # Another process may have removed it first
+                if e.errno != errno.ENOENT:
+                    raise
+
+    def export(self):
+        try:
+            self._remove_stale_files()
+        except OSError as e:
+            LOG.warn(_("Failed to remove stale MidoNet plugin metrics "
+                       "files: %s"), e)
+        path = os.path.join(self._directory, '%s%d%s' % (
+            _FILE_PREFIX, os.getpid(), _FILE_SUFFIX))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self._directory)
+            with os.fdopen(fd, 'w') as f:
+                f.write(self._registry.render())
+            os.chmod(tmp_path, 0o644)
+            # Readers never see a partially written file
+            os.rename(tmp_path, path)
+        except (IOError, OSError) as e:
+            LOG.warn(_("Failed to export MidoNet plugin metrics to "
+                       "%(path)s: %(err)s"), {'path': path, 'err': e})
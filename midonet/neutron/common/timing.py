@@ -0,0 +1,138 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Latency breakdown of the plugin operations.
+
+Every plugin operation records its total time and the time spent in each
+phase: waiting for locks, calling the MidoNet API, and the rest, which is
+the Neutron DB work and the plugin logic.  The time of an operation called
+by another one, e.g. create_port from add_router_interface, also counts in
+the phases of the caller.
+"""
+
+import collections
+import contextlib
+import threading
+import time
+
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+TOTAL = 'total'
+LOCK = 'lock'
+MIDONET = 'midonet'
+DB = 'db'
+
+PERCENTILES = (50, 95, 99)
+
+
+class Histogram(object):
+    """Keeps the latest samples of a latency and their percentiles."""
+
+    def __init__(self, size):
+        self._samples = collections.deque(maxlen=size)
+        self.count = 0
+
+    def add(self, value):
+        self._samples.append(value)
+        self.count += 1
+
+    def get_stats(self):
+        samples = sorted(self._samples)
+        stats = {'count': self.count}
+        for p in PERCENTILES:
+            index = min(len(samples) - 1, len(samples) * p // 100)
+            stats['p%d' % p] = samples[index] if samples else None
+        return stats
+
+
+class LatencyRecorder(object):
+
+    def __init__(self, samples=1000):
+        self._samples = samples
+        self._histograms = {}
+        self._local = threading.local()
+
+    def configure(self, samples):
+        self._samples = samples
+        self._histograms = {}
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, operation, phase, value):
+        key = (operation, phase)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(self._samples)
+        histogram.add(value)
+
+    @contextlib.contextmanager
+    def operation(self, name):
+        if not self._samples:
+            yield
+            return
+
+        stack = self._stack()
+        phases = collections.defaultdict(float)
+        stack.append(phases)
+        start = time.time()
+        try:
+            yield
+        finally:
+            total = time.time() - start
+            stack.pop()
+            if stack:
+                for phase, elapsed in phases.items():
+                    stack[-1][phase] += elapsed
+            self._record(name, TOTAL, total)
+            self._record(name, LOCK, phases[LOCK])
+            self._record(name, MIDONET, phases[MIDONET])
+            self._record(name, DB, total - phases[LOCK] - phases[MIDONET])
+
+    def add(self, phase, elapsed):
+        stack = self._stack()
+        if stack:
+            stack[-1][phase] += elapsed
+
+    @contextlib.contextmanager
+    def phase(self, phase):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(phase, time.time() - start)
+
+    def get_stats(self):
+        stats = collections.defaultdict(dict)
+        for (operation, phase), histogram in self._histograms.items():
+            stats[operation][phase] = histogram.get_stats()
+        return dict(stats)
+
+    def dump(self):
+        for operation, phases in sorted(self.get_stats().items()):
+            for phase, stats in sorted(phases.items()):
+                LOG.info(_("%(operation)s %(phase)s: count=%(count)d "
+                           "p50=%(p50)s p95=%(p95)s p99=%(p99)s"),
+                         dict(stats, operation=operation, phase=phase))
+
+
+recorder = LatencyRecorder()
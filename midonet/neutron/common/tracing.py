@@ -0,0 +1,216 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tracing of the plugin operations down to the MidoNet API requests.
+
+Each plugin operation opens a span whose trace ID is taken from the Neutron
+request ID.  Every MidoNet client call made while it runs is a child span,
+and every HTTP request sent for that call is in turn a child span whose IDs
+are forwarded to the MidoNet API in B3 headers, so that the MidoNet API
+server logs can be lined up with the plugin's.  Sampled traces are appended
+to a file in Zipkin v2 JSON format, one span per line, for a collector to
+ship.
+"""
+
+import contextlib
+import os
+import random
+import threading
+import time
+import uuid
+
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+SERVICE_NAME = 'neutron-midonet'
+
+SERVER = 'SERVER'
+CLIENT = 'CLIENT'
+
+TRACE_ID_HEADER = 'X-B3-TraceId'
+SPAN_ID_HEADER = 'X-B3-SpanId'
+PARENT_ID_HEADER = 'X-B3-ParentSpanId'
+SAMPLED_HEADER = 'X-B3-Sampled'
+REQUEST_ID_HEADER = 'X-Openstack-Request-Id'
+
+
+def _new_span_id():
+    return '%016x' % random.getrandbits(64)
+
+
+def _trace_id(request_id):
+    """Return the UUID of a 'req-<uuid>' request ID as a 128 bit trace ID."""
+    if request_id:
+        try:
+            return uuid.UUID(request_id[-36:]).hex
+        except ValueError:
+            pass
+    return uuid.uuid4().hex
+
+
+class Trace(object):
+
+    def __init__(self, request_id, sampled):
+        self.id = _trace_id(request_id)
+        self.request_id = request_id
+        self.sampled = sampled
+        self.spans = []
+
+
+class Span(object):
+
+    def __init__(self, trace, name, kind=None, parent_id=None, tags=None):
+        self.trace = trace
+        self.id = _new_span_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.tags = dict(tags or {})
+        self.start = time.time()
+        self.duration = 0
+
+    def headers(self):
+        """Return the HTTP headers propagating this span."""
+        headers = {TRACE_ID_HEADER: self.trace.id,
+                   SPAN_ID_HEADER: self.id,
+                   SAMPLED_HEADER: '1' if self.trace.sampled else '0'}
+        if self.parent_id:
+            headers[PARENT_ID_HEADER] = self.parent_id
+        if self.trace.request_id:
+            headers[REQUEST_ID_HEADER] = self.trace.request_id
+        return headers
+
+    def to_dict(self):
+        span = {'traceId': self.trace.id,
+                'id': self.id,
+                'name': self.name,
+                'timestamp': int(self.start * 1000000),
+                'duration': max(1, int(self.duration * 1000000)),
+                'localEndpoint': {'serviceName': SERVICE_NAME},
+                'tags': dict((k, str(v)) for k, v in self.tags.items())}
+        if self.parent_id:
+            span['parentId'] = self.parent_id
+        if self.kind:
+            span['kind'] = self.kind
+        return span
+
+
+class Tracer(object):
+
+    def __init__(self):
+        self._path = None
+        self._sample_rate = 1.0
+        self._fd = None
+        self._local = threading.local()
+
+    def configure(self, path, sample_rate=1.0):
+        self._path = path
+        self._sample_rate = sample_rate
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self):
+        """Return the innermost open span of this green thread, if any."""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextlib.contextmanager
+    def _open(self, span):
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        except Exception as e:
+            span.tags['error'] = e
+            raise
+        finally:
+            span.duration = time.time() - span.start
+            stack.pop()
+            span.trace.spans.append(span)
+            if not stack and span.trace.sampled:
+                self._export(span.trace)
+
+    def operation(self, name, request_id=None):
+        """Open the span of a plugin operation.
+
+        The span starts a new trace unless the operation is called from
+        another traced operation.
+        """
+        if self._path is None:
+            return _null_span()
+
+        parent = self.current()
+        if parent is not None:
+            return self._open(Span(parent.trace, name, SERVER, parent.id))
+
+        trace = Trace(request_id, random.random() < self._sample_rate)
+        tags = {'neutron.request_id': request_id} if request_id else None
+        return self._open(Span(trace, name, SERVER, tags=tags))
+
+    def span(self, name, kind=None, tags=None):
+        """Open a child span of the current one.
+
+        Nothing is traced outside of a plugin operation, e.g. in the journal
+        worker, and None is returned as the span.
+        """
+        parent = self.current()
+        if parent is None:
+            return _null_span()
+        return self._open(Span(parent.trace, name, kind, parent.id, tags))
+
+    @contextlib.contextmanager
+    def adopt(self, span):
+        """Open the spans of this green thread as children of span, a span
+        opened by another green thread, e.g. the one fanning out calls.
+        """
+        if span is None:
+            yield
+            return
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    def _export(self, trace):
+        data = ''.join(jsonutils.dumps(span.to_dict()) + '\n'
+                       for span in trace.spans)
+        try:
+            if self._fd is None:
+                self._fd = os.open(self._path,
+                                   os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                                   0o640)
+            # A single append keeps the lines of concurrent writers apart
+            os.write(self._fd, data)
+        except OSError as e:
+            LOG.warn(_("Failed to write MidoNet plugin trace to %(path)s: "
+                       "%(err)s"), {'path': self._path, 'err': e})
+
+
+@contextlib.contextmanager
+def _null_span():
+    yield None
+
+
+tracer = Tracer()
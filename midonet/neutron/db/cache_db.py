@@ -0,0 +1,94 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Generations of the cached resources, shared by the Neutron servers.
+
+Each write of a cached resource bumps the generation of its bucket, and a
+cached entry is served only while the generations it was read under are
+unchanged, so that a write made by any process is seen by the reads of
+every process that follow its bump.
+"""
+
+import sqlalchemy as sa
+from sqlalchemy import exc as sa_exc
+
+from neutron.db import model_base
+from neutron.openstack.common.db import exception as db_exc
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# Bucket bumped by the writes of resources whose IDs are not known
+ALL = -1
+# Bucket bumped by the writes of resources whose list keys are not known,
+# invalidating all the cached lists
+LISTS = -2
+
+
+class MidonetCacheGeneration(model_base.BASEV2):
+    """Generation of a bucket of cached resources."""
+
+    __tablename__ = 'midonet_cache_generations'
+
+    resource = sa.Column(sa.String(64), primary_key=True)
+    bucket = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+    generation = sa.Column(sa.Integer, nullable=False, default=0)
+
+
+def create_table(session, buckets):
+    """Create the generations table and its (resource, bucket) rows.
+
+    Bumps only update rows, so that concurrent writers never race to
+    insert the same one.
+    """
+    MidonetCacheGeneration.__table__.create(bind=session.get_bind(),
+                                            checkfirst=True)
+    try:
+        with session.begin(subtransactions=True):
+            existing = set(session.query(MidonetCacheGeneration.resource,
+                                         MidonetCacheGeneration.bucket))
+            for resource, bucket in set(buckets) - existing:
+                session.add(MidonetCacheGeneration(resource=resource,
+                                                   bucket=bucket,
+                                                   generation=0))
+    except (sa_exc.IntegrityError, db_exc.DBDuplicateEntry):
+        # Another server created them at the same time
+        LOG.debug(_("Cache generations created by another server"))
+
+
+def get_generations(session, resource, buckets):
+    """Return the generation of each of the given buckets of a resource."""
+    generations = dict.fromkeys(buckets, 0)
+    query = session.query(MidonetCacheGeneration.bucket,
+                          MidonetCacheGeneration.generation).filter(
+        MidonetCacheGeneration.resource == resource,
+        MidonetCacheGeneration.bucket.in_(buckets))
+    generations.update(query)
+    return generations
+
+
+def bump(session, resource, buckets):
+    """Bump the generations of the given buckets of a resource.
+
+    The buckets are updated in order so that concurrent writers cannot
+    deadlock.
+    """
+    with session.begin(subtransactions=True):
+        for bucket in sorted(set(buckets)):
+            session.query(MidonetCacheGeneration).filter_by(
+                resource=resource, bucket=bucket).update(
+                    {'generation': MidonetCacheGeneration.generation + 1},
+                    synchronize_session=False)
@@ -0,0 +1,297 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import sqlalchemy as sa
+from sqlalchemy import func
+
+from neutron.db import model_base
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import timeutils
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+FAILED = 'failed'
+
+
+class MidonetJournal(model_base.BASEV2):
+    """A MidoNet API call waiting to be replayed by the journal worker."""
+
+    __tablename__ = 'midonet_journal'
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    object_type = sa.Column(sa.String(64), nullable=False)
+    object_id = sa.Column(sa.String(36), nullable=False, index=True)
+    # Object the call depends on, e.g. the network of a port
+    parent_id = sa.Column(sa.String(36), index=True)
+    operation = sa.Column(sa.String(64), nullable=False)
+    data = sa.Column(sa.Text, nullable=False)
+    state = sa.Column(sa.String(16), nullable=False, default=PENDING,
+                      index=True)
+    retry_count = sa.Column(sa.Integer, nullable=False, default=0)
+    last_error = sa.Column(sa.Text)
+    created_at = sa.Column(sa.DateTime, nullable=False)
+    last_retried = sa.Column(sa.DateTime)
+    # Time before which a merged entry is not replayed, see merge_entry()
+    ready_at = sa.Column(sa.DateTime)
+
+
+def create_table(session):
+    """Create the journal table if it does not exist yet."""
+    MidonetJournal.__table__.create(bind=session.get_bind(), checkfirst=True)
+
+
+def add_entry(session, operation, object_id, args, parent_id=None,
+              ready_at=None):
+    """Record a MidoNet API call in the journal.
+
+    The caller is expected to hold the transaction that writes the Neutron
+    side of the change so that both commit or roll back together.  Calls
+    for an object and for its parent are replayed in the order they were
+    recorded.
+    """
+    with session.begin(subtransactions=True):
+        entry = MidonetJournal(object_type=operation.split('_', 1)[-1],
+                               object_id=object_id,
+                               parent_id=parent_id,
+                               operation=operation,
+                               data=jsonutils.dumps(args),
+                               state=PENDING,
+                               retry_count=0,
+                               created_at=timeutils.utcnow(),
+                               ready_at=ready_at)
+        session.add(entry)
+    return entry
+
+
+def merge_entry(session, operation, object_id, args, parent_id=None,
+                delay=0):
+    """Record a MidoNet API call, merged into the pending entry of the same
+    call if it is the latest entry of the object and of its children.
+
+    The merged entry keeps its place in the journal and carries the latest
+    arguments, e.g. the final state of a port updated several times.  A
+    new entry is not replayed before delay seconds, so that the calls made
+    until then are merged into it.
+    """
+    with session.begin(subtransactions=True):
+        latest = (session.query(MidonetJournal).
+                  filter(sa.or_(MidonetJournal.object_id == object_id,
+                                MidonetJournal.parent_id == object_id)).
+                  order_by(MidonetJournal.id.desc()).
+                  with_lockmode('update').first())
+        if (latest is not None and latest.state == PENDING and
+                latest.object_id == object_id and
+                latest.operation == operation):
+            latest.data = jsonutils.dumps(args)
+            return latest
+        ready_at = timeutils.utcnow() + datetime.timedelta(seconds=delay)
+        return add_entry(session, operation, object_id, args,
+                         parent_id=parent_id, ready_at=ready_at)
+
+
+def discard_entries(session, object_id, operation):
+    """Drop the pending entries of a call for an object, e.g. the merged
+    updates of a port being deleted.
+    """
+    with session.begin(subtransactions=True):
+        return (session.query(MidonetJournal).
+                filter_by(object_id=object_id, operation=operation,
+                          state=PENDING).
+                delete(synchronize_session=False))
+
+
+def load_args(session, entry_id):
+    """Read the arguments of an entry, as last merged into it."""
+    data = (session.query(MidonetJournal.data).
+            filter_by(id=entry_id).scalar())
+    return jsonutils.loads(data)
+
+
+def depends_on(entry, object_ids, parent_ids):
+    """Tell if an entry must wait for the entries of the given objects and
+    for the entries whose parents are given.
+
+    An entry depends on the older entries of its own object, of its parent,
+    and of the objects whose parent it is, but not of its siblings.
+    """
+    return (entry.object_id in object_ids or
+            entry.parent_id in object_ids or
+            entry.object_id in parent_ids)
+
+
+def get_pending_entries(session, limit):
+    """Return the oldest pending entries that are ready to be replayed.
+
+    Entries that depend on an older entry being processed are left out so
+    that the calls for an object and its parent are replayed in order.  So
+    are the entries depending on a failed entry, until an operator retries
+    or skips it, the entries not ready yet, and the entries depending on an
+    entry left out.
+    """
+    busy = (session.query(MidonetJournal.object_id,
+                          MidonetJournal.parent_id).
+            filter(MidonetJournal.state.in_([PROCESSING, FAILED])).all())
+    object_ids = set(object_id for object_id, parent_id in busy)
+    parent_ids = set(parent_id for object_id, parent_id in busy if parent_id)
+
+    query = session.query(MidonetJournal).filter_by(state=PENDING)
+    if object_ids:
+        query = query.filter(~MidonetJournal.object_id.in_(object_ids))
+    now = timeutils.utcnow()
+    entries = []
+    for entry in query.order_by(MidonetJournal.id).limit(limit):
+        if (depends_on(entry, object_ids, parent_ids) or
+                (entry.ready_at is not None and entry.ready_at > now)):
+            object_ids.add(entry.object_id)
+            if entry.parent_id:
+                parent_ids.add(entry.parent_id)
+            continue
+        entries.append(entry)
+    return entries
+
+
+def claim_entry(session, entry_id):
+    """Mark an entry as being processed.
+
+    Return False if another worker has already claimed it.
+    """
+    with session.begin(subtransactions=True):
+        count = (session.query(MidonetJournal).
+                 filter_by(id=entry_id, state=PENDING).
+                 update({'state': PROCESSING,
+                         'last_retried': timeutils.utcnow()},
+                        synchronize_session=False))
+    return count == 1
+
+
+def complete_entry(session, entry_id):
+    with session.begin(subtransactions=True):
+        session.query(MidonetJournal).filter_by(id=entry_id).delete(
+            synchronize_session=False)
+
+
+def fail_entry(session, entry_id, error, max_retries):
+    """Put an entry back in the queue, or give up on it after max_retries."""
+    with session.begin(subtransactions=True):
+        entry = session.query(MidonetJournal).filter_by(id=entry_id).one()
+        entry.retry_count += 1
+        entry.last_error = error
+        if entry.retry_count >= max_retries:
+            entry.state = FAILED
+        else:
+            entry.state = PENDING
+
+
+def retry_entry(session, entry_id):
+    """Queue a failed entry again, unblocking the entries behind it."""
+    with session.begin(subtransactions=True):
+        count = (session.query(MidonetJournal).
+                 filter_by(id=entry_id, state=FAILED).
+                 update({'state': PENDING, 'retry_count': 0},
+                        synchronize_session=False))
+    return count == 1
+
+
+def skip_entry(session, entry_id):
+    """Drop a failed entry, e.g. once the call was made to MidoNet by hand,
+    unblocking the entries behind it.
+    """
+    with session.begin(subtransactions=True):
+        count = (session.query(MidonetJournal).
+                 filter_by(id=entry_id, state=FAILED).
+                 delete(synchronize_session=False))
+    return count == 1
+
+
+def reset_stale_entries(session, timeout):
+    """Re-queue entries left in processing state by a dead worker."""
+    since = timeutils.utcnow() - datetime.timedelta(seconds=timeout)
+    with session.begin(subtransactions=True):
+        return (session.query(MidonetJournal).
+                filter_by(state=PROCESSING).
+                filter(MidonetJournal.last_retried < since).
+                update({'state': PENDING}, synchronize_session=False))
+
+
+def get_unfinished_object_ids(session, parents=False):
+    """Return the ids of the objects that have entries left to replay,
+    failed ones included, and of their parents if parents is True.
+    """
+    columns = [MidonetJournal.object_id]
+    if parents:
+        columns.append(MidonetJournal.parent_id)
+    ids = set()
+    for row in session.query(*columns).distinct():
+        ids.update(row)
+    ids.discard(None)
+    return ids
+
+
+def has_unfinished_entries(session, object_ids):
+    """Tell if any of the objects, or any of their children, has entries
+    left to replay, failed ones included.
+    """
+    query = (session.query(MidonetJournal.id).
+             filter(sa.or_(MidonetJournal.object_id.in_(object_ids),
+                           MidonetJournal.parent_id.in_(object_ids))))
+    return query.first() is not None
+
+
+def get_failed_entries(session):
+    """Return the failed entries, each blocking the entries of its object
+    that come after it.
+    """
+    failed = (session.query(MidonetJournal).
+              filter_by(state=FAILED).
+              order_by(MidonetJournal.id).all())
+    if not failed:
+        return []
+    blocked = dict(session.query(MidonetJournal.object_id,
+                                 func.count(MidonetJournal.id)).
+                   filter_by(state=PENDING).
+                   filter(MidonetJournal.object_id.in_(
+                       [entry.object_id for entry in failed])).
+                   group_by(MidonetJournal.object_id))
+    return [{'id': entry.id,
+             'object_id': entry.object_id,
+             'operation': entry.operation,
+             'retry_count': entry.retry_count,
+             'last_error': entry.last_error,
+             'blocked_entries': blocked.get(entry.object_id, 0)}
+            for entry in failed]
+
+
+def get_status(session):
+    """Return the number of entries per state, the age of the oldest
+    pending entry in seconds and the failed entries blocking their objects.
+    """
+    counts = dict((state, 0) for state in (PENDING, PROCESSING, FAILED))
+    for state, count in (session.query(MidonetJournal.state,
+                                       func.count(MidonetJournal.id)).
+                         group_by(MidonetJournal.state)):
+        counts[state] = count
+
+    oldest = (session.query(func.min(MidonetJournal.created_at)).
+              filter(MidonetJournal.state.in_([PENDING, PROCESSING])).
+              scalar())
+    lag = 0
+    if oldest is not None:
+        lag = timeutils.delta_seconds(oldest, timeutils.utcnow())
+    return {'entries': counts, 'lag': lag,
+            'failed': get_failed_entries(session)}
@@ -0,0 +1,148 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+from webob import exc as w_exc
+
+from neutron.db import api as db
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
+
+from midonet.neutron.db import journal_db
+
+LOG = logging.getLogger(__name__)
+
+
+class _Group(object):
+
+    def __init__(self):
+        self.object_ids = set()
+        self.parent_ids = set()
+        self.entries = []
+
+    def add(self, entry):
+        self.object_ids.add(entry.object_id)
+        if entry.parent_id:
+            self.parent_ids.add(entry.parent_id)
+        self.entries.append(entry)
+
+
+def group_entries(entries):
+    """Split entries, in journal order, into groups to replay concurrently.
+
+    Entries depending on each other, such as the creations of a network and
+    of its ports, end up in the same group, in journal order.
+    """
+    groups = []
+    for entry in entries:
+        group = _Group()
+        for other in [g for g in groups if journal_db.depends_on(
+                entry, g.object_ids, g.parent_ids)]:
+            groups.remove(other)
+            for dependency in other.entries:
+                group.add(dependency)
+        group.entries.sort(key=lambda e: e.id)
+        group.add(entry)
+        groups.append(group)
+    return [group.entries for group in groups]
+
+
+class JournalSyncWorker(object):
+    """Replays the MidoNet journal against the MidoNet API.
+
+    Entries are grouped per object and parent and each group is replayed in
+    order by a green thread of the pool, so calls for unrelated objects run
+    in parallel while calls for an object, its parent and its children
+    never overtake each other.
+    Processing of a group stops at the first failure; the failed entry and
+    the ones after it are picked up again on the next pass.  An entry that
+    keeps failing is marked as failed and holds back the entries of its
+    object until an operator retries or skips it.  Passes are skipped while
+    available, if given, tells the MidoNet API is down.
+    """
+
+    def __init__(self, invoke, conf, available=None):
+        self._invoke = invoke
+        self._conf = conf
+        self._available = available
+        self._pool = eventlet.GreenPool(conf.journal_workers)
+        self._timer = None
+
+    def start(self):
+        session = db.get_session()
+        journal_db.create_table(session)
+        self._timer = loopingcall.FixedIntervalLoopingCall(self.sync)
+        self._timer.start(interval=self._conf.journal_sync_interval)
+
+    def stop(self):
+        if self._timer:
+            self._timer.stop()
+            self._timer = None
+
+    def sync(self):
+        try:
+            self._sync()
+        except Exception:
+            LOG.exception(_("MidoNet journal sync pass failed"))
+
+    def _sync(self):
+        if self._available is not None and not self._available():
+            return
+
+        session = db.get_session()
+        reset = journal_db.reset_stale_entries(
+            session, self._conf.journal_processing_timeout)
+        if reset:
+            LOG.warn(_("Re-queued %d abandoned MidoNet journal entries"),
+                     reset)
+
+        for group in group_entries(journal_db.get_pending_entries(
+                session, self._conf.journal_batch_size)):
+            entries = [(entry.id, entry.operation) for entry in group]
+            self._pool.spawn_n(self._process_entries, entries)
+        self._pool.waitall()
+
+    def _process_entries(self, entries):
+        session = db.get_session()
+        for entry_id, operation in entries:
+            if not journal_db.claim_entry(session, entry_id):
+                # Another worker got there first; it owns the rest of the
+                # group as far as ordering is concerned.
+                return
+
+            try:
+                # Read once claimed, since calls may have been merged into
+                # the entry until then
+                args = journal_db.load_args(session, entry_id)
+                self._invoke(operation, *args)
+            except w_exc.HTTPNotFound as ex:
+                if not operation.startswith(('delete_', 'remove_')):
+                    self._fail(session, entry_id, operation, ex)
+                    return
+                # The object is already gone from MidoNet
+            except Exception as ex:
+                self._fail(session, entry_id, operation, ex)
+                return
+
+            journal_db.complete_entry(session, entry_id)
+
+    def _fail(self, session, entry_id, operation, ex):
+        LOG.error(_("Failed to replay MidoNet journal entry %(id)s "
+                    "(%(op)s): %(err)s"),
+                  {'id': entry_id, 'op': operation, 'err': ex})
+        journal_db.fail_entry(session, entry_id, str(ex),
+                              self._conf.journal_max_retries)
@@ -22,6 +22,10 @@
 # @author: Rossella Sblendido, Midokura Japan KK
 # @author: Duarte Nunes, Midokura Japan KK
 
+import collections
+import functools
+import signal
+
 from webob import exc as w_exc
 
 from midonetclient import exc
@@ -34,7 +38,6 @@ from sqlalchemy import exc as sa_exc
 from neutron.common import exceptions as n_exc
 from neutron.common import rpc as n_rpc
 from neutron.common import topics
-from neutron.common import utils
 from neutron.db import agents_db
 from neutron.db import agentschedulers_db
 from neutron.db import api as db
@@ -54,18 +57,71 @@ from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import rpc
 from neutron.plugins.common import constants
-from neutron.plugins.midonet.common import config  # noqa
+
+from midonet.neutron.client import auth
+from midonet.neutron.client import breaker
+from midonet.neutron.client import transport
+from midonet.neutron.common import admission
+from midonet.neutron.common import cache
+from midonet.neutron.common import capture
+from midonet.neutron.common import config  # noqa
+from midonet.neutron.common import fanout
+from midonet.neutron.common import fields
+from midonet.neutron.common import locking
+from midonet.neutron.common import log
+from midonet.neutron.common import metrics
+from midonet.neutron.common import timing
+from midonet.neutron.common import tracing
+from midonet.neutron.db import journal_db
+from midonet.neutron import journal
+from midonet.neutron import reconcile
 
 LOG = logging.getLogger(__name__)
 
+DEGRADED_FAIL = 'fail'
+DEGRADED_QUEUE = 'queue'
+
+_WRITE_PREFIXES = ('create_', 'update_', 'delete_', 'add_', 'remove_')
+
 
 def handle_api_error(fn):
-    """Wrapper for methods that throws custom exceptions."""
+    """Wrapper for methods that throws custom exceptions.
+
+    The latency of the wrapped method is recorded as well, and the method is
+    traced under the request ID of its context.  Writes fail at once while
+    the MidoNet API circuit breaker is open, unless they are queued or only
+    journaled, and run within the admission limits of their tenant.
+    """
+    operation = fn.__name__
+    write = operation.startswith(_WRITE_PREFIXES)
+
+    @functools.wraps(fn)
     def wrapped(*args, **kwargs):
+        context = args[1] if len(args) > 1 else None
+        request_id = getattr(context, 'request_id', None)
+        tenant_id = getattr(context, 'tenant_id', None) if write else None
+        if args[0].metrics_exporter is not None:
+            args[0].metrics_exporter.start()
+        metrics.IN_FLIGHT.inc(operation=operation)
         try:
-            return fn(*args, **kwargs)
+            if (write and args[0].degraded_mode == DEGRADED_FAIL and
+                    not args[0].use_journal):
+                args[0].breaker.check()
+            with args[0].admission.admit(tenant_id):
+                with tracing.tracer.operation(operation, request_id):
+                    with timing.recorder.operation(operation):
+                        return fn(*args, **kwargs)
+        except admission.TenantThrottled:
+            metrics.THROTTLED.inc(operation=operation)
+            raise
+        except (breaker.MidonetUnavailable, fanout.FanoutError):
+            metrics.API_ERRORS.inc(operation=operation)
+            raise
         except (w_exc.HTTPException, exc.MidoApiConnectionError) as ex:
+            metrics.API_ERRORS.inc(operation=operation)
             raise MidonetApiException(msg=ex)
+        finally:
+            metrics.IN_FLIGHT.dec(operation=operation)
     return wrapped
 
 
@@ -87,6 +143,16 @@ class MidoRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin):
         return n_rpc.PluginRpcDispatcher([self,
                                           agents_db.AgentExtRpcCallback()])
 
+    def get_active_networks_info(self, context, **kwargs):
+        """Return the networks the calling DHCP agent should serve.
+
+        None when MidoNet serves DHCP itself.
+        """
+        if cfg.CONF.MIDONET.native_dhcp:
+            return []
+        return super(MidoRpcCallbacks, self).get_active_networks_info(
+            context, **kwargs)
+
 
 class MidonetPluginException(n_exc.NeutronException):
     message = _("%(msg)s")
@@ -111,31 +177,97 @@ class MidonetPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
                                    'routed-service-insertion',
                                    'lbaas']
     __native_bulk_support = True
+    __native_pagination_support = True
+    __native_sorting_support = True
 
     def __init__(self):
         super(MidonetPluginV2, self).__init__()
 
         # Instantiate MidoNet API client
         conf = cfg.CONF.MIDONET
-        self.api_cli = n_client.MidonetClient(conf.midonet_uri, conf.username,
-                                              conf.password,
+        self.transport = transport.install(conf)
+        self.tokens = auth.install(conf, self.transport)
+        self.api_cli = n_client.MidonetClient(conf.midonet_uri[0],
+                                              conf.username, conf.password,
                                               project_id=conf.project_id)
 
-        self.setup_rpc()
+        timing.recorder.configure(conf.latency_samples)
+        tracing.tracer.configure(conf.trace_file, conf.trace_sample_rate)
+        signal.signal(signal.SIGUSR2, self._dump_stats)
+        self.locks = locking.LockManager(conf)
+        self.metrics_exporter = None
+        if conf.metrics_dir:
+            # Started here for the journal replay of this process, and
+            # again on first use in each forked worker
+            self.metrics_exporter = metrics.TextfileExporter(
+                conf.metrics_dir, conf.metrics_interval)
+            self.metrics_exporter.start()
+        cache.create_tables(db.get_session())
+        self.default_sg_cache = cache.DefaultSecurityGroupCache()
+        self.resource_cache = None
+        if conf.resource_cache_size > 0:
+            self.resource_cache = cache.ResourceCache(
+                conf.resource_cache_size, conf.resource_cache_ttl)
+        self.suppressed_updates = collections.defaultdict(int)
+        self.port_update_window = conf.port_update_window
+
         self.repair_quotas_table()
 
+        self.breaker = breaker.CircuitBreaker(conf)
+        self.fanout = fanout.Executor(conf.fanout_workers)
+        self.degraded_mode = conf.degraded_mode
+        if self.degraded_mode not in (DEGRADED_FAIL, DEGRADED_QUEUE):
+            raise n_exc.InvalidConfigurationOption(
+                opt_name='degraded_mode', opt_value=self.degraded_mode)
+        self.admission = admission.AdmissionController(
+            conf, self.transport.get_latency)
+
+        self.use_journal = conf.use_journal
+        self.journal = None
+        if (self.use_journal or self.degraded_mode == DEGRADED_QUEUE or
+                self.port_update_window > 0):
+            self.journal = journal.JournalSyncWorker(
+                self._invoke_api, conf, available=self.breaker.available)
+            self.journal.start()
+
+        self.reconciler = None
+        if conf.reconcile_interval > 0:
+            self.reconciler = reconcile.Reconciler(self, conf)
+
         self.base_binding_dict = {
             portbindings.VIF_TYPE: portbindings.VIF_TYPE_MIDONET,
             portbindings.VIF_DETAILS: {
                 # TODO(rkukura): Replace with new VIF security details
                 portbindings.CAP_PORT_FILTER:
                 'security-group' in self.supported_extension_aliases}}
-        self.network_scheduler = importutils.import_object(
-            cfg.CONF.network_scheduler_driver
-        )
-
-    def setup_rpc(self):
-        # RPC support
+        if conf.native_dhcp:
+            # MidoNet serves DHCP: networks are neither scheduled to DHCP
+            # agents nor notified to them.
+            self.supported_extension_aliases = [
+                alias for alias in self.supported_extension_aliases
+                if alias != 'dhcp_agent_scheduler']
+            self.network_scheduler = None
+            cfg.CONF.set_override('dhcp_agent_notification', False)
+        else:
+            self.network_scheduler = importutils.import_object(
+                cfg.CONF.network_scheduler_driver
+            )
+
+        if conf.capture_file:
+            capture.install(self, conf.capture_file)
+
+    def start_rpc_listener(self):
+        """Consume the agent RPC traffic of the plugin.
+
+        Neutron calls this in each of its rpc_workers processes, or in the
+        server process itself if rpc_workers is 0, so that API workers do
+        not consume RPC messages.  The reconciliation runs there too rather
+        than in every API worker.
+        """
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.start()
+        if self.reconciler is not None:
+            self.reconciler.start()
         self.topic = topics.PLUGIN
         self.conn = rpc.create_connection(new=True)
         self.callbacks = MidoRpcCallbacks()
@@ -143,7 +275,7 @@ class MidonetPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
         self.conn.create_consumer(self.topic, self.dispatcher,
                                   fanout=False)
         # Consume from all consumers in a thread
-        self.conn.consume_in_thread()
+        return self.conn.consume_in_thread()
 
     def repair_quotas_table(self):
         query = ("CREATE TABLE `quotas` ( `id` varchar(36) NOT NULL, "
@@ -158,6 +290,305 @@ class MidonetPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
             # If the table already exists, then this is expected.
             pass
 
+    def _invoke_api(self, operation, *args):
+        with tracing.tracer.span('midonet.%s' % operation):
+            with timing.recorder.phase(timing.MIDONET):
+                return self.breaker.call(
+                    operation, getattr(self.api_cli, operation), *args)
+
+    def _dump_stats(self, signum, frame):
+        timing.recorder.dump()
+        if self.locks.profiler is not None:
+            self.locks.profiler.dump()
+
+    def get_latency_stats(self, context):
+        """Return the latency percentiles of each operation and phase."""
+        return timing.recorder.get_stats()
+
+    def get_lock_contention(self, context):
+        """Return the lock wait and hold time percentiles of each method
+        and the current lock holders and waiters of this process.
+        """
+        profiler = self.locks.profiler
+        if profiler is None:
+            return {}
+        return {'stats': profiler.get_stats(),
+                'holders': profiler.get_holders()}
+
+    def _journaled(self, context, object_ids):
+        """Tell if the MidoNet calls for the given objects are journaled.
+
+        They always are in journal mode.  In the queue degraded mode they
+        are while the MidoNet API is unavailable, and for objects that still
+        have calls queued so that the queued calls are not overtaken.  The
+        journal is queried on every call since the calls may have been
+        queued by any process.
+        """
+        if self.journal is None:
+            return False
+        if self.use_journal or (self.degraded_mode == DEGRADED_QUEUE and
+                                not self.breaker.available()):
+            return True
+        object_ids = [object_id for object_id in object_ids if object_id]
+        return (bool(object_ids) and
+                journal_db.has_unfinished_entries(context.session,
+                                                  object_ids))
+
+    def _midonet_call(self, context, operation, object_id, *args, **kwargs):
+        """Push a change to MidoNet.
+
+        In journal mode the call is recorded in the journal, in the caller's
+        transaction if one is open, and replayed later by the journal worker
+        instead of holding the transaction open for the HTTP round trip.
+        The parent_id keyword argument names the object the call depends
+        on, e.g. the network of a port, so that the journal replays their
+        calls in order.  With the delay keyword argument the call is always
+        journaled, merged with the same call made within delay seconds.
+        """
+        parent_id = kwargs.get('parent_id')
+        delay = kwargs.get('delay')
+        if delay is None and not self._journaled(context,
+                                                 [object_id, parent_id]):
+            return self._invoke_api(operation, *args)
+
+        self._journal(context, operation, object_id, args, parent_id, delay)
+
+    def _journal(self, context, operation, object_id, args, parent_id=None,
+                 delay=None):
+        if delay is None:
+            journal_db.add_entry(context.session, operation, object_id, args,
+                                 parent_id=parent_id)
+        else:
+            journal_db.merge_entry(context.session, operation, object_id,
+                                   args, parent_id=parent_id, delay=delay)
+
+    def _update_midonet(self, context, resource, id, before, after,
+                        operation=None, parent_id=None, delay=None):
+        """Push an update to MidoNet unless it is a no-op for MidoNet."""
+        if fields.is_noop(resource, before, after):
+            self.suppressed_updates[resource] += 1
+            LOG.debug(_("Skipping MidoNet update of %(resource)s %(id)s: "
+                        "no relevant field changed"),
+                      {'resource': resource, 'id': id})
+            return
+        self._midonet_call(context, operation or 'update_%s' % resource, id,
+                           id, after, parent_id=parent_id, delay=delay)
+
+    def get_suppressed_update_counts(self, context):
+        """Return the number of skipped MidoNet updates per resource."""
+        return dict(self.suppressed_updates)
+
+    def _create_with_midonet(self, context, operation, create, push,
+                             rollback, depends_on=()):
+        """Create a Neutron resource and its MidoNet counterpart.
+
+        create() writes the Neutron side and returns the new resource, and
+        push(resource) makes its MidoNet call.  When the call is journaled,
+        both are done in one transaction so that the resource is never left
+        without its journal entry.  Otherwise the call is made once the
+        Neutron transaction has committed, and rollback(resource) removes
+        the Neutron side again if it fails.  depends_on are the IDs of the
+        existing objects the MidoNet call depends on.
+        """
+        if self._journaled(context, depends_on):
+            with context.session.begin(subtransactions=True):
+                obj = create()
+                push(obj)
+            return obj
+
+        obj = create()
+        try:
+            push(obj)
+        except Exception as ex:
+            LOG.error(_("Failed to create the MidoNet resources of "
+                        "%(operation)s: %(err)s"),
+                      {'operation': operation, 'err': ex})
+            metrics.ROLLBACKS.inc(operation=operation)
+            with excutils.save_and_reraise_exception():
+                rollback(obj)
+        return obj
+
+    def _create_midonet_bulk(self, context, resource, objs, parent=None):
+        """Create a batch of resources in MidoNet.
+
+        The client's bulk call is used when it has one.  Otherwise the
+        resources are created concurrently, and the ones created are removed
+        from MidoNet again if any of them fails.  parent is the attribute
+        holding the ID of the object each resource depends on, if any.
+        """
+        operation = 'create_%s' % resource
+        parent_ids = [obj[parent] for obj in objs] if parent else []
+        if self._journaled(context, parent_ids):
+            for obj in objs:
+                self._journal(context, operation, obj['id'], (obj,),
+                              obj[parent] if parent else None)
+            return
+
+        if hasattr(self.api_cli, operation + '_bulk'):
+            return self._invoke_api(operation + '_bulk', objs)
+
+        try:
+            self.fanout.map(lambda obj: self._invoke_api(operation, obj),
+                            objs)
+        except fanout.FanoutError as ex:
+            with excutils.save_and_reraise_exception():
+                failed = set(index for index, error in ex.errors)
+                created = [obj for index, obj in enumerate(objs)
+                           if index not in failed]
+                self._delete_midonet_bulk(resource, created)
+
+    def _delete_midonet_bulk(self, resource, objs):
+        """Remove the resources of a failed bulk create from MidoNet."""
+        operation = 'delete_%s' % resource
+        try:
+            self.fanout.map(lambda obj: self._invoke_api(operation, obj['id']),
+                            objs)
+        except fanout.FanoutError as ex:
+            for index, error in ex.errors:
+                LOG.error(_("Failed to delete %(resource)s %(id)s from "
+                            "MidoNet: %(err)s"),
+                          {'resource': resource, 'id': objs[index]['id'],
+                           'err': error})
+
+    def _delete_neutron_bulk(self, context, resource, objs):
+        """Remove the Neutron side of a failed bulk create."""
+        delete = getattr(super(MidonetPluginV2, self), 'delete_%s' % resource)
+        with context.session.begin(subtransactions=True):
+            for obj in objs:
+                delete(context, obj['id'])
+
+    def _ensure_default_security_groups(self, context, resource, items):
+        """Create the missing default security groups of a bulk request.
+
+        This is done before the bulk transaction is opened so that the
+        MidoNet calls creating the groups do not run inside it.
+        """
+        tenant_ids = set(
+            self._get_tenant_id_for_create(context, item[resource])
+            for item in items)
+        for tenant_id in tenant_ids:
+            self._ensure_default_security_group(context, tenant_id)
+
+    def get_endpoint_stats(self, context):
+        """Return the load and latency of each MidoNet API server."""
+        return self.transport.get_endpoint_stats()
+
+    def get_journal_status(self, context):
+        """Return the MidoNet journal backlog and replication lag."""
+        if self.journal is None:
+            return {}
+        return journal_db.get_status(context.session)
+
+    def retry_journal_entry(self, context, entry_id):
+        """Queue a failed MidoNet journal entry again.
+
+        Return False if there is no such failed entry.
+        """
+        return journal_db.retry_entry(context.session, entry_id)
+
+    def skip_journal_entry(self, context, entry_id):
+        """Drop a failed MidoNet journal entry whose call was made by hand.
+
+        Return False if there is no such failed entry.
+        """
+        return journal_db.skip_entry(context.session, entry_id)
+
+    def _ensure_default_security_group(self, context, tenant_id):
+        """Return the ID of the tenant's default security group.
+
+        Known IDs are served from a per-process cache.  IDs looked up inside
+        a transaction are not cached since the group may have been created
+        by that transaction, which could still roll back.
+        """
+        sg_id = self.default_sg_cache.get(context, tenant_id)
+        if sg_id is None:
+            sg_id = super(MidonetPluginV2,
+                          self)._ensure_default_security_group(context,
+                                                               tenant_id)
+            if context.session.transaction is None:
+                self.default_sg_cache.set(tenant_id, sg_id)
+        return sg_id
+
+    def _get_cached(self, context, resource, id, fields):
+        get = getattr(super(MidonetPluginV2, self), 'get_%s' % resource)
+        if self.resource_cache is None:
+            return get(context, id, fields)
+        return self.resource_cache.get(
+            context, resource, id,
+            lambda id, fields: get(context, id, fields), fields)
+
+    def get_network(self, context, id, fields=None):
+        return self._get_cached(context, 'network', id, fields)
+
+    def get_subnet(self, context, id, fields=None):
+        return self._get_cached(context, 'subnet', id, fields)
+
+    def get_port(self, context, id, fields=None):
+        return self._get_cached(context, 'port', id, fields)
+
+    def get_ports(self, context, filters=None, fields=None, sorts=None,
+                  limit=None, marker=None, page_reverse=False):
+        get_ports = super(MidonetPluginV2, self).get_ports
+        if (self.resource_cache is None or sorts or limit or marker or
+                page_reverse):
+            return get_ports(context, filters, fields, sorts, limit, marker,
+                             page_reverse)
+        return self.resource_cache.get_list(
+            context, 'port', filters,
+            lambda filters, fields: get_ports(context, filters, fields),
+            fields)
+
+    def get_resource_cache_stats(self, context):
+        """Return the size and hit counts of the resource cache."""
+        if self.resource_cache is None:
+            return {}
+        return self.resource_cache.get_stats()
+
+    def _get_lb_collection(self, context, model, make_dict, filters, fields,
+                           sorts, limit, marker, page_reverse):
+        """List load balancer resources, sorted and paginated in the DB.
+
+        The getters of LoadBalancerPluginDb take no sorting or pagination
+        arguments, which the API passes to every plugin that supports them
+        natively.
+        """
+        marker_obj = None
+        if limit and marker:
+            marker_obj = self._get_resource(context, model, marker)
+        return self._get_collection(context, model, make_dict,
+                                    filters=filters, fields=fields,
+                                    sorts=sorts, limit=limit,
+                                    marker_obj=marker_obj,
+                                    page_reverse=page_reverse)
+
+    def get_vips(self, context, filters=None, fields=None, sorts=None,
+                 limit=None, marker=None, page_reverse=False):
+        return self._get_lb_collection(context, loadbalancer_db.Vip,
+                                       self._make_vip_dict, filters, fields,
+                                       sorts, limit, marker, page_reverse)
+
+    def get_pools(self, context, filters=None, fields=None, sorts=None,
+                  limit=None, marker=None, page_reverse=False):
+        return self._get_lb_collection(context, loadbalancer_db.Pool,
+                                       self._make_pool_dict, filters, fields,
+                                       sorts, limit, marker, page_reverse)
+
+    def get_members(self, context, filters=None, fields=None, sorts=None,
+                    limit=None, marker=None, page_reverse=False):
+        return self._get_lb_collection(context, loadbalancer_db.Member,
+                                       self._make_member_dict, filters,
+                                       fields, sorts, limit, marker,
+                                       page_reverse)
+
+    def get_health_monitors(self, context, filters=None, fields=None,
+                            sorts=None, limit=None, marker=None,
+                            page_reverse=False):
+        return self._get_lb_collection(context,
+                                       loadbalancer_db.HealthMonitor,
+                                       self._make_health_monitor_dict,
+                                       filters, fields, sorts, limit, marker,
+                                       page_reverse)
+
     def _process_create_network(self, context, network):
 
         net_data = network['network']
@@ -172,111 +603,145 @@ class MidonetPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
         return net
 
     @handle_api_error
+    @log.log_call()
+    @cache.invalidates('network')
     def create_network(self, context, network):
         """Create Neutron network.
 
         Create a new Neutron network and its corresponding MidoNet bridge.
         """
-        LOG.info(_('MidonetPluginV2.create_network called: network=%r'),
-                 network)
-
-        net = self._process_create_network(context, network)
-
-        try:
-            self.api_cli.create_network(net)
-        except Exception as ex:
-            LOG.error(_("Failed to create a network %(net_id)s in Midonet:"
-                        "%(err)s"), {"net_id": net["id"], "err": ex})
-            with excutils.save_and_reraise_exception():
-                super(MidonetPluginV2, self).delete_network(context, net['id'])
+        return self._create_with_midonet(
+            context, 'create_network',
+            lambda: self._process_create_network(context, network),
+            lambda net: self._midonet_call(context, 'create_network',
+                                           net['id'], net),
+            lambda net: super(MidonetPluginV2, self).delete_network(
+                context, net['id']))
 
-        LOG.info(_("MidonetPluginV2.create_network exiting: net=%r"), net)
-        return net
+    @handle_api_error
+    @log.log_call()
+    @cache.invalidates('network')
+    def create_network_bulk(self, context, networks):
+        """Create Neutron networks and their MidoNet bridges in one batch."""
+        items = networks['networks']
+        self._ensure_default_security_groups(context, 'network', items)
+
+        def create():
+            with context.session.begin(subtransactions=True):
+                return [self._process_create_network(context, item)
+                        for item in items]
+
+        return self._create_with_midonet(
+            context, 'create_network_bulk', create,
+            lambda nets: self._create_midonet_bulk(context, 'network', nets),
+            lambda nets: self._delete_neutron_bulk(context, 'network', nets))
 
     @handle_api_error
+    @log.log_call()
+    @cache.invalidates('network')
     def update_network(self, context, id, network):
         """Update Neutron network.
 
         Update an existing Neutron network and its corresponding MidoNet
         bridge.
         """
-        LOG.info(_("MidonetPluginV2.update_network called: id=%(id)r, "
-                   "network=%(network)r"), {'id': id, 'network': network})
-
         with context.session.begin(subtransactions=True):
+            before = super(MidonetPluginV2, self).get_network(context, id)
             net = super(MidonetPluginV2, self).update_network(
                 context, id, network)
 
             self._process_l3_update(context, net, network['network'])
-            self.api_cli.update_network(id, net)
+            self._update_midonet(context, 'network', id, before, net)
 
-        LOG.info(_("MidonetPluginV2.update_network exiting: net=%r"), net)
         return net
 
     @handle_api_error
-    @utils.synchronized('midonet-critical-section', external=True)
+    @log.log_call()
+    @cache.invalidates('network', cascade=('subnet', 'port'))
     def delete_network(self, context, id):
         """Delete a network and its corresponding MidoNet bridge."""
-        LOG.info(_("MidonetPluginV2.delete_network called: id=%r"), id)
-
-        with context.session.begin(subtransactions=True):
-            super(MidonetPluginV2, self).delete_network(context, id)
-            self.api_cli.delete_network(id)
-
-        LOG.info(_("MidonetPluginV2.delete_network exiting: id=%r"), id)
+        with self.locks.network(id, owner='delete_network'):
+            with context.session.begin(subtransactions=True):
+                super(MidonetPluginV2, self).delete_network(context, id)
+                self._midonet_call(context, 'delete_network', id, id)
 
     @handle_api_error
+    @log.log_call()
+    @cache.invalidates('subnet', cascade=('network',))
     def create_subnet(self, context, subnet):
         """Create Neutron subnet.
 
         Creates a Neutron subnet and a DHCP entry in MidoNet bridge.
         """
-        LOG.info(_("MidonetPluginV2.create_subnet called: subnet=%r"), subnet)
+        return self._create_with_midonet(
+            context, 'create_subnet',
+            lambda: super(MidonetPluginV2, self).create_subnet(context,
+                                                               subnet),
+            lambda sn: self._midonet_call(context, 'create_subnet', sn['id'],
+                                          sn, parent_id=sn['network_id']),
+            lambda sn: super(MidonetPluginV2, self).delete_subnet(context,
+                                                                  sn['id']),
+            depends_on=[subnet['subnet']['network_id']])
 
-        sn_entry = super(MidonetPluginV2, self).create_subnet(context, subnet)
+    @handle_api_error
+    @log.log_call()
+    @cache.invalidates('subnet', cascade=('network',))
+    def create_subnet_bulk(self, context, subnets):
+        """Create Neutron subnets and their MidoNet DHCP entries in one
+        batch.
+        """
+        items = subnets['subnets']
 
-        try:
-            self.api_cli.create_subnet(sn_entry)
-        except Exception as ex:
-            LOG.error(_("Failed to create a subnet %(s_id)s in Midonet:"
-                        "%(err)s"), {"s_id": sn_entry["id"], "err": ex})
-            with excutils.save_and_reraise_exception():
-                super(MidonetPluginV2, self).delete_subnet(context,
-                                                           sn_entry['id'])
+        def create():
+            with context.session.begin(subtransactions=True):
+                return [super(MidonetPluginV2, self).create_subnet(context,
+                                                                   item)
+                        for item in items]
 
-        LOG.info(_("MidonetPluginV2.create_subnet exiting: sn_entry=%r"),
-                 sn_entry)
-        return sn_entry
+        return self._create_with_midonet(
+            context, 'create_subnet_bulk', create,
+            lambda sns: self._create_midonet_bulk(context, 'subnet', sns,
+                                                  parent='network_id'),
+            lambda sns: self._delete_neutron_bulk(context, 'subnet', sns),
+            depends_on=[item['subnet']['network_id'] for item in items])
 
     @handle_api_error
+    @log.log_call()
+    @cache.invalidates('subnet', cascade=('network', 'port'))
     def delete_subnet(self, context, id):
         """Delete Neutron subnet.
 
         Delete neutron network and its corresponding MidoNet bridge.
         """
-        LOG.info(_("MidonetPluginV2.delete_subnet called: id=%s"), id)
-
+        network_id = self._get_subnet(context, id)['network_id']
         with context.session.begin(subtransactions=True):
             super(MidonetPluginV2, self).delete_subnet(context, id)
-            self.api_cli.delete_subnet(id)
-
-        LOG.info(_("MidonetPluginV2.delete_subnet exiting"))
+            self._midonet_call(context, 'delete_subnet', id, id,
+                               parent_id=network_id)
 
     @handle_api_error
+    @log.log_call()
+    @cache.invalidates('subnet')
     def update_subnet(self, context, id, subnet):
         """Update the subnet with new info.
         """
-        LOG.info(_("MidonetPluginV2.update_subnet called: id=%s"), id)
-
         with context.session.begin(subtransactions=True):
+            before = super(MidonetPluginV2, self).get_subnet(context, id)
             s = super(MidonetPluginV2, self).update_subnet(context, id, subnet)
-            self.api_cli.update_subnet(id, s)
+            self._update_midonet(context, 'subnet', id, before, s,
+                                 parent_id=s['network_id'])
 
         return s
 
     def _process_create_port(self, context, port):
         """Create a L2 port in Neutron/MidoNet."""
         port_data = port['port']
+        if not port_data.get('device_owner', '').startswith('network:'):
+            # Look the default security group up before the transaction is
+            # opened so that it can be cached.
+            self._ensure_default_security_group(
+                context, self._get_tenant_id_for_create(context, port_data))
+
         with context.session.begin(subtransactions=True):
             # Create a Neutron port
             new_port = super(MidonetPluginV2, self).create_port(context, port)
@@ -300,63 +765,111 @@ class MidonetPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
         return new_port
 
     @handle_api_error
-    @utils.synchronized('midonet-critical-section', external=True)
+    @log.log_call()
+    @cache.invalidates('port')
     def create_port(self, context, port):
         """Create a L2 port in Neutron/MidoNet."""
-        LOG.info(_("MidonetPluginV2.create_port called: port=%r"), port)
-
-        new_port = self._process_create_port(context, port)
-
-        try:
-            self.api_cli.create_port(new_port)
-        except Exception as ex:
-            LOG.error(_("Failed to create a port %(new_port)s: %(err)s"),
-                      {"new_port": new_port, "err": ex})
-            with excutils.save_and_reraise_exception():
-                super(MidonetPluginV2, self).delete_port(context,
-                                                         new_port['id'])
+        network_id = port['port']['network_id']
+        with self.locks.network(network_id, owner='create_port'):
+            return self._create_with_midonet(
+                context, 'create_port',
+                lambda: self._process_create_port(context, port),
+                lambda p: self._midonet_call(context, 'create_port', p['id'],
+                                             p, parent_id=network_id),
+                lambda p: super(MidonetPluginV2, self).delete_port(context,
+                                                                   p['id']),
+                depends_on=[network_id])
 
-        LOG.info(_("MidonetPluginV2.create_port exiting: port=%r"), new_port)
-        return new_port
+    @handle_api_error
+    @log.log_call()
+    @cache.invalidates('port')
+    def create_port_bulk(self, context, ports):
+        """Create L2 ports in Neutron/MidoNet in one batch."""
+        items = ports['ports']
+        self._ensure_default_security_groups(context, 'port', items)
+        network_ids = set(item['port']['network_id'] for item in items)
+
+        def create():
+            with context.session.begin(subtransactions=True):
+                return [self._process_create_port(context, item)
+                        for item in items]
+
+        with self.locks.networks(network_ids, owner='create_port_bulk'):
+            return self._create_with_midonet(
+                context, 'create_port_bulk', create,
+                lambda ps: self._create_midonet_bulk(context, 'port', ps,
+                                                     parent='network_id'),
+                lambda ps: self._delete_neutron_bulk(context, 'port', ps),
+                depends_on=network_ids)
 
     @handle_api_error
-    @utils.synchronized('midonet-critical-section', external=True)
+    @log.log_call()
+    @cache.invalidates('port')
     def delete_port(self, context, id, l3_port_check=True):
         """Delete a neutron port and corresponding MidoNet bridge port."""
-        LOG.info(_("MidonetPluginV2.delete_port called: id=%(id)s "
-                   "l3_port_check=%(l3_port_check)r"),
-                 {'id': id, 'l3_port_check': l3_port_check})
-
         # if needed, check to see if this is a port owned by
         # and l3-router.  If so, we should prevent deletion.
         if l3_port_check:
             self.prevent_l3_port_deletion(context, id)
 
-        with context.session.begin(subtransactions=True):
-            super(MidonetPluginV2, self).disassociate_floatingips(
-                context, id, do_notify=False)
-            super(MidonetPluginV2, self).delete_port(context, id)
-            self.api_cli.delete_port(id)
-
-        LOG.info(_("MidonetPluginV2.delete_port exiting: id=%r"), id)
+        network_id = self._get_port(context, id)['network_id']
+        with self.locks.network(network_id, id, owner='delete_port'):
+            with context.session.begin(subtransactions=True):
+                super(MidonetPluginV2, self).disassociate_floatingips(
+                    context, id, do_notify=False)
+                super(MidonetPluginV2, self).delete_port(context, id)
+                if self.port_update_window > 0:
+                    # The port's merged updates are moot
+                    journal_db.discard_entries(context.session, id,
+                                               'update_port')
+                self._midonet_call(context, 'delete_port', id, id,
+                                   parent_id=network_id)
 
     def _process_port_update(self, context, id, in_port, out_port):
+        """Update the security group bindings of a port.
 
+        Only the bindings of the groups added to or removed from the port
+        are touched.  Return the sets of added and removed group IDs.
+        """
         has_sg = self._check_update_has_security_groups(in_port)
         delete_sg = self._check_update_deletes_security_groups(in_port)
 
-        if delete_sg or has_sg:
-            # delete the port binding and read it with the new rules.
-            self._delete_port_security_group_bindings(context, id)
-            sg_ids = self._get_security_groups_on_port(context, in_port)
-            self._process_port_create_security_group(context, out_port, sg_ids)
+        if not (delete_sg or has_sg):
+            return set(), set()
+
+        sg_ids = self._get_security_groups_on_port(context, in_port) or []
+        bindings = self._get_port_security_group_bindings(
+            context, {'port_id': [id]})
+        old_ids = set(b['security_group_id'] for b in bindings)
+        added = set(sg_ids) - old_ids
+        removed = old_ids - set(sg_ids)
+
+        binding_model = securitygroups_db.SecurityGroupPortBinding
+        with context.session.begin(subtransactions=True):
+            if removed:
+                query = self._model_query(context, binding_model).filter(
+                    binding_model.port_id == id,
+                    binding_model.security_group_id.in_(list(removed)))
+                for binding in query:
+                    context.session.delete(binding)
+            for sg_id in added:
+                self._create_port_security_group_binding(context, id, sg_id)
+
+        out_port[ext_sg.SECURITYGROUPS] = list(sg_ids)
+        if added or removed:
+            LOG.debug(_("Security groups of port %(id)s: added %(added)s, "
+                        "removed %(removed)s"),
+                      {'id': id, 'added': list(added),
+                       'removed': list(removed)})
+        return added, removed
 
     @handle_api_error
+    @log.log_call()
+    @cache.invalidates('port')
     def update_port(self, context, id, port):
         """Handle port update, including security groups and fixed IPs."""
-        LOG.info(_("MidonetPluginV2.update_port called: id=%(id)s "
-                   "port=%(port)r"), {'id': id, 'port': port})
         with context.session.begin(subtransactions=True):
+            before = super(MidonetPluginV2, self).get_port(context, id)
 
             # update the port DB
             p = super(MidonetPluginV2, self).update_port(context, id, port)
@@ -364,12 +877,14 @@ class MidonetPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
             self._process_port_update(context, id, port, p)
             self._process_portbindings_create_and_update(context,
                                                          port['port'], p)
-            self.api_cli.update_port(id, p)
+            self._update_midonet(context, 'port', id, before, p,
+                                 parent_id=p['network_id'],
+                                 delay=self.port_update_window or None)
 
-        LOG.info(_("MidonetPluginV2.update_port exiting: p=%r"), p)
         return p
 
     @handle_api_error
+    @log.log_call()
     def create_router(self, context, router):
         """Handle router creation.
 
@@ -380,35 +895,29 @@ class MidonetPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
 
         :param router: Router information provided to create a new router.
         """
-        LOG.info(_("MidonetPluginV2.create_router called: router=%(router)s"),
-                 {"router": router})
-        r = super(MidonetPluginV2, self).create_router(context, router)
-        try:
-            self.api_cli.create_router(r)
-        except Exception as ex:
-            LOG.error(_("Failed to create a router %(r_id)s in Midonet:"
-                        "%(err)s"), {"r_id": r["id"], "err": ex})
-            with excutils.save_and_reraise_exception():
-                super(MidonetPluginV2, self).delete_router(context, r['id'])
-
-        LOG.info(_("MidonetPluginV2.create_router exiting: "
-                   "router=%(router)s."), {"router": r})
-        return r
+        return self._create_with_midonet(
+            context, 'create_router',
+            lambda: super(MidonetPluginV2, self).create_router(context,
+                                                               router),
+            lambda r: self._midonet_call(context, 'create_router', r['id'],
+                                         r),
+            lambda r: super(MidonetPluginV2, self).delete_router(context,
+                                                                 r['id']))
 
     @handle_api_error
+    @log.log_call()
     def update_router(self, context, id, router):
         """Handle router updates."""
-        LOG.info(_("MidonetPluginV2.update_router called: id=%(id)s "
-                   "router=%(router)r"), {"id": id, "router": router})
-
         with context.session.begin(subtransactions=True):
+            before = super(MidonetPluginV2, self).get_router(context, id)
             r = super(MidonetPluginV2, self).update_router(context, id, router)
-            self.api_cli.update_router(id, r)
+            self._update_midonet(context, 'router', id, before, r)
 
-        LOG.info(_("MidonetPluginV2.update_router exiting: router=%r"), r)
         return r
 
     @handle_api_error
+    @log.log_call()
+    @cache.invalidates('port', precise=False)
     def delete_router(self, context, id):
         """Handler for router deletion.
 
@@ -417,103 +926,93 @@ class MidonetPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
 
         :param id: router ID to remove
         """
-        LOG.info(_("MidonetPluginV2.delete_router called: id=%s"), id)
-
         with context.session.begin(subtransactions=True):
             super(MidonetPluginV2, self).delete_router(context, id)
-            self.api_cli.delete_router(id)
-
-        LOG.info(_("MidonetPluginV2.delete_router exiting: id=%s"), id)
+            self._midonet_call(context, 'delete_router', id, id)
 
     @handle_api_error
+    @log.log_call()
+    @cache.invalidates('port', precise=False)
     def add_router_interface(self, context, router_id, interface_info):
-        """Handle router linking with network."""
-        LOG.info(_("MidonetPluginV2.add_router_interface called: "
-                   "router_id=%(router_id)s "
-                   "interface_info=%(interface_info)r"),
-                 {'router_id': router_id, 'interface_info': interface_info})
+        """Handle router linking with network.
 
-        info = super(MidonetPluginV2, self).add_router_interface(
-            context, router_id, interface_info)
-
-        try:
-            self.api_cli.add_router_interface(router_id, info)
-        except Exception:
-            LOG.error(_("Failed to create MidoNet resources to add router "
-                        "interface. info=%(info)s, router_id=%(router_id)s"),
-                      {"info": info, "router_id": router_id})
-            with excutils.save_and_reraise_exception():
-                self.remove_router_interface(context, router_id, info)
-
-        LOG.info(_("MidonetPluginV2.add_router_interface exiting: info=%r"),
-                 info)
-        return info
+        The MidoNet call waits for the router, and for the port or subnet
+        given, whose interface port becomes its journal parent.
+        """
+        return self._create_with_midonet(
+            context, 'add_router_interface',
+            lambda: super(MidonetPluginV2, self).add_router_interface(
+                context, router_id, interface_info),
+            lambda info: self._midonet_call(context, 'add_router_interface',
+                                            router_id, router_id, info,
+                                            parent_id=info['port_id']),
+            lambda info: self.remove_router_interface(context, router_id,
+                                                      info),
+            depends_on=[router_id, interface_info.get('port_id'),
+                        interface_info.get('subnet_id')])
 
     @handle_api_error
+    @log.log_call()
+    @cache.invalidates('port', precise=False)
     def remove_router_interface(self, context, router_id, interface_info):
         """Handle router un-linking with network."""
-        LOG.info(_("MidonetPluginV2.remove_router_interface called: "
-                   "router_id=%(router_id)s "
-                   "interface_info=%(interface_info)r"),
-                 {'router_id': router_id, 'interface_info': interface_info})
-
         with context.session.begin(subtransactions=True):
             info = super(MidonetPluginV2, self).remove_router_interface(
                 context, router_id, interface_info)
-            self.api_cli.remove_router_interface(router_id, interface_info)
+            self._midonet_call(context, 'remove_router_interface', router_id,
+                               router_id, interface_info,
+                               parent_id=info['port_id'])
 
-        LOG.info(_("MidonetPluginV2.remove_router_interface exiting: "
-                   "info=%r"), info)
         return info
 
     @handle_api_error
+    @log.log_call()
     def create_floatingip(self, context, floatingip):
         """Handle floating IP creation."""
-        LOG.info(_("MidonetPluginV2.create_floatingip called: ip=%r"),
-                 floatingip)
-
-        fip = super(MidonetPluginV2, self).create_floatingip(context,
-                                                             floatingip)
-        try:
-            self.api_cli.create_floating_ip(fip)
-        except Exception as ex:
-            LOG.error(_("Failed to create floating ip %(fip)s: %(err)s"),
-                      {"fip": fip, "err": ex})
-            with excutils.save_and_reraise_exception():
-                # Try removing the fip
-                self.delete_floatingip(context, fip['id'])
-
-        LOG.info(_("MidonetPluginV2.create_floatingip exiting: fip=%r"),
-                 fip)
-        return fip
+        data = floatingip['floatingip']
+        router_id = None
+        if data.get('port_id'):
+            # The router the floating IP will be created on, its journal
+            # parent, resolved as L3 does when associating it
+            router_id = self.get_assoc_data(
+                context, data, data['floating_network_id'])[2]
+        return self._create_with_midonet(
+            context, 'create_floatingip',
+            lambda: super(MidonetPluginV2, self).create_floatingip(
+                context, floatingip),
+            lambda fip: self._midonet_call(context, 'create_floating_ip',
+                                           fip['id'], fip,
+                                           parent_id=fip['router_id']),
+            lambda fip: self.delete_floatingip(context, fip['id']),
+            depends_on=[data.get('port_id'), router_id])
 
     @handle_api_error
+    @log.log_call()
     def delete_floatingip(self, context, id):
         """Handle floating IP deletion."""
-        LOG.info(_("MidonetPluginV2.delete_floatingip called: id=%s"), id)
-
+        router_id = self._get_floatingip(context, id)['router_id']
         with context.session.begin(subtransactions=True):
             super(MidonetPluginV2, self).delete_floatingip(context, id)
-            self.api_cli.delete_floating_ip(id)
-
-        LOG.info(_("MidonetPluginV2.delete_floatingip exiting: id=%r"), id)
+            self._midonet_call(context, 'delete_floating_ip', id, id,
+                               parent_id=router_id)
 
     @handle_api_error
+    @log.log_call()
     def update_floatingip(self, context, id, floatingip):
         """Handle floating IP association and disassociation."""
-        LOG.info(_("MidonetPluginV2.update_floatingip called: id=%(id)s "
-                   "floatingip=%(floatingip)s "),
-                 {'id': id, 'floatingip': floatingip})
-
         with context.session.begin(subtransactions=True):
+            before = super(MidonetPluginV2, self).get_floatingip(context, id)
             fip = super(MidonetPluginV2, self).update_floatingip(context, id,
                                                                  floatingip)
-            self.api_cli.update_floating_ip(id, fip)
+            self._update_midonet(context, 'floatingip', id, before, fip,
+                                 operation='update_floating_ip',
+                                 parent_id=(fip['router_id'] or
+                                            before['router_id']))
 
-        LOG.info(_("MidonetPluginV2.update_floating_ip exiting: fip=%s"), fip)
         return fip
 
     @handle_api_error
+    @log.log_call()
     def create_security_group(self, context, security_group, default_sg=False):
         """Create security group.
 
@@ -521,38 +1020,24 @@ class MidonetPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
         In MidoNet, this means creating a pair of chains, inbound and outbound,
         as well as a new port group.
         """
-        LOG.info(_("MidonetPluginV2.create_security_group called: "
-                   "security_group=%(security_group)s "
-                   "default_sg=%(default_sg)s "),
-                 {'security_group': security_group, 'default_sg': default_sg})
-
         sg = security_group.get('security_group')
         tenant_id = self._get_tenant_id_for_create(context, sg)
         if not default_sg:
             self._ensure_default_security_group(context, tenant_id)
 
-        # Create the Neutron sg first
-        sg = super(MidonetPluginV2, self).create_security_group(
-            context, security_group, default_sg)
-
-        try:
-            # Process the MidoNet side
-            self.api_cli.create_security_group(sg)
-        except Exception:
-            LOG.error(_("Failed to create MidoNet resources for sg %(sg)r"),
-                      {"sg": sg})
-            with excutils.save_and_reraise_exception():
-                super(MidonetPluginV2, self).delete_security_group(context,
-                                                                   sg['id'])
-
-        LOG.info(_("MidonetPluginV2.create_security_group exiting: sg=%r"), sg)
-        return sg
+        return self._create_with_midonet(
+            context, 'create_security_group',
+            lambda: super(MidonetPluginV2, self).create_security_group(
+                context, security_group, default_sg),
+            lambda sg: self._midonet_call(context, 'create_security_group',
+                                          sg['id'], sg),
+            lambda sg: super(MidonetPluginV2, self).delete_security_group(
+                context, sg['id']))
 
     @handle_api_error
+    @log.log_call()
     def delete_security_group(self, context, id):
         """Delete chains for Neutron security group."""
-        LOG.info(_("MidonetPluginV2.delete_security_group called: id=%s"), id)
-
         sg = super(MidonetPluginV2, self).get_security_group(context, id)
         if not sg:
             raise ext_sg.SecurityGroupNotFound(id=id)
@@ -562,128 +1047,106 @@ class MidonetPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
 
         with context.session.begin(subtransactions=True):
             super(MidonetPluginV2, self).delete_security_group(context, id)
-            self.api_cli.delete_security_group(id)
+            self._midonet_call(context, 'delete_security_group', id, id)
 
-        LOG.info(_("MidonetPluginV2.delete_security_group exiting: id=%r"), id)
+        if sg["name"] == 'default':
+            self.default_sg_cache.invalidate(context, sg['tenant_id'])
 
     @handle_api_error
+    @log.log_call()
     def create_security_group_rule(self, context, security_group_rule):
         """Create a security group rule
 
         Create a security group rule in the Neutron DB and corresponding
         MidoNet resources in its data store.
         """
-        LOG.info(_("MidonetPluginV2.create_security_group_rule called: "
-                   "security_group_rule=%(security_group_rule)r"),
-                 {'security_group_rule': security_group_rule})
-
-        rule = super(MidonetPluginV2, self).create_security_group_rule(
-            context, security_group_rule)
-
-        try:
-            self.api_cli.create_security_group_rule(rule)
-        except Exception as ex:
-            LOG.error(_('Failed to create security group rule %(sg)s,'
-                      'error: %(err)s'), {'sg': rule, 'err': ex})
-            with excutils.save_and_reraise_exception():
-                super(MidonetPluginV2, self).delete_security_group_rule(
-                    context, rule['id'])
-
-        LOG.info(_("MidonetPluginV2.create_security_group_rule exiting: "
-                   "rule=%r"), rule)
-        return rule
+        sg_id = security_group_rule['security_group_rule'][
+            'security_group_id']
+        return self._create_with_midonet(
+            context, 'create_security_group_rule',
+            lambda: super(MidonetPluginV2, self).create_security_group_rule(
+                context, security_group_rule),
+            lambda rule: self._midonet_call(
+                context, 'create_security_group_rule', sg_id, rule),
+            lambda rule: super(
+                MidonetPluginV2, self).delete_security_group_rule(
+                    context, rule['id']),
+            depends_on=[sg_id])
 
     @handle_api_error
+    @log.log_call()
     def create_security_group_rule_bulk(self, context, security_group_rules):
         """Create multiple security group rules
 
         Create multiple security group rules in the Neutron DB and
         corresponding MidoNet resources in its data store.
         """
-        LOG.info(_("MidonetPluginV2.create_security_group_rule_bulk called: "
-                   "security_group_rules=%(security_group_rules)r"),
-                 {'security_group_rules': security_group_rules})
-
-        rules = super(
-            MidonetPluginV2, self).create_security_group_rule_bulk_native(
-                context, security_group_rules)
-        try:
-            self.api_cli.create_security_group_rule_bulk(rules)
-        except Exception as ex:
-            LOG.error(_("Failed to create bulk security group rules %(sg)s, "
-                        "error: %(err)s"), {"sg": rules, "err": ex})
-            with excutils.save_and_reraise_exception():
-                for rule in rules:
-                    super(MidonetPluginV2, self).delete_security_group_rule(
-                        context, rule['id'])
-
-        LOG.info(_("MidonetPluginV2.create_security_group_rule_bulk exiting: "
-                   "rules=%r"), rules)
-        return rules
+        sg_ids = [item['security_group_rule']['security_group_id']
+                  for item in security_group_rules['security_group_rules']]
+        return self._create_with_midonet(
+            context, 'create_security_group_rule_bulk',
+            lambda: super(
+                MidonetPluginV2, self).create_security_group_rule_bulk_native(
+                    context, security_group_rules),
+            lambda rules: self._midonet_call(
+                context, 'create_security_group_rule_bulk',
+                rules[0]['security_group_id'], rules),
+            lambda rules: self._delete_neutron_bulk(
+                context, 'security_group_rule', rules),
+            depends_on=sg_ids)
 
     @handle_api_error
+    @log.log_call()
     def delete_security_group_rule(self, context, sg_rule_id):
         """Delete a security group rule
 
         Delete a security group rule from the Neutron DB and corresponding
         MidoNet resources from its data store.
         """
-        LOG.info(_("MidonetPluginV2.delete_security_group_rule called: "
-                   "sg_rule_id=%s"), sg_rule_id)
-
         with context.session.begin(subtransactions=True):
+            rule = self._get_security_group_rule(context, sg_rule_id)
+            sg_id = rule['security_group_id']
             super(MidonetPluginV2, self).delete_security_group_rule(context,
                                                                     sg_rule_id)
-            self.api_cli.delete_security_group_rule(sg_rule_id)
-
-        LOG.info(_("MidonetPluginV2.delete_security_group_rule exiting: "
-                   "id=%r"), id)
+            self._midonet_call(context, 'delete_security_group_rule', sg_id,
+                               sg_rule_id)
 
     @handle_api_error
+    @log.log_call(debug=True)
     def create_vip(self, context, vip):
-        LOG.debug("MidonetPluginV2.create_vip called: %(vip)r",
-                  {'vip': vip})
-
         with context.session.begin(subtransactions=True):
             v = super(MidonetPluginV2, self).create_vip(context, vip)
-            self.api_cli.create_vip(v)
+            self._midonet_call(context, 'create_vip', v['id'], v,
+                               parent_id=v['pool_id'])
             v['status'] = constants.ACTIVE
             self.update_status(context, loadbalancer_db.Vip, v['id'],
                                v['status'])
 
-        LOG.debug("MidonetPluginV2.create_vip exiting: id=%r", v['id'])
         return v
 
     @handle_api_error
+    @log.log_call(debug=True)
     def delete_vip(self, context, id):
-        LOG.debug("MidonetPluginV2.delete_vip called: id=%(id)r",
-                  {'id': id})
-
+        pool_id = super(MidonetPluginV2, self).get_vip(context, id)['pool_id']
         with context.session.begin(subtransactions=True):
             super(MidonetPluginV2, self).delete_vip(context, id)
-            self.api_cli.delete_vip(id)
-
-        LOG.debug("MidonetPluginV2.delete_vip existing: id=%(id)r",
-                  {'id': id})
+            self._midonet_call(context, 'delete_vip', id, id,
+                               parent_id=pool_id)
 
     @handle_api_error
+    @log.log_call(debug=True)
     def update_vip(self, context, id, vip):
-        LOG.debug("MidonetPluginV2.update_vip called: id=%(id)r, "
-                  "vip=%(vip)r", {'id': id, 'vip': vip})
-
         with context.session.begin(subtransactions=True):
+            before = super(MidonetPluginV2, self).get_vip(context, id)
             v = super(MidonetPluginV2, self).update_vip(context, id, vip)
-            self.api_cli.update_vip(id, v)
+            self._update_midonet(context, 'vip', id, before, v,
+                                 parent_id=v['pool_id'])
 
-        LOG.debug("MidonetPluginV2.update_vip exiting: id=%(id)r, "
-                  "vip=%(vip)r", {'id': id, 'vip': v})
         return v
 
     @handle_api_error
+    @log.log_call(debug=True)
     def create_pool(self, context, pool):
-        LOG.debug("MidonetPluginV2.create_pool called: %(pool)r",
-                  {'pool': pool})
-
         router_id = pool['pool'].get(rsi.ROUTER_ID)
         if not router_id:
             msg = _("router_id is required for pool")
@@ -704,130 +1167,98 @@ class MidonetPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
                                                     loadbalancer_db.Pool)
             p[rsi.ROUTER_ID] = router_id
 
-            self.api_cli.create_pool(p)
+            self._midonet_call(context, 'create_pool', p['id'], p,
+                               parent_id=router_id)
 
             p['status'] = constants.ACTIVE
             self.update_status(context, loadbalancer_db.Pool, p['id'],
                                p['status'])
 
-        LOG.debug("MidonetPluginV2.create_pool exiting: %(pool)r",
-                  {'pool': p})
         return p
 
     @handle_api_error
+    @log.log_call(debug=True)
     def update_pool(self, context, id, pool):
-        LOG.debug("MidonetPluginV2.update_pool called: id=%(id)r, "
-                  "pool=%(pool)r", {'id': id, 'pool': pool})
-
         with context.session.begin(subtransactions=True):
+            before = super(MidonetPluginV2, self).get_pool(context, id)
             p = super(MidonetPluginV2, self).update_pool(context, id, pool)
-            self.api_cli.update_pool(id, p)
+            self._update_midonet(context, 'pool', id, before, p)
 
-        LOG.debug("MidonetPluginV2.update_pool exiting: id=%(id)r, "
-                  "pool=%(pool)r", {'id': id, 'pool': pool})
         return p
 
     @handle_api_error
+    @log.log_call(debug=True)
     def delete_pool(self, context, id):
-        LOG.debug("MidonetPluginV2.delete_pool called: %(id)r", {'id': id})
-
         with context.session.begin(subtransactions=True):
             self._delete_resource_router_id_binding(context, id,
                                                     loadbalancer_db.Pool)
             super(MidonetPluginV2, self).delete_pool(context, id)
-            self.api_cli.delete_pool(id)
-
-        LOG.debug("MidonetPluginV2.delete_pool exiting: %(id)r", {'id': id})
+            self._midonet_call(context, 'delete_pool', id, id)
 
     @handle_api_error
+    @log.log_call(debug=True)
     def create_member(self, context, member):
-        LOG.debug("MidonetPluginV2.create_member called: %(member)r",
-                  {'member': member})
-
         with context.session.begin(subtransactions=True):
             m = super(MidonetPluginV2, self).create_member(context, member)
-            self.api_cli.create_member(m)
+            self._midonet_call(context, 'create_member', m['id'], m,
+                               parent_id=m['pool_id'])
             m['status'] = constants.ACTIVE
             self.update_status(context, loadbalancer_db.Member, m['id'],
                                m['status'])
 
-        LOG.debug("MidonetPluginV2.create_member exiting: %(member)r",
-                  {'member': m})
         return m
 
     @handle_api_error
+    @log.log_call(debug=True)
     def update_member(self, context, id, member):
-        LOG.debug("MidonetPluginV2.update_member called: id=%(id)r, "
-                  "member=%(member)r", {'id': id, 'member': member})
-
         with context.session.begin(subtransactions=True):
+            before = super(MidonetPluginV2, self).get_member(context, id)
             m = super(MidonetPluginV2, self).update_member(context, id, member)
-            self.api_cli.update_member(id, m)
+            self._update_midonet(context, 'member', id, before, m,
+                                 parent_id=m['pool_id'])
 
-        LOG.debug("MidonetPluginV2.update_member exiting: id=%(id)r, "
-                  "member=%(member)r", {'id': id, 'member': m})
         return m
 
     @handle_api_error
+    @log.log_call(debug=True)
     def delete_member(self, context, id):
-        LOG.debug("MidonetPluginV2.delete_member called: %(id)r",
-                  {'id': id})
-
+        pool_id = super(MidonetPluginV2, self).get_member(context,
+                                                          id)['pool_id']
         with context.session.begin(subtransactions=True):
             super(MidonetPluginV2, self).delete_member(context, id)
-            self.api_cli.delete_member(id)
-
-        LOG.debug("MidonetPluginV2.delete_member exiting: %(id)r",
-                  {'id': id})
+            self._midonet_call(context, 'delete_member', id, id,
+                               parent_id=pool_id)
 
     @handle_api_error
+    @log.log_call(debug=True)
     def create_health_monitor(self, context, health_monitor):
-        LOG.debug("MidonetPluginV2.create_health_monitor called: "
-                  " %(health_monitor)r", {'health_monitor': health_monitor})
-
         with context.session.begin(subtransactions=True):
             hm = super(MidonetPluginV2, self).create_health_monitor(
                 context, health_monitor)
-            self.api_cli.create_health_monitor(hm)
+            self._midonet_call(context, 'create_health_monitor', hm['id'], hm)
 
-        LOG.debug("MidonetPluginV2.create_health_monitor exiting: "
-                  "%(health_monitor)r", {'health_monitor': hm})
         return hm
 
     @handle_api_error
+    @log.log_call(debug=True)
     def update_health_monitor(self, context, id, health_monitor):
-        LOG.debug("MidonetPluginV2.update_health_monitor called: id=%(id)r, "
-                  "health_monitor=%(health_monitor)r",
-                  {'id': id, 'health_monitor': health_monitor})
-
         with context.session.begin(subtransactions=True):
             hm = super(MidonetPluginV2, self).update_health_monitor(
                 context, id, health_monitor)
-            self.api_cli.update_health_monitor(id, hm)
+            self._midonet_call(context, 'update_health_monitor', id, id, hm)
 
-        LOG.debug("MidonetPluginV2.update_health_monitor exiting: id=%(id)r, "
-                  "health_monitor=%(health_monitor)r",
-                  {'id': id, 'health_monitor': hm})
         return hm
 
     @handle_api_error
+    @log.log_call(debug=True)
     def delete_health_monitor(self, context, id):
-        LOG.debug("MidonetPluginV2.delete_health_monitor called: %(id)r",
-                  {'id': id})
-
         with context.session.begin(subtransactions=True):
             super(MidonetPluginV2, self).delete_health_monitor(context, id)
-            self.api_cli.delete_health_monitor(id)
-
-        LOG.debug("MidonetPluginV2.delete_health_monitor exiting: %(id)r",
-                  {'id': id})
+            self._midonet_call(context, 'delete_health_monitor', id, id)
 
     @handle_api_error
+    @log.log_call(debug=True)
     def create_pool_health_monitor(self, context, health_monitor, pool_id):
-        LOG.debug("MidonetPluginV2.create_pool_health_monitor called: "
-                  "hm=%(health_monitor)r, pool_id=%(pool_id)r",
-                  {'health_monitor': health_monitor, 'pool_id': pool_id})
-
         pool = self.get_pool(context, pool_id)
         monitors = pool.get('health_monitors')
         if len(monitors) > 0:
@@ -838,23 +1269,16 @@ class MidonetPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
         with context.session.begin(subtransactions=True):
             monitors = super(MidonetPluginV2, self).create_pool_health_monitor(
                 context, health_monitor, pool_id)
-            self.api_cli.create_pool_health_monitor(hm, pool_id)
+            self._midonet_call(context, 'create_pool_health_monitor', pool_id,
+                               hm, pool_id)
 
-        LOG.debug("MidonetPluginV2.create_pool_health_monitor exiting: "
-                  "%(health_monitor)r, %(pool_id)r",
-                  {'health_monitor': health_monitor, 'pool_id': pool_id})
         return monitors
 
     @handle_api_error
+    @log.log_call(debug=True)
     def delete_pool_health_monitor(self, context, id, pool_id):
-        LOG.debug("MidonetPluginV2.delete_pool_health_monitor called: "
-                  "id=%(id)r, pool_id=%(pool_id)r",
-                  {'id': id, 'pool_id': pool_id})
-
         with context.session.begin(subtransactions=True):
             super(MidonetPluginV2, self).delete_pool_health_monitor(
                 context, id, pool_id)
-            self.api_cli.delete_pool_health_monitor(id, pool_id)
-
-        LOG.debug("MidonetPluginV2.delete_pool_health_monitor exiting: "
-                  "%(id)r, %(pool_id)r", {'id': id, 'pool_id': pool_id})
+            self._midonet_call(context, 'delete_pool_health_monitor', pool_id,
+                               id, pool_id)
@@ -0,0 +1,313 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Background reconciliation of the Neutron DB with MidoNet.
+
+Each pass reads the resources of each type from the Neutron DB, groups them
+in buckets (per tenant, or per parent for subnets, ports and security group
+rules) and digests the fields MidoNet acts upon.  The MidoNet side of a
+bucket is known from the previous passes, and only the buckets whose
+digests differ are fetched again from MidoNet, resource by resource.  Every
+reconcile_full_every passes the resources of MidoNet are listed in full
+instead, to find the changes made behind Neutron's back.
+
+A divergence is repaired only once it has been seen in two consecutive
+passes, so that resources being created or deleted while the pass runs are
+not touched, and resources with journal entries still waiting to be
+replayed are left alone.  The reconciler runs in the RPC workers, and a
+pass is skipped while another process holds the reconciliation lock.
+"""
+
+import collections
+import hashlib
+import time
+
+import eventlet
+from webob import exc as w_exc
+
+from neutron.common import constants as n_const
+from neutron import context as n_context
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
+
+from midonet.neutron.common import fanout
+from midonet.neutron.common import fields
+from midonet.neutron.db import journal_db
+
+LOG = logging.getLogger(__name__)
+
+MISSING = 'missing'
+ORPHAN = 'orphan'
+MISMATCH = 'mismatch'
+
+# Ports that have no bridge port counterpart in MidoNet
+_SKIPPED_DEVICE_OWNERS = (n_const.DEVICE_OWNER_ROUTER_GW,
+                          n_const.DEVICE_OWNER_FLOATINGIP)
+
+
+class _ResourceType(object):
+
+    def __init__(self, name, bucket_key, mido_name=None, skip=None,
+                 updatable=True):
+        self.name = name
+        self.bucket_key = bucket_key
+        # Name of the resource in the MidoNet client calls
+        self.mido_name = mido_name or name
+        self.skip = skip
+        # Whether MidoNet supports updating the resource in place
+        self.updatable = updatable
+
+
+# In the order repairs must be made, parents first
+RESOURCE_TYPES = (
+    _ResourceType('security_group', 'tenant_id', updatable=False),
+    _ResourceType('security_group_rule', 'security_group_id',
+                  updatable=False),
+    _ResourceType('network', 'tenant_id'),
+    _ResourceType('subnet', 'network_id'),
+    _ResourceType('router', 'tenant_id'),
+    _ResourceType('port', 'network_id',
+                  skip=lambda port: (port.get('device_owner') in
+                                     _SKIPPED_DEVICE_OWNERS)),
+    _ResourceType('floatingip', 'tenant_id', mido_name='floating_ip'),
+)
+
+
+class RateLimiter(object):
+    """Token bucket limiting the MidoNet calls made by the reconciler."""
+
+    def __init__(self, rate):
+        self._rate = float(rate)
+        self._tokens = self._rate
+        self._last = time.time()
+
+    def wait(self):
+        now = time.time()
+        self._tokens = min(self._rate,
+                           self._tokens + (now - self._last) * self._rate)
+        self._last = now
+        # The token is taken before sleeping so that green threads waiting
+        # at once each wait for their own token
+        self._tokens -= 1
+        if self._tokens < 0:
+            eventlet.sleep(-self._tokens / self._rate)
+
+
+def _digest(res_type, obj):
+    """Digest the fields of a resource that MidoNet acts upon."""
+    projected = fields.project(res_type.name, obj)
+    return hashlib.md5(jsonutils.dumps(sorted(projected.items()))).hexdigest()
+
+
+def _bucket_hash(digests):
+    digest = hashlib.md5()
+    for res_id in sorted(digests):
+        digest.update('%s:%s;' % (res_id, digests[res_id]))
+    return digest.hexdigest()
+
+
+class Reconciler(object):
+
+    def __init__(self, plugin, conf):
+        self._plugin = plugin
+        self._conf = conf
+        self._limiter = RateLimiter(conf.reconcile_rate)
+        self._fanout = fanout.Executor(conf.fanout_workers)
+        self._suspects = set()
+        # MidoNet digests of the resources, per type and bucket, as last
+        # fetched from MidoNet
+        self._known = {}
+        self._passes = 0
+        self._timer = None
+
+    def start(self):
+        self._timer = loopingcall.FixedIntervalLoopingCall(self.reconcile)
+        self._timer.start(interval=self._conf.reconcile_interval,
+                          initial_delay=self._conf.reconcile_interval)
+
+    def stop(self):
+        if self._timer:
+            self._timer.stop()
+            self._timer = None
+
+    def reconcile(self):
+        # Only one process of the deployment runs a given pass
+        with self._plugin.locks.try_lock('reconcile') as locked:
+            if not locked:
+                LOG.debug(_("Reconciliation pass run by another process"))
+                return
+            self._reconcile()
+
+    def _reconcile(self):
+        context = n_context.get_admin_context()
+        busy = set()
+        if self._plugin.journal is not None:
+            busy = journal_db.get_unfinished_object_ids(context.session)
+
+        full = self._passes % max(1, self._conf.reconcile_full_every) == 0
+        self._passes += 1
+        suspects = set()
+        for res_type in RESOURCE_TYPES:
+            try:
+                suspects.update(
+                    self._reconcile_type(context, res_type, busy, full))
+            except Exception:
+                LOG.exception(_("Failed to reconcile MidoNet %ss"),
+                              res_type.name)
+                # Start over from a full listing of this type
+                self._known.pop(res_type.name, None)
+        self._suspects = suspects
+
+    def _buckets(self, res_type, objs):
+        buckets = collections.defaultdict(dict)
+        for obj in objs:
+            if res_type.skip and res_type.skip(obj):
+                continue
+            bucket = obj.get(res_type.bucket_key)
+            buckets[bucket][obj['id']] = _digest(res_type, obj)
+        return buckets
+
+    def _neutron_buckets(self, context, res_type):
+        getter = getattr(self._plugin, 'get_%ss' % res_type.name)
+        return self._buckets(res_type, getter(context))
+
+    def _list_midonet(self, res_type):
+        """List the MidoNet resources of a type, in one call."""
+        self._limiter.wait()
+        objs = self._plugin._invoke_api('get_%ss' % res_type.mido_name)
+        return self._buckets(res_type, objs)
+
+    def _fetch_midonet(self, res_type, res_ids):
+        """Fetch MidoNet resources one by one, with a call for each."""
+        def fetch(res_id):
+            self._limiter.wait()
+            try:
+                return self._plugin._invoke_api(
+                    'get_%s' % res_type.mido_name, res_id)
+            except w_exc.HTTPNotFound:
+                return None
+
+        objs = self._fanout.map(fetch, sorted(res_ids))
+        return self._buckets(res_type, [obj for obj in objs if obj])
+
+    def _midonet_buckets(self, res_type, neutron, full):
+        if full or res_type.name not in self._known:
+            midonet = self._list_midonet(res_type)
+        else:
+            known = self._known[res_type.name]
+            midonet = collections.defaultdict(dict)
+            res_ids = set()
+            for bucket in set(neutron) | set(known):
+                n_digests = neutron.get(bucket, {})
+                m_digests = known.get(bucket, {})
+                if _bucket_hash(n_digests) == _bucket_hash(m_digests):
+                    midonet[bucket] = m_digests
+                else:
+                    res_ids.update(n_digests)
+                    res_ids.update(m_digests)
+            if res_ids:
+                for bucket, digests in self._fetch_midonet(
+                        res_type, res_ids).items():
+                    midonet[bucket].update(digests)
+        self._known[res_type.name] = midonet
+        return midonet
+
+    def _reconcile_type(self, context, res_type, busy, full):
+        neutron = self._neutron_buckets(context, res_type)
+        midonet = self._midonet_buckets(res_type, neutron, full)
+
+        suspects = set()
+        repairs = []
+        for bucket in set(neutron) | set(midonet):
+            n_digests = neutron.get(bucket, {})
+            m_digests = midonet.get(bucket, {})
+            if _bucket_hash(n_digests) == _bucket_hash(m_digests):
+                continue
+
+            for res_id in set(n_digests) | set(m_digests):
+                if res_id in busy:
+                    continue
+                if res_id not in m_digests:
+                    kind = MISSING
+                elif res_id not in n_digests:
+                    kind = ORPHAN
+                elif n_digests[res_id] != m_digests[res_id]:
+                    kind = MISMATCH
+                else:
+                    continue
+                suspect = (res_type.name, res_id, kind)
+                suspects.add(suspect)
+                if suspect in self._suspects:
+                    repairs.append((res_id, kind))
+        self._repair(context, res_type, repairs)
+        return suspects
+
+    def _repair_call(self, context, res_type, res_id, kind):
+        """Return the MidoNet call repairing a resource, if any."""
+        resource = res_type.mido_name
+        if kind == ORPHAN:
+            if not self._conf.reconcile_delete_orphans:
+                LOG.warn(_("MidoNet %(resource)s %(id)s does not exist in "
+                           "Neutron"), {'resource': resource, 'id': res_id})
+                return None
+            return 'delete_%s' % resource, (res_id,)
+
+        if kind == MISMATCH and not res_type.updatable:
+            LOG.warn(_("MidoNet %(resource)s %(id)s differs from Neutron "
+                       "and cannot be updated"),
+                     {'resource': resource, 'id': res_id})
+            return None
+
+        obj = getattr(self._plugin, 'get_%s' % res_type.name)(context, res_id)
+        if kind == MISSING:
+            return 'create_%s' % resource, (obj,)
+        return 'update_%s' % resource, (res_id, obj)
+
+    def _repair(self, context, res_type, repairs):
+        """Repair resources of a type, making the MidoNet calls at once.
+
+        The resources are read from the Neutron DB beforehand since the
+        session cannot be shared with the green threads making the calls.
+        """
+        resource = res_type.mido_name
+        calls = []
+        for res_id, kind in repairs:
+            try:
+                call = self._repair_call(context, res_type, res_id, kind)
+            except Exception as ex:
+                LOG.error(_("Failed to repair MidoNet %(resource)s %(id)s: "
+                            "%(err)s"),
+                          {'resource': resource, 'id': res_id, 'err': ex})
+                continue
+            if call is not None:
+                LOG.warn(_("Repairing %(kind)s MidoNet %(resource)s %(id)s"),
+                         {'kind': kind, 'resource': resource, 'id': res_id})
+                calls.append((res_id, call))
+
+        def invoke(item):
+            operation, args = item[1]
+            self._limiter.wait()
+            return self._plugin._invoke_api(operation, *args)
+
+        try:
+            self._fanout.map(invoke, calls)
+        except fanout.FanoutError as ex:
+            for index, error in ex.errors:
+                LOG.error(_("Failed to repair MidoNet %(resource)s %(id)s: "
+                            "%(err)s"),
+                          {'resource': resource, 'id': calls[index][0],
+                           'err': error})
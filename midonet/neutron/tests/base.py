@@ -0,0 +1,47 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo.config import cfg
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+from neutron.tests import base
+
+from midonet.neutron.common import config  # noqa
+
+
+class MidonetTestCase(base.BaseTestCase):
+
+    def config(self, **overrides):
+        """Override MIDONET options for the test and return the group."""
+        for name, value in overrides.items():
+            cfg.CONF.set_override(name, value, 'MIDONET')
+        self.addCleanup(cfg.CONF.reset)
+        return cfg.CONF.MIDONET
+
+
+class SqliteTestCase(MidonetTestCase):
+    """Test case backed by an in-memory SQLite database holding TABLES."""
+
+    TABLES = ()
+
+    def setUp(self):
+        super(SqliteTestCase, self).setUp()
+        engine = sa.create_engine('sqlite://')
+        for table in self.TABLES:
+            table.create(bind=engine)
+        self.session = orm.sessionmaker(bind=engine, autocommit=True)()
@@ -0,0 +1,105 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from midonet.neutron.common import admission
+from midonet.neutron.tests import base
+
+
+class AdmissionControllerTestCase(base.MidonetTestCase):
+
+    def _controller(self, latency=None, **kwargs):
+        controller = admission.AdmissionController(self.config(**kwargs),
+                                                   lambda: latency)
+        # No background adaptation
+        controller._start = lambda: None
+        return controller
+
+    def _admit(self, controller, tenant_id):
+        with controller.admit(tenant_id):
+            pass
+
+    def test_disabled(self):
+        controller = self._controller()
+        self.assertFalse(controller.enabled)
+        with controller.admit('t1'):
+            self.assertEqual({}, controller._tenants)
+
+    def test_concurrency_limit(self):
+        controller = self._controller(admission_concurrency=1)
+        with controller.admit('t1'):
+            controller._local.admitted = False
+            self.assertRaises(admission.TenantThrottled, self._admit,
+                              controller, 't1')
+            # Other tenants are not held back
+            self._admit(controller, 't2')
+            controller._local.admitted = True
+        self._admit(controller, 't1')
+
+    def test_nested_writes_admitted_once(self):
+        controller = self._controller(admission_concurrency=1)
+        with controller.admit('t1'):
+            self._admit(controller, 't1')
+            self.assertEqual(1, controller._tenants['t1'].active)
+        self.assertEqual(0, controller._tenants['t1'].active)
+
+    def test_rate_limit(self):
+        controller = self._controller(admission_rate=0.001,
+                                      admission_burst=2)
+        self._admit(controller, 't1')
+        self._admit(controller, 't1')
+        self.assertRaises(admission.TenantThrottled, self._admit,
+                          controller, 't1')
+
+    def test_queued_until_timeout(self):
+        controller = self._controller(admission_rate=0.001,
+                                      admission_burst=1,
+                                      admission_queue_timeout=0.01)
+        self._admit(controller, 't1')
+        self.assertRaises(admission.TenantThrottled, self._admit,
+                          controller, 't1')
+
+    def test_adapt_decreases_multiplicatively(self):
+        controller = self._controller(latency=1.0, admission_concurrency=8)
+        controller.adapt()
+        self.assertEqual(0.5, controller.factor)
+        self.assertEqual(4, controller._concurrency_limit())
+        for i in range(10):
+            controller.adapt()
+        self.assertEqual(0.1, controller.factor)
+        self.assertEqual(1, controller._concurrency_limit())
+
+    def test_adapt_increases_additively(self):
+        controller = self._controller(latency=0.1, admission_concurrency=8)
+        controller.factor = 0.5
+        controller.adapt()
+        self.assertAlmostEqual(0.6, controller.factor)
+        for i in range(10):
+            controller.adapt()
+        self.assertEqual(1.0, controller.factor)
+
+    def test_adapt_without_latency(self):
+        controller = self._controller(admission_concurrency=8)
+        controller.factor = 0.5
+        controller.adapt()
+        self.assertEqual(0.5, controller.factor)
+
+    def test_adapt_forgets_idle_tenants(self):
+        controller = self._controller(latency=0.1, admission_concurrency=8)
+        self._admit(controller, 't1')
+        self.assertIn('t1', controller._tenants)
+        controller.adapt()
+        self.assertNotIn('t1', controller._tenants)
@@ -0,0 +1,106 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import eventlet
+from webob import exc as w_exc
+
+from midonet.neutron.client import breaker
+from midonet.neutron.tests import base
+
+
+def _fail():
+    raise w_exc.HTTPServiceUnavailable()
+
+
+def _not_found():
+    raise w_exc.HTTPNotFound()
+
+
+class CircuitBreakerTestCase(base.MidonetTestCase):
+
+    def setUp(self):
+        super(CircuitBreakerTestCase, self).setUp()
+        self.breaker = breaker.CircuitBreaker(self.config(
+            breaker_failure_threshold=3, breaker_reset_timeout=30,
+            api_call_deadline=5, api_call_deadlines={'slow_call': '0.01'}))
+
+    def _fail(self, count):
+        for i in range(count):
+            self.assertRaises(w_exc.HTTPServiceUnavailable,
+                              self.breaker.call, 'create_port', _fail)
+
+    def _open(self):
+        self._fail(3)
+        self.assertEqual(breaker.OPEN, self.breaker.state)
+
+    def _expire(self):
+        self.breaker._opened_at -= 31
+
+    def test_success(self):
+        self.assertEqual(1, self.breaker.call('get_port', lambda x: x, 1))
+        self.assertEqual(breaker.CLOSED, self.breaker.state)
+
+    def test_opens_after_consecutive_failures(self):
+        self._fail(2)
+        self.assertEqual(breaker.CLOSED, self.breaker.state)
+        self._fail(1)
+        self.assertEqual(breaker.OPEN, self.breaker.state)
+        self.assertFalse(self.breaker.available())
+
+    def test_success_resets_failure_count(self):
+        self._fail(2)
+        self.breaker.call('get_port', lambda: None)
+        self._fail(2)
+        self.assertEqual(breaker.CLOSED, self.breaker.state)
+
+    def test_client_errors_not_failures(self):
+        for i in range(5):
+            self.assertRaises(w_exc.HTTPNotFound, self.breaker.call,
+                              'get_port', _not_found)
+        self.assertEqual(breaker.CLOSED, self.breaker.state)
+
+    def test_open_fails_fast(self):
+        self._open()
+        calls = []
+        self.assertRaises(breaker.MidonetUnavailable, self.breaker.call,
+                          'get_port', calls.append, 1)
+        self.assertEqual([], calls)
+
+    def test_half_open_lets_one_probe_through(self):
+        self._open()
+        self._expire()
+        self.assertTrue(self.breaker.available())
+
+        def probe():
+            self.assertEqual(breaker.HALF_OPEN, self.breaker.state)
+            self.assertFalse(self.breaker.available())
+            self.assertRaises(breaker.MidonetUnavailable,
+                              self.breaker.call, 'get_port', lambda: None)
+        self.breaker.call('get_port', probe)
+        self.assertEqual(breaker.CLOSED, self.breaker.state)
+
+    def test_failed_probe_reopens(self):
+        self._open()
+        self._expire()
+        self._fail(1)
+        self.assertEqual(breaker.OPEN, self.breaker.state)
+        self.assertFalse(self.breaker.available())
+
+    def test_deadline(self):
+        self.assertRaises(breaker.MidonetUnavailable, self.breaker.call,
+                          'slow_call', eventlet.sleep, 1)
+        self._fail(2)
+        self.assertEqual(breaker.OPEN, self.breaker.state)
@@ -0,0 +1,172 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+from midonet.neutron.common import cache
+from midonet.neutron.db import cache_db
+from midonet.neutron.tests import base
+
+
+class _Context(object):
+
+    def __init__(self, session, is_admin=True, tenant_id=None):
+        self.session = session
+        self.is_admin = is_admin
+        self.tenant_id = tenant_id
+
+
+class _Fetch(object):
+    """Fetch of the networks of a dict, counting its calls."""
+
+    def __init__(self, objs):
+        self.objs = objs
+        self.calls = 0
+
+    def __call__(self, id, fields):
+        self.calls += 1
+        return dict(self.objs[id])
+
+    def list(self, filters, fields):
+        self.calls += 1
+        return [dict(obj) for obj in self.objs.values()]
+
+
+class ResourceCacheTestCase(base.SqliteTestCase):
+
+    TABLES = (cache_db.MidonetCacheGeneration.__table__,)
+
+    def setUp(self):
+        super(ResourceCacheTestCase, self).setUp()
+        cache.create_tables(self.session)
+        self.context = _Context(self.session)
+        self.cache = cache.ResourceCache(100, 300)
+        # The cache of another Neutron server process
+        self.other = cache.ResourceCache(100, 300)
+        self.fetch = _Fetch({'net1': {'id': 'net1', 'tenant_id': 't1',
+                                      'name': 'one'},
+                             'net2': {'id': 'net2', 'tenant_id': 't2',
+                                      'name': 'two'}})
+
+    def _get(self, id, context=None, fields=None):
+        return self.cache.get(context or self.context, 'network', id,
+                              self.fetch, fields)
+
+    def _list(self, filters=None):
+        return self.cache.get_list(self.context, 'network', filters or {},
+                                   self.fetch.list)
+
+    def test_hit(self):
+        self.assertEqual('one', self._get('net1')['name'])
+        self.assertEqual('one', self._get('net1')['name'])
+        self.assertEqual(1, self.fetch.calls)
+        self.assertEqual(1, self.cache.hits)
+
+    def test_fields_picked_from_copy(self):
+        self._get('net1')['name'] = 'changed'
+        self.assertEqual({'name': 'one'}, self._get('net1', fields=['name']))
+
+    def test_write_in_other_process_seen_by_next_read(self):
+        self._get('net1')
+        self.fetch.objs['net1']['name'] = 'renamed'
+        self.other.invalidate(self.context, 'network', ['net1'])
+        self.assertEqual('renamed', self._get('net1')['name'])
+        self.assertEqual(2, self.fetch.calls)
+
+    def test_write_of_other_bucket_keeps_entry(self):
+        self._get('net1')
+        other_ids = [id for id in ('net%d' % i for i in range(100))
+                     if self.cache._bucket(id) != self.cache._bucket('net1')]
+        self.other.invalidate(self.context, 'network', other_ids[:1])
+        self._get('net1')
+        self.assertEqual(1, self.fetch.calls)
+
+    def test_imprecise_write_drops_all(self):
+        self._get('net1')
+        self._get('net2')
+        self.other.invalidate(self.context, 'network')
+        self._get('net1')
+        self._get('net2')
+        self.assertEqual(4, self.fetch.calls)
+
+    def test_lists_dropped_by_any_write(self):
+        self._list()
+        self._list()
+        self.assertEqual(1, self.fetch.calls)
+        self.other.invalidate(self.context, 'network', ['net2'])
+        self._list()
+        self.assertEqual(2, self.fetch.calls)
+
+    def test_keyed_write_drops_unfiltered_lists(self):
+        self._list()
+        self.other.invalidate(self.context, 'network', ['net2'], ['net2'])
+        self._list()
+        self.assertEqual(2, self.fetch.calls)
+
+    def test_keyed_write_keeps_lists_of_other_keys(self):
+        self._list({'id': ['net1']})
+        self.other.invalidate(self.context, 'network', ['net2'], ['net2'])
+        self._list({'id': ['net1']})
+        self.assertEqual(1, self.fetch.calls)
+        self.other.invalidate(self.context, 'network', ['net1'], ['net1'])
+        self._list({'id': ['net1']})
+        self.assertEqual(2, self.fetch.calls)
+
+    def test_read_racing_with_write_not_served(self):
+        def fetch(id, fields):
+            obj = self.fetch(id, fields)
+            self.other.invalidate(self.context, 'network', [id])
+            return obj
+        self.cache.get(self.context, 'network', 'net1', fetch)
+        self._get('net1')
+        self.assertEqual(2, self.fetch.calls)
+
+    def test_transaction_bypasses_cache(self):
+        self._get('net1')
+        with self.session.begin():
+            self._get('net1')
+        self.assertEqual(2, self.fetch.calls)
+
+    def test_other_tenant_fetched(self):
+        self._get('net1')
+        self._get('net1', _Context(self.session, False, 't2'))
+        self._get('net1', _Context(self.session, False, 't1'))
+        self.assertEqual(2, self.fetch.calls)
+
+
+class DefaultSecurityGroupCacheTestCase(base.SqliteTestCase):
+
+    TABLES = (cache_db.MidonetCacheGeneration.__table__,)
+
+    def setUp(self):
+        super(DefaultSecurityGroupCacheTestCase, self).setUp()
+        cache.create_tables(self.session)
+        self.context = _Context(self.session)
+
+    def test_invalidated_by_other_process(self):
+        groups = cache.DefaultSecurityGroupCache(interval=0)
+        other = cache.DefaultSecurityGroupCache(interval=0)
+        self.assertIsNone(groups.get(self.context, 't1'))
+        groups.set('t1', 'sg1')
+        self.assertEqual('sg1', groups.get(self.context, 't1'))
+        other.invalidate(self.context, 't1')
+        self.assertIsNone(groups.get(self.context, 't1'))
+
+    def test_checked_once_per_interval(self):
+        groups = cache.DefaultSecurityGroupCache(interval=3600)
+        other = cache.DefaultSecurityGroupCache(interval=3600)
+        groups.get(self.context, 't1')
+        groups.set('t1', 'sg1')
+        other.invalidate(self.context, 't1')
+        self.assertEqual('sg1', groups.get(self.context, 't1'))
@@ -0,0 +1,101 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron.common import exceptions as n_exc
+from neutron.tests import base
+
+from midonet.neutron.client import endpoints
+
+URIS = ['http://api1:8080/midonet-api',
+        'http://api2:8080/midonet-api',
+        'http://api3:8080/midonet-api']
+
+
+class EndpointSelectorTestCase(base.BaseTestCase):
+
+    def _selector(self, strategy=endpoints.ROUND_ROBIN, uris=URIS):
+        return endpoints.EndpointSelector(uris, strategy, 30)
+
+    def test_unknown_strategy(self):
+        self.assertRaises(n_exc.InvalidConfigurationOption,
+                          endpoints.EndpointSelector, URIS, 'random', 30)
+
+    def test_round_robin(self):
+        selector = self._selector()
+        selected = [selector.select().uri for i in range(6)]
+        self.assertEqual(URIS + URIS, selected)
+
+    def test_least_outstanding(self):
+        selector = self._selector(endpoints.LEAST_OUTSTANDING)
+        ep1, ep2, ep3 = selector.endpoints
+        ep1.outstanding = 2
+        ep2.outstanding = 1
+        ep3.outstanding = 1
+        ep2.record(0.5)
+        ep3.record(0.1)
+        self.assertIs(ep3, selector.select())
+
+    def test_ejected_endpoint_skipped(self):
+        selector = self._selector()
+        ep1, ep2, ep3 = selector.endpoints
+        selector.eject(ep2)
+        selected = set(selector.select() for i in range(6))
+        self.assertEqual(set([ep1, ep3]), selected)
+        self.assertTrue(ep2.get_stats()['ejected'])
+
+    def test_ejected_endpoint_back_after_eject_time(self):
+        selector = self._selector()
+        ep1, ep2, ep3 = selector.endpoints
+        selector.eject(ep2)
+        ep2.ejected_until -= 31
+        selected = set(selector.select() for i in range(6))
+        self.assertEqual(set([ep1, ep2, ep3]), selected)
+
+    def test_all_ejected_uses_first_back(self):
+        selector = self._selector()
+        ep1, ep2, ep3 = selector.endpoints
+        for ep in (ep1, ep2, ep3):
+            selector.eject(ep)
+        ep2.ejected_until -= 10
+        self.assertIs(ep2, selector.select())
+
+    def test_exclude(self):
+        selector = self._selector()
+        ep1, ep2, ep3 = selector.endpoints
+        selector.eject(ep1)
+        self.assertIs(ep1, selector.select(exclude=(ep2, ep3)))
+        self.assertIsNone(selector.select(exclude=(ep1, ep2, ep3)))
+
+    def test_rewrite(self):
+        selector = self._selector()
+        ep3 = selector.endpoints[2]
+        self.assertEqual('http://api3:8080/midonet-api/bridges/1',
+                         selector.rewrite(
+                             'http://api1:8080/midonet-api/bridges/1', ep3))
+        self.assertEqual('http://other/bridges/1',
+                         selector.rewrite('http://other/bridges/1', ep3))
+
+    def test_latency_of_available_endpoints(self):
+        selector = self._selector()
+        ep1, ep2, ep3 = selector.endpoints
+        self.assertIsNone(selector.latency())
+        ep1.record(0.2)
+        ep2.record(0.4)
+        ep3.record(3.0, ok=False)
+        selector.eject(ep3)
+        self.assertAlmostEqual(0.3, selector.latency())
+        self.assertEqual(1, ep3.errors)
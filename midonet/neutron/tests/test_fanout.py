@@ -0,0 +1,65 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+import eventlet
+
+from neutron.tests import base
+
+from midonet.neutron.common import fanout
+
+
+def _call(item):
+    # Later items end first
+    eventlet.sleep(0.001 * (5 - item))
+    if item % 2:
+        raise ValueError('item %d' % item)
+    return item * 10
+
+
+class ExecutorTestCase(base.BaseTestCase):
+
+    def test_results_in_item_order(self):
+        executor = fanout.Executor(4)
+        self.assertEqual([0, 10, 20], executor.map(lambda i: i * 10,
+                                                   range(3)))
+
+    def test_sequential(self):
+        order = []
+        fanout.Executor(1).map(order.append, range(3))
+        self.assertEqual([0, 1, 2], order)
+
+    def test_empty(self):
+        self.assertEqual([], fanout.Executor(4).map(_call, []))
+
+    def test_calls_run_concurrently(self):
+        ended = []
+
+        def call(item):
+            eventlet.sleep(0.001 * (5 - item))
+            ended.append(item)
+        fanout.Executor(4).map(call, range(4))
+        self.assertEqual([3, 2, 1, 0], ended)
+
+    def test_errors_aggregated(self):
+        for size in (1, 4):
+            ex = self.assertRaises(fanout.FanoutError,
+                                   fanout.Executor(size).map, _call,
+                                   range(5))
+            self.assertEqual([0, None, 20, None, 40], ex.results)
+            self.assertEqual([1, 3], [index for index, e in ex.errors])
+            self.assertEqual(['item 1', 'item 3'],
+                             [str(e) for index, e in ex.errors])
+            self.assertIn('2 of 5', str(ex))
@@ -0,0 +1,124 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.tests import base as n_base
+
+from midonet.neutron.db import journal_db
+from midonet.neutron import journal
+from midonet.neutron.tests import base
+
+
+class _Entry(object):
+
+    def __init__(self, id, object_id, parent_id=None):
+        self.id = id
+        self.object_id = object_id
+        self.parent_id = parent_id
+
+
+def _ids(groups):
+    return [[entry.id for entry in group] for group in groups]
+
+
+class GroupEntriesTestCase(n_base.BaseTestCase):
+
+    def test_unrelated_objects_in_separate_groups(self):
+        entries = [_Entry(1, 'net1'), _Entry(2, 'net2'), _Entry(3, 'net1')]
+        self.assertEqual([[2], [1, 3]], _ids(journal.group_entries(entries)))
+
+    def test_children_with_their_parent(self):
+        entries = [_Entry(1, 'net'),
+                   _Entry(2, 'subnet', 'net'),
+                   _Entry(3, 'port', 'net'),
+                   _Entry(4, 'router'),
+                   _Entry(5, 'router', 'port')]
+        self.assertEqual([[1, 2, 3, 4, 5]],
+                         _ids(journal.group_entries(entries)))
+
+    def test_siblings_without_their_parent_in_separate_groups(self):
+        entries = [_Entry(1, 'port1', 'net'), _Entry(2, 'port2', 'net')]
+        self.assertEqual([[1], [2]], _ids(journal.group_entries(entries)))
+
+    def test_parent_after_its_children(self):
+        entries = [_Entry(1, 'port1', 'net'),
+                   _Entry(2, 'port2', 'net'),
+                   _Entry(3, 'net')]
+        self.assertEqual([[1, 2, 3]], _ids(journal.group_entries(entries)))
+
+
+
+class JournalSyncWorkerTestCase(base.SqliteTestCase):
+    """Two workers standing for the journal workers of two processes."""
+
+    TABLES = (journal_db.MidonetJournal.__table__,)
+
+    def setUp(self):
+        super(JournalSyncWorkerTestCase, self).setUp()
+        mock.patch.object(journal.db, 'get_session',
+                          return_value=self.session).start()
+        self.calls = []
+        conf = self.config()
+        self.worker1 = journal.JournalSyncWorker(
+            lambda op, *args: self._invoke(1, op, *args), conf)
+        self.worker2 = journal.JournalSyncWorker(
+            lambda op, *args: self._invoke(2, op, *args), conf)
+        self.during_call = None
+
+    def _invoke(self, worker, operation, *args):
+        self.calls.append((worker, operation))
+        if self.during_call is not None:
+            during_call, self.during_call = self.during_call, None
+            during_call()
+
+    def _delete_port(self):
+        # What delete_port does in a process other than the one that
+        # journaled the update; return whether the call was journaled
+        with self.session.begin(subtransactions=True):
+            journal_db.discard_entries(self.session, 'port', 'update_port')
+            if not journal_db.has_unfinished_entries(self.session,
+                                                     ['port', 'net']):
+                return False
+            journal_db.add_entry(self.session, 'delete_port', 'port',
+                                 ('port',), parent_id='net')
+        return True
+
+    def test_delete_waits_for_update_replayed_elsewhere(self):
+        journal_db.merge_entry(self.session, 'update_port', 'port',
+                               ('port', {}), parent_id='net')
+
+        def delete_and_sync():
+            self.assertTrue(self._delete_port())
+            self.worker2.sync()
+        self.during_call = delete_and_sync
+        self.worker1.sync()
+        self.assertEqual([(1, 'update_port')], self.calls)
+
+        self.worker2.sync()
+        self.assertEqual([(1, 'update_port'), (2, 'delete_port')],
+                         self.calls)
+        self.assertFalse(journal_db.has_unfinished_entries(self.session,
+                                                           ['port']))
+
+    def test_pending_update_discarded_by_delete(self):
+        journal_db.merge_entry(self.session, 'update_port', 'port',
+                               ('port', {}), parent_id='net', delay=60)
+        self.assertFalse(self._delete_port())
+        self.worker1.sync()
+        self.worker2.sync()
+        self.assertEqual([], self.calls)
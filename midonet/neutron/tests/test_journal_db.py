@@ -0,0 +1,192 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from midonet.neutron.db import journal_db
+from midonet.neutron.tests import base
+
+
+class JournalDbTestCase(base.SqliteTestCase):
+
+    TABLES = (journal_db.MidonetJournal.__table__,)
+
+    def _add(self, operation, object_id, parent_id=None):
+        return journal_db.add_entry(self.session, operation, object_id,
+                                    (object_id,), parent_id=parent_id).id
+
+    def _pending_ids(self):
+        return [entry.id for entry in
+                journal_db.get_pending_entries(self.session, 100)]
+
+    def _fail(self, entry_id):
+        self.assertTrue(journal_db.claim_entry(self.session, entry_id))
+        journal_db.fail_entry(self.session, entry_id, 'boom', 1)
+
+    def test_pending_entries_in_order(self):
+        first = self._add('create_network', 'net')
+        second = self._add('create_router', 'router')
+        self.assertEqual([first, second], self._pending_ids())
+
+    def test_processing_entry_holds_back_its_object(self):
+        create = self._add('create_network', 'net')
+        self._add('update_network', 'net')
+        other = self._add('create_router', 'router')
+        self.assertTrue(journal_db.claim_entry(self.session, create))
+        self.assertEqual([other], self._pending_ids())
+
+    def test_claim_entry_once(self):
+        entry_id = self._add('create_network', 'net')
+        self.assertTrue(journal_db.claim_entry(self.session, entry_id))
+        self.assertFalse(journal_db.claim_entry(self.session, entry_id))
+
+    def test_failed_entry_is_retried_until_max_retries(self):
+        entry_id = self._add('create_network', 'net')
+        self.assertTrue(journal_db.claim_entry(self.session, entry_id))
+        journal_db.fail_entry(self.session, entry_id, 'boom', 2)
+        self.assertEqual([entry_id], self._pending_ids())
+
+        self._fail(entry_id)
+        self.assertEqual([], self._pending_ids())
+
+    def test_failed_entry_holds_back_its_object(self):
+        create = self._add('create_network', 'net')
+        self._add('delete_network', 'net')
+        other = self._add('create_router', 'router')
+        self._fail(create)
+        self.assertEqual([other], self._pending_ids())
+        self.assertTrue(journal_db.has_unfinished_entries(self.session,
+                                                          ['net']))
+        self.assertIn('net',
+                      journal_db.get_unfinished_object_ids(self.session))
+
+    def test_retry_entry_unblocks_its_object(self):
+        create = self._add('create_network', 'net')
+        delete = self._add('delete_network', 'net')
+        self._fail(create)
+        self.assertTrue(journal_db.retry_entry(self.session, create))
+        self.assertEqual([create, delete], self._pending_ids())
+        self.assertFalse(journal_db.retry_entry(self.session, create))
+
+    def test_skip_entry_unblocks_its_object(self):
+        create = self._add('create_network', 'net')
+        delete = self._add('delete_network', 'net')
+        self._fail(create)
+        self.assertTrue(journal_db.skip_entry(self.session, create))
+        self.assertEqual([delete], self._pending_ids())
+
+    def test_status_reports_failed_entries(self):
+        create = self._add('create_network', 'net')
+        self._add('update_network', 'net')
+        self._add('delete_network', 'net')
+        self._fail(create)
+
+        status = journal_db.get_status(self.session)
+        self.assertEqual({journal_db.PENDING: 2,
+                          journal_db.PROCESSING: 0,
+                          journal_db.FAILED: 1}, status['entries'])
+        self.assertEqual(1, len(status['failed']))
+        failed = status['failed'][0]
+        self.assertEqual(create, failed['id'])
+        self.assertEqual('net', failed['object_id'])
+        self.assertEqual('boom', failed['last_error'])
+        self.assertEqual(2, failed['blocked_entries'])
+
+    def test_complete_entry(self):
+        entry_id = self._add('create_network', 'net')
+        self.assertTrue(journal_db.claim_entry(self.session, entry_id))
+        journal_db.complete_entry(self.session, entry_id)
+        self.assertEqual([], self._pending_ids())
+        self.assertFalse(journal_db.has_unfinished_entries(self.session,
+                                                           ['net']))
+
+    def test_failed_parent_holds_back_its_children(self):
+        network = self._add('create_network', 'net')
+        self._add('create_port', 'port', parent_id='net')
+        other = self._add('create_router', 'router')
+        self._fail(network)
+        self.assertEqual([other], self._pending_ids())
+        self.assertTrue(journal_db.has_unfinished_entries(self.session,
+                                                          ['port']))
+
+    def test_failed_child_holds_back_its_parent_only(self):
+        port = self._add('create_port', 'port1', parent_id='net')
+        sibling = self._add('create_port', 'port2', parent_id='net')
+        self._add('delete_network', 'net')
+        self._fail(port)
+        self.assertEqual([sibling], self._pending_ids())
+        self.assertTrue(journal_db.has_unfinished_entries(self.session,
+                                                          ['net']))
+
+    def test_entries_behind_held_back_entries_are_held_back(self):
+        network = self._add('create_network', 'net')
+        self._add('create_port', 'port', parent_id='net')
+        self._add('add_router_interface', 'router', parent_id='port')
+        self._add('update_router', 'router')
+        self._fail(network)
+        self.assertEqual([], self._pending_ids())
+
+    def _merge(self, name, delay=0):
+        return journal_db.merge_entry(self.session, 'update_port', 'port',
+                                      ('port', {'name': name}),
+                                      parent_id='net', delay=delay).id
+
+    def _args(self, entry_id):
+        return journal_db.load_args(self.session, entry_id)
+
+    def test_merge_into_pending_entry(self):
+        first = self._merge('one')
+        self.assertEqual(first, self._merge('two'))
+        self.assertEqual(['port', {'name': 'two'}], self._args(first))
+        self.assertEqual([first], self._pending_ids())
+
+    def test_merge_keeps_place_in_journal(self):
+        update = self._merge('one')
+        other = self._add('create_router', 'router')
+        self._merge('two')
+        self.assertEqual([update, other], self._pending_ids())
+
+    def test_no_merge_into_claimed_entry(self):
+        first = self._merge('one')
+        self.assertTrue(journal_db.claim_entry(self.session, first))
+        second = self._merge('two')
+        self.assertNotEqual(first, second)
+        self.assertEqual(['port', {'name': 'one'}], self._args(first))
+
+    def test_no_merge_across_other_calls(self):
+        first = self._merge('one')
+        self._add('add_router_interface', 'router', parent_id='port')
+        self.assertNotEqual(first, self._merge('two'))
+
+    def test_merged_entry_held_back_until_ready(self):
+        update = self._merge('one', delay=3600)
+        self._add('delete_port', 'port', parent_id='net')
+        other = self._add('create_router', 'router')
+        self.assertEqual([other], self._pending_ids())
+        self.assertTrue(journal_db.has_unfinished_entries(self.session,
+                                                          ['port']))
+        self.session.query(journal_db.MidonetJournal).filter_by(
+            id=update).update({'ready_at': None})
+        self.assertEqual(3, len(self._pending_ids()))
+
+    def test_discard_entries(self):
+        claimed = self._merge('one')
+        self.assertTrue(journal_db.claim_entry(self.session, claimed))
+        self._merge('two')
+        self.assertEqual(1, journal_db.discard_entries(
+            self.session, 'port', 'update_port'))
+        self.assertEqual(set(['port', 'net']),
+                         journal_db.get_unfinished_object_ids(
+                             self.session, parents=True))
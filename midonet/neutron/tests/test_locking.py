@@ -0,0 +1,150 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+
+import mock
+
+from neutron.common import exceptions as n_exc
+
+from midonet.neutron.common import locking
+from midonet.neutron.tests import base
+
+
+class _FakeBackend(object):
+
+    def __init__(self, conf):
+        self.calls = []
+
+    @contextlib.contextmanager
+    def lock(self, names):
+        self.calls.append(list(names))
+        yield
+
+
+class LockManagerTestCase(base.MidonetTestCase):
+
+    def _config(self, lock_backend='fake'):
+        return self.config(lock_backend=lock_backend, lock_stripes=4,
+                           lock_poll_interval=0, lock_profiling=False,
+                           latency_samples=100)
+
+    def setUp(self):
+        super(LockManagerTestCase, self).setUp()
+        mock.patch.dict(locking._BACKENDS, {'fake': _FakeBackend}).start()
+        self.locks = locking.LockManager(self._config())
+        self.backend = self.locks._backend
+
+    def test_unknown_backend(self):
+        self.assertRaises(n_exc.InvalidConfigurationOption,
+                          locking.LockManager,
+                          self._config(lock_backend='nope'))
+
+    def test_keys_hashed_into_stripes(self):
+        keys = ['network-%d' % i for i in range(32)]
+        with self.locks.lock(keys):
+            pass
+        names = self.backend.calls[0]
+        self.assertTrue(len(names) <= 4)
+        for name in names:
+            self.assertTrue(name.startswith(locking.LOCK_PREFIX))
+
+    def test_stripes_taken_once_in_order_in_one_call(self):
+        keys = ['network-%d' % i for i in range(32)]
+        with self.locks.lock(keys):
+            pass
+        with self.locks.lock(reversed(keys)):
+            pass
+        self.assertEqual(2, len(self.backend.calls))
+        names = self.backend.calls[0]
+        self.assertEqual(sorted(set(names)), names)
+        self.assertEqual(names, self.backend.calls[1])
+
+    def test_same_key_same_stripe(self):
+        with self.locks.network('net1', owner='create_port'):
+            pass
+        with self.locks.networks(['net1'], owner='create_port_bulk'):
+            pass
+        self.assertEqual(self.backend.calls[0], self.backend.calls[1])
+
+    def test_network_and_port(self):
+        with self.locks.network('net1', 'port1'):
+            pass
+        expected = sorted(set(
+            '%s%d' % (locking.LOCK_PREFIX, self.locks._stripe(key))
+            for key in ('network-net1', 'port-port1')))
+        self.assertEqual([expected], self.backend.calls)
+
+
+class DbLockBackendTestCase(base.MidonetTestCase):
+
+    def setUp(self):
+        super(DbLockBackendTestCase, self).setUp()
+        self.conn = mock.Mock()
+        self.conn.dialect.name = 'postgresql'
+        get_session = mock.patch.object(locking.db, 'get_session').start()
+        self.connect = get_session.return_value.get_bind.return_value.connect
+        self.connect.return_value = self.conn
+        self.backend = locking.DbLockBackend(self.config(lock_stripes=4))
+        self.acquired = []
+        self.released = []
+        self.backend._try_acquire = (
+            lambda conn, name: self.acquired.append(name) or True)
+        self.backend._release = (
+            lambda conn, name: self.released.append(name))
+
+    def test_all_names_on_one_connection(self):
+        with self.backend.lock(['midonet-1', 'midonet-2', 'midonet-3']):
+            self.assertEqual(1, self.connect.call_count)
+            self.assertEqual([], self.released)
+        self.assertEqual(['midonet-1', 'midonet-2', 'midonet-3'],
+                         self.acquired)
+        self.assertEqual(['midonet-3', 'midonet-2', 'midonet-1'],
+                         self.released)
+        self.conn.close.assert_called_once_with()
+
+    def test_released_on_error(self):
+        def fail():
+            with self.backend.lock(['midonet-1', 'midonet-2']):
+                raise ValueError()
+        self.assertRaises(ValueError, fail)
+        self.assertEqual(['midonet-2', 'midonet-1'], self.released)
+        self.conn.close.assert_called_once_with()
+
+    def test_old_mysql_refused(self):
+        self.conn.dialect.name = 'mysql'
+        self.conn.dialect.server_version_info = (5, 6, 20)
+
+        def take():
+            with self.backend.lock(['midonet-1']):
+                pass
+        self.assertRaises(n_exc.InvalidConfigurationOption, take)
+        self.assertEqual([], self.acquired)
+        self.conn.close.assert_called_once_with()
+
+    def test_try_lock(self):
+        with self.backend.try_lock('midonet-reconcile') as locked:
+            self.assertTrue(locked)
+        self.assertEqual(['midonet-reconcile'], self.released)
+        self.conn.close.assert_called_once_with()
+
+    def test_try_lock_busy(self):
+        self.backend._try_acquire = lambda conn, name: False
+        with self.backend.try_lock('midonet-reconcile') as locked:
+            self.assertFalse(locked)
+        self.assertEqual([], self.released)
+        self.conn.close.assert_called_once_with()
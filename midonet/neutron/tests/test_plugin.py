@@ -0,0 +1,74 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.db.loadbalancer import loadbalancer_db
+from neutron.tests import base
+
+from midonet.neutron import plugin
+
+
+class LoadBalancerListTestCase(base.BaseTestCase):
+    """The arguments the API passes with allow_pagination and allow_sorting
+    reach the DB query.
+    """
+
+    def setUp(self):
+        super(LoadBalancerListTestCase, self).setUp()
+        self.plugin = plugin.MidonetPluginV2.__new__(plugin.MidonetPluginV2)
+        self.get_collection = mock.patch.object(
+            self.plugin, '_get_collection').start()
+        self.get_resource = mock.patch.object(
+            self.plugin, '_get_resource').start()
+        self.context = mock.Mock()
+
+    def test_vips_paginated(self):
+        sorts = [('name', True), ('id', True)]
+        vips = self.plugin.get_vips(self.context,
+                                    filters={'tenant_id': ['tenant1']},
+                                    fields=None, sorts=sorts, limit=2,
+                                    marker='vip1', page_reverse=False)
+        self.assertIs(self.get_collection.return_value, vips)
+        self.get_resource.assert_called_once_with(
+            self.context, loadbalancer_db.Vip, 'vip1')
+        self.get_collection.assert_called_once_with(
+            self.context, loadbalancer_db.Vip, self.plugin._make_vip_dict,
+            filters={'tenant_id': ['tenant1']}, fields=None, sorts=sorts,
+            limit=2, marker_obj=self.get_resource.return_value,
+            page_reverse=False)
+
+    def test_first_page_needs_no_marker(self):
+        self.plugin.get_vips(self.context, sorts=[('id', False)], limit=2,
+                             page_reverse=True)
+        self.assertFalse(self.get_resource.called)
+        self.assertIsNone(
+            self.get_collection.call_args[1]['marker_obj'])
+
+    def test_all_resources_paginated(self):
+        for resource, model in (('pools', loadbalancer_db.Pool),
+                                ('members', loadbalancer_db.Member),
+                                ('health_monitors',
+                                 loadbalancer_db.HealthMonitor)):
+            self.get_collection.reset_mock()
+            getattr(self.plugin, 'get_' + resource)(
+                self.context, sorts=[('id', True)], limit=1,
+                marker='marker', page_reverse=False)
+            args, kwargs = self.get_collection.call_args
+            self.assertIs(model, args[1])
+            self.assertEqual(1, kwargs['limit'])
+            self.assertEqual([('id', True)], kwargs['sorts'])
@@ -0,0 +1,177 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+import copy
+
+from webob import exc as w_exc
+
+from midonet.neutron import reconcile
+from midonet.neutron.tests import base
+
+
+class _FakeLocks(object):
+
+    def __init__(self):
+        self.free = True
+
+    @contextlib.contextmanager
+    def try_lock(self, name):
+        yield self.free
+
+
+class _FakePlugin(object):
+    """Neutron getters and MidoNet calls over two dicts of resources."""
+
+    journal = None
+
+    def __init__(self):
+        self.neutron = dict((res_type.name, {})
+                            for res_type in reconcile.RESOURCE_TYPES)
+        self.midonet = dict((res_type.mido_name, {})
+                            for res_type in reconcile.RESOURCE_TYPES)
+        self.calls = []
+        self.locks = _FakeLocks()
+
+    def __getattr__(self, name):
+        resource = name[len('get_'):]
+        if resource in self.neutron:
+            return lambda context, id: self.neutron[resource][id]
+        resource = resource[:-1]
+        if resource in self.neutron:
+            return lambda context: self.neutron[resource].values()
+        raise AttributeError(name)
+
+    def _invoke_api(self, operation, *args):
+        self.calls.append(operation)
+        action, resource = operation.split('_', 1)
+        objs = self.midonet.get(resource)
+        if action == 'get' and objs is None:
+            return self.midonet[resource[:-1]].values()
+        if action == 'get':
+            if args[0] not in objs:
+                raise w_exc.HTTPNotFound()
+            return objs[args[0]]
+        if action == 'create':
+            objs[args[0]['id']] = copy.deepcopy(args[0])
+        elif action == 'update':
+            objs[args[0]] = copy.deepcopy(args[1])
+        elif action == 'delete':
+            del objs[args[0]]
+
+
+def _network(id, tenant_id='tenant1', admin_state_up=True):
+    return {'id': id, 'tenant_id': tenant_id,
+            'admin_state_up': admin_state_up, 'shared': False,
+            'router:external': False}
+
+
+class ReconcilerTestCase(base.MidonetTestCase):
+
+    def setUp(self):
+        super(ReconcilerTestCase, self).setUp()
+        self.plugin = _FakePlugin()
+        self.reconciler = reconcile.Reconciler(self.plugin, self.config(
+            reconcile_interval=60, reconcile_rate=1000,
+            reconcile_full_every=3, reconcile_delete_orphans=False,
+            fanout_workers=1))
+
+    def _add(self, network, neutron=True, midonet=True):
+        if neutron:
+            self.plugin.neutron['network'][network['id']] = network
+        if midonet:
+            self.plugin.midonet['network'][network['id']] = dict(network)
+
+    def _reconcile(self):
+        self.plugin.calls = []
+        self.reconciler.reconcile()
+        return self.plugin.calls
+
+    def test_full_pass_lists_each_type_once(self):
+        self._add(_network('net1'))
+        calls = self._reconcile()
+        self.assertEqual(sorted('get_%ss' % res_type.mido_name
+                                for res_type in reconcile.RESOURCE_TYPES),
+                         sorted(calls))
+
+    def test_pass_skipped_while_locked_elsewhere(self):
+        self.plugin.locks.free = False
+        self.assertEqual([], self._reconcile())
+
+    def test_unchanged_buckets_not_fetched(self):
+        self._add(_network('net1'))
+        self._reconcile()
+        self.assertEqual([], self._reconcile())
+
+    def test_changed_bucket_fetched_by_id(self):
+        self._add(_network('net1'))
+        self._add(_network('net2', 'tenant2'))
+        self._reconcile()
+        self.plugin.neutron['network']['net1']['admin_state_up'] = False
+        self.assertEqual(['get_network'], self._reconcile())
+
+    def test_missing_repaired_on_second_pass(self):
+        self._reconcile()
+        self._add(_network('net1'), midonet=False)
+        self.assertEqual(['get_network'], self._reconcile())
+        self.assertEqual(['get_network', 'create_network'],
+                         self._reconcile())
+        self.assertIn('net1', self.plugin.midonet['network'])
+
+    def test_mismatch_repaired(self):
+        self._add(_network('net1'))
+        self.plugin.midonet['network']['net1']['admin_state_up'] = False
+        self._reconcile()
+        self.assertIn('update_network', self._reconcile())
+        self.assertTrue(
+            self.plugin.midonet['network']['net1']['admin_state_up'])
+
+    def test_unrelated_fields_ignored(self):
+        self._add(_network('net1'))
+        self.plugin.midonet['network']['net1']['name'] = 'other'
+        self._reconcile()
+        self.assertEqual([], self._reconcile())
+
+    def test_orphan_not_deleted_by_default(self):
+        self._add(_network('net1'), neutron=False)
+        self._reconcile()
+        self._reconcile()
+        self.assertIn('net1', self.plugin.midonet['network'])
+
+    def test_orphan_seen_on_full_pass(self):
+        self._reconcile()
+        self._add(_network('net1'), neutron=False)
+        self.assertEqual([], self._reconcile())
+        self.assertEqual([], self._reconcile())
+        self.assertIn('get_networks', self._reconcile())
+        self.assertIn(('network', 'net1', reconcile.ORPHAN),
+                      self.reconciler._suspects)
+
+    def test_security_group_rule_mismatch_not_updated(self):
+        rule = {'id': 'rule1', 'security_group_id': 'sg1',
+                'direction': 'ingress', 'ethertype': 'IPv4',
+                'protocol': 'tcp', 'port_range_min': 22,
+                'port_range_max': 22, 'remote_ip_prefix': None,
+                'remote_group_id': None}
+        self.plugin.neutron['security_group_rule']['rule1'] = rule
+        self.plugin.midonet['security_group_rule']['rule1'] = dict(
+            rule, port_range_max=23)
+        self._reconcile()
+        calls = self._reconcile()
+        self.assertNotIn('update_security_group_rule', calls)
+        self.assertIn(('security_group_rule', 'rule1', reconcile.MISMATCH),
+                      self.reconciler._suspects)
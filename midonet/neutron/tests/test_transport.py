@@ -0,0 +1,84 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+import socket
+
+import eventlet
+import mock
+
+from neutron.tests import base
+
+from midonet.neutron.client import endpoints
+from midonet.neutron.client import transport
+
+URIS = ['http://api1:8080/midonet-api',
+        'http://api2:8080/midonet-api']
+
+
+class _FakePool(object):
+
+    def __init__(self, request):
+        self.conn = mock.Mock()
+        self.conn.http.request.side_effect = request
+
+    @contextlib.contextmanager
+    def item(self):
+        yield self.conn
+
+
+class PooledHttpTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(PooledHttpTestCase, self).setUp()
+        self.selector = endpoints.EndpointSelector(
+            URIS, endpoints.ROUND_ROBIN, 30)
+        self.uris = []
+
+    def _http(self, *results):
+        results = list(results)
+
+        def request(uri, method, **kwargs):
+            self.uris.append(uri)
+            result = results.pop(0)
+            if isinstance(result, BaseException):
+                raise result
+            return result, ''
+        self.pool = _FakePool(request)
+        return transport.PooledHttp(self.pool, self.selector)
+
+    def test_socket_timeout_retried_on_next_server(self):
+        http = self._http(socket.timeout(), mock.Mock(status=200))
+        response, content = http.request(URIS[0] + '/bridges')
+        self.assertEqual(200, response.status)
+        self.assertEqual([URIS[0] + '/bridges', URIS[1] + '/bridges'],
+                         self.uris)
+        ep1, ep2 = self.selector.endpoints
+        self.assertTrue(ep1.get_stats()['ejected'])
+        self.assertFalse(ep2.get_stats()['ejected'])
+
+    def test_server_ejected_when_deadline_expires(self):
+        timeout = eventlet.Timeout(None)
+        http = self._http(timeout)
+        try:
+            http.request(URIS[0] + '/bridges')
+            self.fail('Timeout not raised')
+        except eventlet.Timeout as t:
+            self.assertIs(timeout, t)
+        self.assertEqual(1, len(self.uris))
+        self.assertTrue(self.selector.endpoints[0].get_stats()['ejected'])
+        self.pool.conn.close.assert_called_once_with()
@@ -0,0 +1,423 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Throughput benchmark of MidonetPluginV2.
+
+The plugin is driven in process against a SQLite file or a local MySQL
+database, with a fake MidoNet API served on a localhost port answering its
+MidoNet requests, through a few workloads modelled on real deployments.
+The ops/sec and latency percentiles of each workload are printed as JSON so
+that runs of different versions can be compared:
+
+    python tools/benchmark.py --ops 500 --concurrency 1 --latency 0.01
+    python tools/benchmark.py --connection mysql://root:pw@localhost/bench \\
+        --concurrency 16 --error-rate 0.01 port_boot_storm
+
+SQLite serializes all writers and blocks the whole process while it waits,
+so only a concurrency of 1 gives meaningful numbers with it.
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from oslo.config import cfg
+
+from neutron.api.v2 import attributes
+from neutron.common import config as n_config  # noqa
+from neutron import context as n_context
+from neutron.extensions import external_net
+from neutron.extensions import routedserviceinsertion as rsi
+from neutron.openstack.common import jsonutils
+
+from midonet.neutron.common import timing
+from midonet.neutron import plugin as mido_plugin
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_midonet  # noqa
+
+NOT_SPECIFIED = attributes.ATTR_NOT_SPECIFIED
+
+
+def _network(tenant_id, name, external=False):
+    return {'network': {'name': name,
+                        'tenant_id': tenant_id,
+                        'admin_state_up': True,
+                        'shared': False,
+                        external_net.EXTERNAL: external}}
+
+
+def _subnet(tenant_id, network_id, cidr):
+    return {'subnet': {'name': 'bench',
+                       'tenant_id': tenant_id,
+                       'network_id': network_id,
+                       'ip_version': 4,
+                       'cidr': cidr,
+                       'enable_dhcp': True,
+                       'gateway_ip': NOT_SPECIFIED,
+                       'allocation_pools': NOT_SPECIFIED,
+                       'dns_nameservers': NOT_SPECIFIED,
+                       'host_routes': NOT_SPECIFIED}}
+
+
+def _port(tenant_id, network_id, device_owner='compute:nova'):
+    return {'port': {'name': 'bench',
+                     'tenant_id': tenant_id,
+                     'network_id': network_id,
+                     'admin_state_up': True,
+                     'device_id': str(uuid.uuid4()),
+                     'device_owner': device_owner,
+                     'mac_address': NOT_SPECIFIED,
+                     'fixed_ips': NOT_SPECIFIED}}
+
+
+def _router(tenant_id, ext_net_id):
+    return {'router': {'name': 'bench',
+                       'tenant_id': tenant_id,
+                       'admin_state_up': True,
+                       'external_gateway_info': {'network_id': ext_net_id}}}
+
+
+class Workload(object):
+    """A benchmark workload.
+
+    setup() creates what the operations need, without error injection, and
+    run(i) performs the i-th timed operation.
+    """
+
+    name = None
+
+    def __init__(self, plugin, options):
+        self.plugin = plugin
+        self.options = options
+        self.admin = n_context.get_admin_context()
+        self.tenant_id = 'bench-%s' % uuid.uuid4().hex[:8]
+        self.context = n_context.Context('bench', self.tenant_id)
+
+    def setup(self):
+        pass
+
+    def run(self, i):
+        raise NotImplementedError()
+
+    def _external_network(self):
+        net = self.plugin.create_network(
+            self.admin, _network(self.tenant_id, 'bench-ext', external=True))
+        self.plugin.create_subnet(
+            self.admin, _subnet(self.tenant_id, net['id'], '172.16.0.0/12'))
+        return net
+
+    def _tenant_network(self, ext_net=None):
+        """Create a tenant network with its subnet, and a router if an
+        external network is given.  Return the network, subnet and router.
+        """
+        net = self.plugin.create_network(
+            self.context, _network(self.tenant_id, 'bench'))
+        subnet = self.plugin.create_subnet(
+            self.context, _subnet(self.tenant_id, net['id'], '10.0.0.0/16'))
+        router = None
+        if ext_net is not None:
+            router = self.plugin.create_router(
+                self.context, _router(self.tenant_id, ext_net['id']))
+            self.plugin.add_router_interface(self.context, router['id'],
+                                             {'subnet_id': subnet['id']})
+        return net, subnet, router
+
+
+class PortBootStorm(Workload):
+    """VM ports created at once on a shared tenant network."""
+
+    name = 'port_boot_storm'
+
+    def setup(self):
+        self.net = self._tenant_network()[0]
+
+    def run(self, i):
+        self.plugin.create_port(self.context,
+                                _port(self.tenant_id, self.net['id']))
+
+
+class TenantOnboarding(Workload):
+    """New tenants getting a network, subnet, router and security group."""
+
+    name = 'tenant_onboarding'
+
+    def setup(self):
+        self.ext_net = self._external_network()
+
+    def run(self, i):
+        tenant_id = 'bench-tenant-%d-%s' % (i, uuid.uuid4().hex[:8])
+        context = n_context.Context('bench', tenant_id)
+        net = self.plugin.create_network(context,
+                                         _network(tenant_id, 'private'))
+        subnet = self.plugin.create_subnet(
+            context, _subnet(tenant_id, net['id'], '10.0.0.0/24'))
+        router = self.plugin.create_router(
+            context, _router(tenant_id, self.ext_net['id']))
+        self.plugin.add_router_interface(context, router['id'],
+                                         {'subnet_id': subnet['id']})
+        self.plugin.create_security_group(
+            context, {'security_group': {'name': 'web',
+                                         'description': 'bench',
+                                         'tenant_id': tenant_id}})
+
+
+class SecurityGroupRuleBulk(Workload):
+    """Bulk loads of rules into a security group."""
+
+    name = 'sg_rule_bulk'
+
+    def setup(self):
+        self.sg = self.plugin.create_security_group(
+            self.context, {'security_group': {'name': 'bench',
+                                              'description': 'bench',
+                                              'tenant_id': self.tenant_id}})
+
+    def run(self, i):
+        size = self.options.bulk_size
+        rules = [{'security_group_rule': {
+            'security_group_id': self.sg['id'],
+            'tenant_id': self.tenant_id,
+            'direction': 'ingress',
+            'ethertype': 'IPv4',
+            'protocol': 'tcp',
+            'port_range_min': i * size + n + 1,
+            'port_range_max': i * size + n + 1,
+            'remote_ip_prefix': '0.0.0.0/0',
+            'remote_group_id': None}} for n in range(size)]
+        self.plugin.create_security_group_rule_bulk(
+            self.context, {'security_group_rules': rules})
+
+
+class FloatingIpChurn(Workload):
+    """Floating IPs associated to VM ports and released again."""
+
+    name = 'floatingip_churn'
+
+    def setup(self):
+        self.ext_net = self._external_network()
+        net = self._tenant_network(self.ext_net)[0]
+        self.ports = eventlet.queue.Queue()
+        for i in range(self.options.concurrency):
+            self.ports.put(self.plugin.create_port(
+                self.context, _port(self.tenant_id, net['id'])))
+
+    def run(self, i):
+        port = self.ports.get()
+        try:
+            fip = self.plugin.create_floatingip(
+                self.context, {'floatingip': {
+                    'tenant_id': self.tenant_id,
+                    'floating_network_id': self.ext_net['id'],
+                    'port_id': port['id']}})
+            self.plugin.delete_floatingip(self.context, fip['id'])
+        finally:
+            self.ports.put(port)
+
+
+class LbaasMemberChurn(Workload):
+    """Members added to and removed from a load balancer pool."""
+
+    name = 'lbaas_member_churn'
+
+    def setup(self):
+        ext_net = self._external_network()
+        subnet, router = self._tenant_network(ext_net)[1:]
+        self.pool = self.plugin.create_pool(
+            self.context, {'pool': {'name': 'bench',
+                                    'description': 'bench',
+                                    'tenant_id': self.tenant_id,
+                                    'subnet_id': subnet['id'],
+                                    'protocol': 'HTTP',
+                                    'lb_method': 'ROUND_ROBIN',
+                                    'admin_state_up': True,
+                                    rsi.ROUTER_ID: router['id']}})
+
+    def run(self, i):
+        member = self.plugin.create_member(
+            self.context, {'member': {'tenant_id': self.tenant_id,
+                                      'pool_id': self.pool['id'],
+                                      'address': '10.0.%d.%d' % (
+                                          i // 250 % 250, i % 250 + 2),
+                                      'protocol_port': 80,
+                                      'weight': 1,
+                                      'admin_state_up': True}})
+        self.plugin.delete_member(self.context, member['id'])
+
+
+WORKLOADS = dict((workload.name, workload) for workload in (
+    PortBootStorm, TenantOnboarding, SecurityGroupRuleBulk, FloatingIpChurn,
+    LbaasMemberChurn))
+
+
+def run_workload(workload, fake, options):
+    error_rate = fake.error_rate
+    fake.error_rate = 0
+    workload.setup()
+    fake.error_rate = error_rate
+    calls_before = sum(fake.calls.values())
+
+    latencies = timing.Histogram(None)
+    errors = [0]
+
+    def run(i):
+        start = time.time()
+        try:
+            workload.run(i)
+        except Exception:
+            errors[0] += 1
+        latencies.add(time.time() - start)
+
+    pool = eventlet.GreenPool(options.concurrency)
+    start = time.time()
+    for i in range(options.ops):
+        pool.spawn_n(run, i)
+    pool.waitall()
+    duration = time.time() - start
+
+    result = latencies.get_stats()
+    result.update({'ops': options.ops,
+                   'errors': errors[0],
+                   'duration': duration,
+                   'ops_per_sec': options.ops / duration,
+                   'midonet_calls': sum(fake.calls.values()) - calls_before})
+    return result
+
+
+def version():
+    """Return the git version of the tree being benchmarked."""
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def add_plugin_args(parser):
+    """Add the options of create_plugin() to an argument parser."""
+    parser.add_argument('--connection',
+                        help='database URL, a temporary SQLite file by '
+                             'default')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='mean latency of the fake MidoNet API, in '
+                             'seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of the MidoNet calls failing')
+    parser.add_argument('--journal', action='store_true',
+                        help='push MidoNet changes through the journal')
+    parser.add_argument('--output', help='file to write the results to')
+
+
+def create_plugin(options, tmp_dir):
+    """Create a plugin backed by a fake MidoNet API server.
+
+    Return the plugin and the fake server, which the caller stops.
+    """
+    fake = fake_midonet.FakeMidonetServer(options.latency,
+                                          options.error_rate)
+    uri = fake.start()
+
+    cfg.CONF(args=[], project='neutron', default_config_files=[])
+    cfg.CONF.set_override('core_plugin',
+                          'midonet.neutron.plugin.MidonetPluginV2')
+    cfg.CONF.set_override('rpc_backend',
+                          'neutron.openstack.common.rpc.impl_fake')
+    cfg.CONF.set_override('lock_path', tmp_dir)
+    cfg.CONF.set_override('state_path', tmp_dir)
+    cfg.CONF.set_override('allow_overlapping_ips', True)
+    cfg.CONF.set_override(
+        'connection',
+        options.connection or 'sqlite:///%s/neutron.sqlite' % tmp_dir,
+        'database')
+    cfg.CONF.set_override('use_journal', options.journal, 'MIDONET')
+    cfg.CONF.set_override('midonet_uri', [uri], 'MIDONET')
+
+    return mido_plugin.MidonetPluginV2(), fake
+
+
+def plugin_options(options):
+    """Return the options of create_plugin() to include in a report."""
+    return {'latency': options.latency,
+            'error_rate': options.error_rate,
+            'journal': options.journal,
+            'database': cfg.CONF.database.connection.split(':')[0]}
+
+
+def write_report(report, output=None):
+    text = jsonutils.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('workloads', nargs='*', metavar='WORKLOAD',
+                        help='workloads to run among %s, all by default' %
+                             ', '.join(sorted(WORKLOADS)))
+    parser.add_argument('--ops', type=int, default=200,
+                        help='operations per workload')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='operations run at the same time')
+    parser.add_argument('--bulk-size', type=int, default=20,
+                        help='rules per security group rule bulk')
+    add_plugin_args(parser)
+    options = parser.parse_args(argv)
+    for name in options.workloads:
+        if name not in WORKLOADS:
+            parser.error('unknown workload %s' % name)
+    return options
+
+
+def main(argv=None):
+    options = _parse_args(argv)
+    tmp_dir = tempfile.mkdtemp(prefix='midonet-bench-')
+    try:
+        plugin, fake = create_plugin(options, tmp_dir)
+
+        results = {}
+        for name in options.workloads or sorted(WORKLOADS):
+            workload = WORKLOADS[name](plugin, options)
+            results[name] = run_workload(workload, fake, options)
+        if plugin.journal is not None:
+            plugin.journal.stop()
+        fake.stop()
+
+        run_options = plugin_options(options)
+        run_options.update({'ops': options.ops,
+                            'concurrency': options.concurrency,
+                            'bulk_size': options.bulk_size})
+        write_report({'version': version(),
+                      'options': run_options,
+                      'workloads': results}, options.output)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Local HTTP stand-in for the MidoNet API.
+
+It serves the REST API midonetclient talks to on a localhost port, so that
+a plugin pointed at it goes through its whole client stack: connection
+pool, endpoint selection, token management and circuit breaker.  It logs
+in any user, keeps the resources it is sent in memory, and answers after a
+configurable latency, failing a configurable fraction of the requests.
+"""
+
+import collections
+import email.utils
+import os
+import random
+import time
+import uuid
+
+import eventlet
+from eventlet import wsgi
+import webob
+from webob import dec
+from webob import exc as w_exc
+
+from neutron.openstack.common import jsonutils
+
+BASE_PATH = '/midonet-api'
+
+# Lifetime of the tokens handed out on login
+TOKEN_LIFETIME = 3600
+
+# Collections of the MidoNet Neutron API
+NEUTRON_COLLECTIONS = ('networks', 'subnets', 'ports', 'routers',
+                       'floating_ips', 'security_groups',
+                       'security_group_rules', 'vips', 'pools', 'members',
+                       'health_monitors')
+
+# Collections of the MidoNet API itself
+COLLECTIONS = ('bridges', 'routers', 'ports', 'chains', 'port_groups',
+               'hosts', 'tunnel_zones', 'load_balancers', 'pool_members',
+               'health_monitors')
+
+
+def _camel(name):
+    words = name.split('_')
+    return words[0] + ''.join(word.capitalize() for word in words[1:])
+
+
+def _links(uri, collections):
+    """Return the collection and template URIs of an API document.
+
+    They are given under both the snake and camel case names clients of
+    different versions look them up by.
+    """
+    links = {'uri': uri}
+    for name in collections:
+        template = '%s_template' % name[:-1]
+        links[name] = links[_camel(name)] = '%s/%s' % (uri, name)
+        links[template] = links[_camel(template)] = '%s/%s/{id}' % (uri,
+                                                                    name)
+    return links
+
+
+class FakeMidonetServer(object):
+    """In-memory MidoNet API served over HTTP.
+
+    :param latency: mean latency of a request in seconds.  Latencies follow
+                    an exponential distribution around it, giving the long
+                    tail a real API server shows.
+    :param error_rate: fraction of the requests failing with a 503
+                       response.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = collections.defaultdict(int)
+        self.errors = 0
+        self.uri = None
+        self._random = random.Random(seed)
+        self._tokens = {}
+        # Resources by the path of their collection, then by ID
+        self._collections = collections.defaultdict(dict)
+        self._server = None
+        self._log = None
+
+    def start(self):
+        """Serve the API on a free localhost port and return its URI."""
+        sock = eventlet.listen(('127.0.0.1', 0))
+        self.uri = 'http://127.0.0.1:%d%s' % (sock.getsockname()[1],
+                                              BASE_PATH)
+        self._log = open(os.devnull, 'w')
+        self._server = eventlet.spawn(wsgi.server, sock, self, log=self._log)
+        return self.uri
+
+    def stop(self):
+        if self._server is not None:
+            self._server.kill()
+            self._server = None
+            self._log.close()
+
+    @dec.wsgify
+    def __call__(self, req):
+        if not req.path.startswith(BASE_PATH):
+            return w_exc.HTTPNotFound()
+        segments = [s for s in req.path[len(BASE_PATH):].split('/') if s]
+        # Counted by method and collection, such as 'POST neutron/ports'
+        self.calls['%s %s' % (req.method, '/'.join(
+            s for s in segments if not self._is_id(s)))] += 1
+
+        if self.latency:
+            eventlet.sleep(self._random.expovariate(1.0 / self.latency))
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            return w_exc.HTTPServiceUnavailable()
+
+        if segments == ['login'] and req.method == 'POST':
+            return self._login(req)
+        token = req.headers.get('X-Auth-Token')
+        if self._tokens.get(token, 0) < time.time():
+            return w_exc.HTTPUnauthorized()
+
+        handler = getattr(self, '_%s' % req.method.lower(), None)
+        if handler is None:
+            return w_exc.HTTPMethodNotAllowed()
+        return handler(req, tuple(segments))
+
+    @staticmethod
+    def _is_id(segment):
+        return segment not in COLLECTIONS + NEUTRON_COLLECTIONS + (
+            'neutron', 'login')
+
+    def _response(self, req, body, status=200):
+        # Answer with the media type asked for, such as
+        # application/vnd.org.midonet.neutron.Network-v1+json
+        content_type = req.headers.get('Accept', '')
+        if not content_type or ',' in content_type or '*' in content_type:
+            content_type = 'application/json'
+        return webob.Response(body=jsonutils.dumps(body), status=status,
+                              content_type=content_type)
+
+    def _login(self, req):
+        if not req.authorization:
+            return w_exc.HTTPUnauthorized()
+        token = uuid.uuid4().hex
+        expires = time.time() + TOKEN_LIFETIME
+        self._tokens[token] = expires
+        response = webob.Response(status=200)
+        response.headers['Set-Cookie'] = 'sessionId=%s; Expires=%s' % (
+            token, email.utils.formatdate(expires, usegmt=True))
+        return response
+
+    def _find(self, path):
+        if len(path) < 2:
+            return None
+        return self._collections.get(path[:-1], {}).get(path[-1])
+
+    def _get(self, req, path):
+        if not path:
+            links = _links(req.host_url + BASE_PATH, COLLECTIONS)
+            links.update({'version': 'v1',
+                          'neutron': req.host_url + BASE_PATH + '/neutron'})
+            return self._response(req, links)
+        if path == ('neutron',):
+            return self._response(req, _links(req.host_url + req.path,
+                                              NEUTRON_COLLECTIONS))
+        if not self._is_id(path[-1]):
+            return self._response(req,
+                                  self._collections[path].values())
+        obj = self._find(path)
+        if obj is None:
+            return w_exc.HTTPNotFound()
+        return self._response(req, obj)
+
+    def _create(self, req, path, obj):
+        obj = dict(obj)
+        obj_id = obj.setdefault('id', str(uuid.uuid4()))
+        obj['uri'] = '%s/%s' % (req.path_url, obj_id)
+        self._collections[path][obj_id] = obj
+        return obj
+
+    def _post(self, req, path):
+        body = jsonutils.loads(req.body)
+        if isinstance(body, list):
+            created = [self._create(req, path, obj) for obj in body]
+            return self._response(req, created, 201)
+        obj = self._create(req, path, body)
+        response = self._response(req, obj, 201)
+        response.location = obj['uri']
+        return response
+
+    def _put(self, req, path):
+        body = jsonutils.loads(req.body) if req.body else {}
+        obj = self._find(path)
+        if obj is not None:
+            obj.update(body)
+            return self._response(req, obj)
+        if self._find(path[:-1]) is not None:
+            # An action on a resource, such as adding a router interface
+            return self._response(req, body)
+        return w_exc.HTTPNotFound()
+
+    def _delete(self, req, path):
+        if self._find(path) is None:
+            return w_exc.HTTPNotFound()
+        del self._collections[path[:-1]][path[-1]]
+        # Along with the resources nested under it
+        for collection in [c for c in self._collections
+                           if c[:len(path)] == path]:
+            del self._collections[collection]
+        return webob.Response(status=204)
@@ -0,0 +1,219 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 Midokura PTE LTD
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Replay of captured plugin calls against a plugin on a fake MidoNet.
+
+The calls recorded with the capture_file option are issued again to a
+plugin set up as by tools/benchmark.py.  The IDs of the resources created
+in the capture are mapped to the IDs of the resources the replay creates,
+and a call waits for the creation of the resources it refers to.  Calls
+referring to resources created before the capture started fail and are
+counted as errors.
+
+    python tools/replay.py capture.log                # at original speed
+    python tools/replay.py --speed 10 capture.log     # ten times faster
+    python tools/replay.py --speed 0 capture.log      # one call at a time
+    python tools/replay.py --fan-out 8 capture.log    # eight copies at once
+
+With --fan-out, each copy replays the capture under its own tenant IDs.
+The latency percentiles of each method are printed as JSON next to the
+ones of the captured calls.
+"""
+
+# Imported first as it monkey patches the standard library
+import benchmark
+
+import argparse
+import collections
+import shutil
+import tempfile
+import time
+
+import eventlet
+from eventlet import event
+
+from neutron import context as n_context
+from neutron.openstack.common import jsonutils
+
+from midonet.neutron.common import capture
+from midonet.neutron.common import timing
+
+
+def load(path):
+    calls = []
+    with open(path) as f:
+        for line in f:
+            try:
+                calls.append(jsonutils.loads(line))
+            except ValueError:
+                # The last line of a capture still being written
+                continue
+    return sorted(calls, key=lambda call: call['t'])
+
+
+class Replay(object):
+    """One copy of the capture being replayed."""
+
+    def __init__(self, plugin, calls, speed, suffix, stats):
+        self._plugin = plugin
+        self._calls = calls
+        self._speed = speed
+        self._suffix = suffix
+        self._stats = stats
+        self._created = {}
+        self._tenants = set()
+        for call in calls:
+            self._tenants.add(call['c']['tenant_id'])
+            for old_id in call.get('r', ()):
+                self._created[old_id] = event.Event()
+
+    def _map(self, value):
+        if isinstance(value, dict):
+            return dict((k, self._map(v)) for k, v in value.items())
+        if isinstance(value, list):
+            return [self._map(v) for v in value]
+        if value in self._tenants:
+            return value + self._suffix
+        created = self._created.get(value)
+        if created is not None:
+            # None if the replayed creation failed
+            return created.wait() or value
+        return value
+
+    def _run(self, call):
+        method = call['m']
+        created = call.get('r', ())
+        try:
+            context = n_context.Context(
+                call['c']['user_id'], self._map(call['c']['tenant_id']),
+                is_admin=call['c']['is_admin'])
+            args = self._map(capture.decode(call['a']))
+            kwargs = self._map(capture.decode(call['k']))
+            start = time.time()
+            try:
+                result = getattr(self._plugin, method)(context, *args,
+                                                       **kwargs)
+            finally:
+                self._stats.latencies[method].add(time.time() - start)
+        except Exception:
+            self._stats.errors[method] += 1
+            for old_id in created:
+                self._created[old_id].send(None)
+            return
+
+        new_ids = capture.created_ids(result)
+        for i, old_id in enumerate(created):
+            self._created[old_id].send(new_ids[i] if i < len(new_ids)
+                                       else None)
+
+    def run(self):
+        if not self._speed:
+            for call in self._calls:
+                self._run(call)
+            return
+
+        pool = eventlet.GreenPool(len(self._calls) or 1)
+        origin = self._calls[0]['t'] if self._calls else 0
+        start = time.time()
+        for call in self._calls:
+            delay = ((call['t'] - origin) / self._speed -
+                     (time.time() - start))
+            if delay > 0:
+                eventlet.sleep(delay)
+            pool.spawn_n(self._run, call)
+        pool.waitall()
+
+
+class Stats(object):
+
+    def __init__(self):
+        self.latencies = collections.defaultdict(
+            lambda: timing.Histogram(None))
+        self.errors = collections.defaultdict(int)
+
+
+def _report(calls, stats, duration):
+    captured = collections.defaultdict(lambda: timing.Histogram(None))
+    captured_errors = collections.defaultdict(int)
+    for call in calls:
+        captured[call['m']].add(call['d'])
+        if 'e' in call:
+            captured_errors[call['m']] += 1
+
+    methods = {}
+    for method, histogram in stats.latencies.items():
+        methods[method] = dict(histogram.get_stats(),
+                               errors=stats.errors[method],
+                               captured=dict(
+                                   captured[method].get_stats(),
+                                   errors=captured_errors[method]))
+    ops = sum(histogram.count for histogram in stats.latencies.values())
+    return {'ops': ops,
+            'errors': sum(stats.errors.values()),
+            'duration': duration,
+            'ops_per_sec': ops / duration if duration else None,
+            'methods': methods}
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('capture', help='capture file to replay')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='speed relative to the capture; 0 replays '
+                             'the calls one at a time, as fast as possible')
+    parser.add_argument('--fan-out', type=int, default=1,
+                        help='copies of the capture replayed at once')
+    benchmark.add_plugin_args(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = _parse_args(argv)
+    calls = load(options.capture)
+    tmp_dir = tempfile.mkdtemp(prefix='midonet-replay-')
+    try:
+        plugin, fake = benchmark.create_plugin(options, tmp_dir)
+
+        stats = Stats()
+        replays = [Replay(plugin, calls, options.speed,
+                          '-%d' % i if options.fan_out > 1 else '', stats)
+                   for i in range(options.fan_out)]
+        pool = eventlet.GreenPool(options.fan_out)
+        start = time.time()
+        for replay in replays:
+            pool.spawn_n(replay.run)
+        pool.waitall()
+        duration = time.time() - start
+        if plugin.journal is not None:
+            plugin.journal.stop()
+        fake.stop()
+
+        run_options = benchmark.plugin_options(options)
+        run_options.update({'capture': options.capture,
+                            'speed': options.speed,
+                            'fan_out': options.fan_out})
+        result = _report(calls, stats, duration)
+        result['midonet_calls'] = sum(fake.calls.values())
+        benchmark.write_report({'version': benchmark.version(),
+                                'options': run_options,
+                                'replay': result}, options.output)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()